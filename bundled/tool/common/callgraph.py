@@ -0,0 +1,237 @@
+from typing import Iterable, List, Optional
+
+from lsprotocol.types import (
+    CallHierarchyItem,
+    CallHierarchyIncomingCall,
+    CallHierarchyOutgoingCall,
+    Range,
+    SymbolKind,
+)
+from jaclang.compiler.absyntree import (
+    AstNode,
+    Ability,
+    AbilityDef,
+    Architype,
+    AtomTrailer,
+    BinaryExpr,
+    EventSignature,
+    FuncCall,
+    Module,
+    Name,
+)
+from jaclang.compiler.constant import Tokens as Tok
+
+from .index import get_decl_key, get_node_range, get_qualified_name
+
+PIPE_FWD_OPS = [Tok.PIPE_FWD, Tok.A_PIPE_FWD]
+PIPE_BKWD_OPS = [Tok.PIPE_BKWD, Tok.A_PIPE_BKWD]
+# callee of an edge only known by name, resolved when the graph is queried
+BY_NAME = "?"
+
+
+class CallGraphItem:
+    def __init__(self, key: str, node: Ability | Architype):
+        # abilities implemented in an impl block are shown at their body
+        loc_node = node.body if isinstance(node.body, AbilityDef) else node
+        self.key = key
+        self.name = node.sym_name
+        self.kind = str(node.sym_type)
+        self.doc_uri = f"file://{loc_node.loc.mod_path}"
+        self.qualified_name = get_qualified_name(node)
+        self.range = get_node_range(loc_node)
+        self.selection_range = get_node_range(loc_node.sym_name_node)
+
+    @property
+    def hierarchy_item(self) -> CallHierarchyItem:
+        return CallHierarchyItem(
+            name=self.name,
+            kind=SymbolKind.Class if self.kind == "walker" else SymbolKind.Function,
+            uri=self.doc_uri,
+            range=self.range,
+            selection_range=self.selection_range,
+            detail=self.qualified_name,
+            data=self.key,
+        )
+
+
+class CallGraph:
+    """
+    Workspace call graph.
+
+    Edges go from an ability to the abilities it calls, and from a walker to the
+    abilities it triggers through `with <walker> entry/exit`. Every edge is owned
+    by the module that was compiled when it was found, so rebuilding a module only
+    replaces what that module contributed.
+
+    Calls the compiler did not link are kept by callee name, and follow the
+    ability of that name only while it is unique in the workspace, whichever
+    order the modules were indexed in.
+    """
+
+    def __init__(self):
+        self.items: dict[str, CallGraphItem] = {}
+        self.outgoing: dict[str, dict[str, List[Range]]] = {}
+        self.incoming: dict[str, dict[str, List[Range]]] = {}
+        self.module_edges: dict[str, List[tuple[str, str, Range]]] = {}
+        self.names: dict[str, set[str]] = {}
+
+    def update_module(self, doc_uri: str, module: Optional[Module]) -> None:
+        """Replaces the items and edges contributed by `doc_uri`."""
+        self.remove_module(doc_uri)
+        if not isinstance(module, Module):
+            return
+        mod_path = doc_uri.replace("file://", "")
+        for arch in module.get_all_sub_nodes(Architype):
+            if arch.loc.mod_path == mod_path and str(arch.sym_type) == "walker":
+                self._add_item(arch)
+        edges = []
+        bodies = []
+        for node in _unique(module.get_all_sub_nodes(Ability)):
+            if node.loc.mod_path != mod_path:
+                continue
+            key = self._add_item(node)
+            for walker, site in _get_event_walkers(node):
+                edges.append((self._add_item(walker), key, site))
+            if not isinstance(node.body, AbilityDef):
+                bodies.append((node, node))
+        for node in _unique(module.get_all_sub_nodes(AbilityDef)):
+            # impl blocks pulled in from *_impl.jac files are only linked to their
+            # declaration when compiled through the declaring module
+            if isinstance(node.decl_link, Ability):
+                bodies.append((node.decl_link, node))
+
+        for caller, node in bodies:
+            if not isinstance(node.body, AstNode):
+                continue
+            caller_key = get_decl_key(caller)
+            for callee_key, site in self._get_calls(node.body, caller):
+                edges.append((caller_key, callee_key, site))
+        for from_key, to_key, site in edges:
+            self.outgoing.setdefault(from_key, {}).setdefault(to_key, []).append(site)
+            self.incoming.setdefault(to_key, {}).setdefault(from_key, []).append(site)
+        self.module_edges[doc_uri] = edges
+
+    def remove_module(self, doc_uri: str) -> None:
+        """Drops the edges contributed by `doc_uri` and the items declared in it."""
+        for from_key, to_key, site in self.module_edges.pop(doc_uri, []):
+            _remove_edge(self.outgoing, from_key, to_key, site)
+            _remove_edge(self.incoming, to_key, from_key, site)
+        for key in [k for k in self.items if k.split("#")[0] == doc_uri]:
+            item = self.items.pop(key)
+            self.names.get(item.name, set()).discard(key)
+
+    def get_item(self, key: str) -> Optional[CallHierarchyItem]:
+        item = self.items.get(key)
+        return item.hierarchy_item if item else None
+
+    def incoming_calls(self, key: str) -> List[CallHierarchyIncomingCall]:
+        callers = dict(self.incoming.get(key, {}))
+        item = self.items.get(key)
+        if item is not None and self._resolve_name(item.name) == key:
+            for caller, sites in self.incoming.get(BY_NAME + item.name, {}).items():
+                callers[caller] = callers.get(caller, []) + sites
+        return [
+            CallHierarchyIncomingCall(
+                from_=self.items[caller].hierarchy_item, from_ranges=list(sites)
+            )
+            for caller, sites in callers.items()
+            if caller in self.items
+        ]
+
+    def outgoing_calls(self, key: str) -> List[CallHierarchyOutgoingCall]:
+        callees: dict[str, List[Range]] = {}
+        for callee, sites in self.outgoing.get(key, {}).items():
+            if callee.startswith(BY_NAME):
+                callee = self._resolve_name(callee[len(BY_NAME) :])
+            if callee is not None:
+                callees[callee] = callees.get(callee, []) + sites
+        return [
+            CallHierarchyOutgoingCall(
+                to=self.items[callee].hierarchy_item, from_ranges=list(sites)
+            )
+            for callee, sites in callees.items()
+            if callee in self.items
+        ]
+
+    def _add_item(self, node: Ability | Architype) -> str:
+        key = get_decl_key(node)
+        item = CallGraphItem(key, node)
+        self.items[key] = item
+        self.names.setdefault(item.name, set()).add(key)
+        return key
+
+    def _get_calls(self, body: AstNode, caller: Ability) -> Iterable[tuple[str, Range]]:
+        targets = [call.target for call in body.get_all_sub_nodes(FuncCall)]
+        for expr in body.get_all_sub_nodes(BinaryExpr):
+            op_name = getattr(expr.op, "name", None)
+            if op_name in PIPE_FWD_OPS:
+                targets.append(expr.right)
+            elif op_name in PIPE_BKWD_OPS:
+                targets.append(expr.left)
+        for target in targets:
+            name = target.right if isinstance(target, AtomTrailer) else target
+            if not isinstance(name, Name):
+                continue
+            callee_key = self._resolve_callee(name, caller)
+            if callee_key is not None:
+                yield callee_key, get_node_range(name)
+
+    def _resolve_callee(self, name: Name, caller: Ability) -> Optional[str]:
+        decl = name.sym_link.decl if name.sym_link else None
+        if isinstance(decl, Ability):
+            return self._add_item(decl)
+        if decl is not None:
+            return None
+        # attribute calls (`self.describe()`, `<here>.process_guess`) are not
+        # linked by the compiler, try the caller's own architype first
+        arch = caller.parent
+        while arch is not None and not isinstance(arch, Architype):
+            arch = arch.parent
+        if arch is not None:
+            for ability in arch.get_all_sub_nodes(Ability):
+                if ability.sym_name == name.sym_name:
+                    return self._add_item(ability)
+        # then the ability of that name, if unique in the workspace when queried
+        return BY_NAME + name.sym_name
+
+    def _resolve_name(self, name: str) -> Optional[str]:
+        candidates = [
+            key
+            for key in self.names.get(name, set())
+            if self.items[key].kind == "ability"
+        ]
+        return candidates[0] if len(candidates) == 1 else None
+
+
+def _get_event_walkers(ability: Ability) -> Iterable[tuple[Architype, Range]]:
+    signature = ability.signature
+    tag = signature.arch_tag_info if isinstance(signature, EventSignature) else None
+    if tag is None:
+        return
+    names = [tag] if isinstance(tag, Name) else tag.get_all_sub_nodes(Name)
+    for name in names:
+        decl = name.sym_link.decl if name.sym_link else None
+        if isinstance(decl, Architype) and str(decl.sym_type) == "walker":
+            yield decl, get_node_range(name)
+
+
+def _remove_edge(
+    table: dict[str, dict[str, List[Range]]], key: str, other: str, site: Range
+) -> None:
+    sites = table.get(key, {}).get(other, [])
+    if site in sites:
+        sites.remove(site)
+    if not sites:
+        table.get(key, {}).pop(other, None)
+    if key in table and not table[key]:
+        del table[key]
+
+
+def _unique(nodes: List[AstNode]) -> List[AstNode]:
+    seen = set()
+    unique = []
+    for node in nodes:
+        if id(node) not in seen:
+            seen.add(id(node))
+            unique.append(node)
+    return unique
@@ -1,6 +1,4 @@
 import re
-import inspect
-import importlib
 from typing import Optional
 
 from pygls.server import LanguageServer
@@ -8,13 +6,18 @@ from lsprotocol.types import (
     CompletionParams,
     CompletionItem,
     CompletionItemKind,
+    CompletionList,
     InsertTextFormat,
+    InlineCompletionItem,
+    InlineCompletionList,
     InlineCompletionParams,
+    MarkupContent,
+    MarkupKind,
+    Range,
 )
 
 from .constants import (
     JAC_KW,
-    PY_LIBS,
     SNIPPETS,
     WALKER_SNIPPET,
     NODE_SNIPPET,
@@ -23,8 +26,23 @@ from .constants import (
     ABILITY_SNIPPETS,
 )
 
-from .symbols import get_symbol_by_name
-from .utils import get_relative_path, get_all_symbols, get_scope_at_pos
+from .completion_index import CandidateIndex
+from .line_patterns import get_line_context
+from .py_modules import PY_MEMBERS, PY_MODULES
+from .index import get_visible_uris
+from .utils import (
+    get_relative_path,
+    get_line_index,
+)
+
+MAX_COMPLETION_ITEMS = 50
+
+PY_MEMBER_KINDS = {
+    "module": CompletionItemKind.Module,
+    "class": CompletionItemKind.Class,
+    "function": CompletionItemKind.Function,
+    "variable": CompletionItemKind.Variable,
+}
 
 
 SCOPE_SNIPPETS = {
@@ -67,159 +85,246 @@ def _get_completion_kind(sym_type: str) -> CompletionItemKind:
     return architype_map.get(sym_type, CompletionItemKind.Variable)
 
 
+def get_completion_list(
+    ls: LanguageServer,
+    params: CompletionParams,
+    limit: int = MAX_COMPLETION_ITEMS,
+) -> CompletionList:
+    """
+    Returns the best `limit` completions for the word being typed.
+
+    Prefix matches come first, then fuzzy matches, each ordered by label. The
+    list is marked incomplete when matches were left out, so the client asks
+    again as the word grows instead of filtering a partial list.
+    """
+    prefix, indexes = get_candidate_indexes(ls, params)
+    matches = [match for index in indexes for match in index.lookup(prefix, limit)]
+    matches.sort(key=lambda match: (match[0], match[1].label.lower()))
+    return CompletionList(
+        is_incomplete=len(matches) > limit
+        or not all(index.complete for index in indexes),
+        items=[item for _, item in matches[:limit]],
+    )
+
+
+def get_inline_completion_list(
+    ls: LanguageServer, params: InlineCompletionParams
+) -> InlineCompletionList:
+    """
+    Suggests the rest of the line from the lines written in similar places.
+
+    Only the text after the cursor is sent, and only at the end of a line.
+    """
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    lines = get_line_index(ls, doc)
+    line = lines.get_line(params.position.line)
+    column = lines.column_at(params.position)
+    typed = line[:column]
+    if line[column:].strip():
+        return InlineCompletionList(items=[])
+    kind, prev_line = get_line_context(lines, params.position.line, typed)
+    cursor = Range(start=params.position, end=params.position)
+    return InlineCompletionList(
+        items=[
+            InlineCompletionItem(insert_text=text, range=cursor)
+            for text in ls.line_patterns.suggest(kind, typed, prev_line)
+        ]
+    )
+
+
+def resolve_completion_item(ls: LanguageServer, item: CompletionItem) -> CompletionItem:
+    """
+    Fills in the documentation of the completion item the user highlighted.
+
+    Items are sent without documentation; their `data` says where to find it:
+    a declaration key for jac symbols, a module and member name for python
+    members, or a module path for `include:jac` items.
+    """
+    data = item.data if isinstance(item.data, dict) else {}
+    if "key" in data:
+        uri, qualified_name = data["key"].split("#", 1)
+        name = qualified_name.split(".")[-1]
+        for symbol in ls.symbol_index.lookup(name, data["type"], [uri]):
+            if symbol.decl_key == data["key"]:
+                item.documentation = _get_markdown(
+                    "jac", f"({symbol.sym_type}) {qualified_name}", symbol.sym_doc
+                )
+                break
+    elif "py_module" in data:
+        members = PY_MEMBERS.get_members(data["py_module"]).members
+        if data["name"] not in members:
+            return item
+        _, signature, doc = members[data["name"]]
+        item.documentation = _get_markdown("python", f"{data['name']}{signature}", doc)
+    elif "module" in data:
+        mod_info = ls.jlws.modules.get(data["module"])
+        if mod_info is not None and mod_info.ir.doc:
+            item.documentation = mod_info.ir.doc.value
+    return item
+
+
 def get_completion_items(
     ls: LanguageServer, params: Optional[CompletionParams | InlineCompletionParams]
 ) -> list[CompletionItem]:
     """
-    Returns a list of completion items based on the text document and cursor position.
+    Returns every completion candidate for the context before the cursor.
 
     Args:
         ls (LanguageServer): The language server instance.
         params (Optional[CompletionParams]): The completion parameters.
 
     Returns:
-        list: A list of completion items.
+        list: A list of completion items, not filtered by the word being typed.
+    """
+    _, indexes = get_candidate_indexes(ls, params)
+    return [item for index in indexes for item in index.items]
+
+
+def get_candidate_indexes(
+    ls: LanguageServer, params: Optional[CompletionParams | InlineCompletionParams]
+) -> tuple[str, list[CandidateIndex]]:
+    """
+    Returns the word being typed and the candidate indexes of its context.
+
+    The context is the line before that word, so completions keep working while
+    the word is typed. Indexes are cached in `ls.completion_index` per context.
     """
     doc = ls.workspace.get_text_document(params.text_document.uri)
-    line = doc.source.splitlines()[params.position.line]
-    before_cursor = line[: params.position.character]
+    lines = get_line_index(ls, doc)
+    line = lines.get_line(params.position.line)
+    before_cursor = line[: lines.column_at(params.position)]
+    prefix = re.search(r"\w*$", before_cursor).group()
+    before_cursor = before_cursor[: len(before_cursor) - len(prefix)]
+    at_start = before_cursor == ""
     last_word = before_cursor.split()[-1] if len(before_cursor.split()) else ""
 
-    scope_sym = get_scope_at_pos(
-        ls, doc, params.position, get_all_symbols(ls, doc, False, True)
-    )
+    scope_sym = ls.symbol_index.get_scope(doc.uri, params.position.line)
 
-    completion_items = []
+    visible_uris = get_visible_uris(doc)
+    cache = ls.completion_index
+
+    indexes = []
 
     """
     eg- {node}. {walker}. {object}.
     """
     if before_cursor.endswith("."):
         last_symbol_name = re.match(r"(\w+).", last_word).group(1)
-        last_symbol = get_symbol_by_name(last_symbol_name, get_all_symbols(ls, doc))
-        if last_symbol:
-            for child in last_symbol.children:
-                completion_items.append(
-                    CompletionItem(
-                        label=child.sym_name,
-                        kind=_get_completion_kind(child.sym_type),
-                        documentation=child.sym_doc,
-                        insert_text=child.sym_name,
-                    )
-                )
 
-    if before_cursor.endswith(":"):
-        if before_cursor == ":":
-            completion_items += [
+        def get_member_items():
+            last_symbol = ls.symbol_index.first(last_symbol_name, doc_uris=visible_uris)
+            return [
                 CompletionItem(
-                    label=f"{symbol.sym_name} ({symbol.sym_type})",
-                    kind=_get_completion_kind(symbol.sym_type),
-                    documentation=symbol.sym_doc,
-                    insert_text=f"{symbol.sym_type}:{symbol.sym_name}",
+                    label=child.sym_name,
+                    kind=_get_completion_kind(child.sym_type),
+                    data=_get_symbol_data(child),
+                    insert_text=child.sym_name,
                 )
-                for symbol in get_all_symbols(ls, doc)
-                if symbol.sym_type == "walker" or symbol.sym_type == "node"
-                if not symbol.is_use
-            ]
-            completion_items += [
-                CompletionItem(
-                    label="walker",
-                    kind=CompletionItemKind.Keyword,
-                    insert_text="walker:",
-                ),
-                CompletionItem(
-                    label="node",
-                    kind=CompletionItemKind.Keyword,
-                    insert_text="node:",
-                ),
+                for child in (last_symbol.children if last_symbol else [])
             ]
+
+        indexes.append(
+            cache.get(("member", doc.uri, last_symbol_name), get_member_items)
+        )
+
+    if before_cursor.endswith(":"):
+        if before_cursor == ":":
+
+            def get_arch_items():
+                return [
+                    CompletionItem(
+                        label=f"{symbol.sym_name} ({symbol.sym_type})",
+                        kind=_get_completion_kind(symbol.sym_type),
+                        data=_get_symbol_data(symbol),
+                        insert_text=f"{symbol.sym_type}:{symbol.sym_name}",
+                    )
+                    for sym_type in ["walker", "node"]
+                    for symbol in ls.symbol_index.of_kind(sym_type, visible_uris)
+                ] + [
+                    CompletionItem(
+                        label="walker",
+                        kind=CompletionItemKind.Keyword,
+                        insert_text="walker:",
+                    ),
+                    CompletionItem(
+                        label="node",
+                        kind=CompletionItemKind.Keyword,
+                        insert_text="node:",
+                    ),
+                ]
+
+            indexes.append(cache.get(("arch", doc.uri), get_arch_items))
         """
         eg- :walker:, :node:
         """
-        match = re.match(r":(\w+):", before_cursor)
+        match = re.match(r":(\w+):$", before_cursor)
         if match:
             sym_type = match.group(1)
-            completion_items += [
-                CompletionItem(
-                    label=f"{symbol.sym_name} ({symbol.sym_type})",
-                    kind=_get_completion_kind(symbol.sym_type),
-                    documentation=symbol.sym_doc,
-                    insert_text=symbol.sym_name,
-                )
-                for symbol in get_all_symbols(ls, doc)
-                if symbol.sym_type == sym_type and not symbol.is_use
-            ]
-        """
-        eg- :walker:GuessGame:, :node:turn:
-        """
-        match = re.match(r":(\w+):(\w+):", before_cursor)
-        if match:
-            sym_type = match.group(1)
-            sym_name = match.group(2)
-            symbol = get_symbol_by_name(sym_name, get_all_symbols(ls, doc), sym_type)
-            if symbol:
-                completion_items += [
+
+            def get_kind_items():
+                return [
                     CompletionItem(
-                        label=child.sym_name,
-                        kind=_get_completion_kind(child.sym_type),
-                        documentation=child.sym_doc,
-                        insert_text=f"ability:{child.sym_name}",
+                        label=f"{symbol.sym_name} ({symbol.sym_type})",
+                        kind=_get_completion_kind(symbol.sym_type),
+                        data=_get_symbol_data(symbol),
+                        insert_text=symbol.sym_name,
                     )
-                    for child in symbol.children
-                    if child.sym_type == "ability" and not child.is_use
+                    for symbol in ls.symbol_index.of_kind(sym_type, visible_uris)
                 ]
+
+            indexes.append(cache.get(("kind", doc.uri, sym_type), get_kind_items))
         """
+        eg- :walker:GuessGame:, :node:turn:
         eg- :walker:GuessGame:ability:
         """
-        match = re.match(r":(\w+):(\w+):ability:", before_cursor)
+        match = re.match(r":(\w+):(\w+):(ability:)?$", before_cursor)
         if match:
-            sym_type = match.group(1)
-            sym_name = match.group(2)
-            symbol = get_symbol_by_name(sym_name, get_all_symbols(ls, doc), sym_type)
-            if symbol:
-                completion_items += [
+            sym_type, sym_name, in_ability = match.groups()
+
+            def get_impl_items():
+                symbol = ls.symbol_index.first(sym_name, sym_type, visible_uris)
+                return [
                     CompletionItem(
                         label=child.sym_name,
                         kind=_get_completion_kind(child.sym_type),
-                        documentation=child.sym_doc,
-                        insert_text=child.sym_name,
+                        data=_get_symbol_data(child),
+                        insert_text=(
+                            child.sym_name
+                            if in_ability
+                            else f"ability:{child.sym_name}"
+                        ),
                     )
-                    for child in symbol.children
+                    for child in (symbol.children if symbol else [])
                     if child.sym_type == "ability" and not child.is_use
                 ]
 
-    # Snippets at the start of the line
-    if params.position.character == 0:
-        completion_items += [
-            CompletionItem(
-                label=snippet["label"],
-                kind=CompletionItemKind.Snippet,
-                detail=snippet["detail"],
-                documentation=snippet["documentation"],
-                insert_text=snippet["insert_text"],
-                insert_text_format=InsertTextFormat.Snippet,
-            )
-            for snippet in SNIPPETS
-            if "at_start" in snippet["positions"]
-        ]
+            key = ("impl", doc.uri, sym_type, sym_name, bool(in_ability))
+            indexes.append(cache.get(key, get_impl_items))
 
+    # Snippets at the start of the line
     # Start of the line Keywords handling
     """
     'node', 'walker', ':node:', ':walker:', 'include:jac', 'import:py',
     'import:py from','object', 'enum', 'can', 'test', 'with entry',
     'global'
     """
-    if params.position.character == 0:
-        completion_items += [
-            CompletionItem(
-                label=kw,
-                kind=CompletionItemKind.Keyword,
-                insert_text=JAC_KW[kw]["insert_text"],
-                documentation=JAC_KW[kw]["documentation"],
-            )
-            for kw in JAC_KW
-            if "at_start" in JAC_KW[kw]["positions"]
-        ]
+    if at_start:
+
+        def get_start_items():
+            return _get_snippet_items(
+                [s for s in SNIPPETS if "at_start" in s["positions"]]
+            ) + [
+                CompletionItem(
+                    label=kw,
+                    kind=CompletionItemKind.Keyword,
+                    insert_text=JAC_KW[kw]["insert_text"],
+                    documentation=JAC_KW[kw]["documentation"],
+                )
+                for kw in JAC_KW
+                if "at_start" in JAC_KW[kw]["positions"]
+            ]
+
+        indexes.append(cache.get("at_start", get_start_items, static=True))
 
     # Hnadling Imports
     """
@@ -228,62 +333,79 @@ def get_completion_items(
     3. import:py from {py_libs}, {classes_and_functions_in_py_lib}
     """
     if before_cursor in ["import:py from ", "import:py "]:
-        completion_items += [
-            CompletionItem(
-                label=py_lib,
-                kind=CompletionItemKind.Module,
-                insert_text=py_lib,
-                documentation="",
-            )
-            for py_lib in PY_LIBS
-        ]
+        py_libs = PY_MODULES.get_names()
+
+        def get_py_lib_items():
+            return [
+                CompletionItem(
+                    label=py_lib,
+                    kind=CompletionItemKind.Module,
+                    insert_text=py_lib,
+                    documentation="",
+                )
+                for py_lib in py_libs.names
+            ]
+
+        key = ("py_libs", py_libs.generation, py_libs.complete)
+        indexes.append(
+            cache.get(key, get_py_lib_items, static=True, complete=py_libs.complete)
+        )
     py_import_match = re.match(r"import:py from (\w+),", before_cursor)
     if py_import_match:
         py_module = py_import_match.group(1)
-        completion_items += [
-            CompletionItem(
-                label=name,
-                kind=CompletionItemKind.Function
-                if inspect.isfunction(obj)
-                else CompletionItemKind.Class,
-                documentation=obj.__doc__,
-            )
-            for name, obj in inspect.getmembers(importlib.import_module(py_module))
-        ]
-    if last_word == "include:jac":
-        for mod, mod_info in ls.jlws.modules.items():
-            rel_path = get_relative_path(doc.uri.replace("file://", ""), mod).replace(
-                ".jac", ""
-            )
-            text = (
-                rel_path.replace("/", "")
-                if rel_path.startswith("..")
-                else rel_path.replace("/", ".")
-            )
-            completion_items.append(
+        py_members = PY_MEMBERS.get_members(py_module)
+
+        def get_py_member_items():
+            return [
                 CompletionItem(
-                    label=text,
-                    kind=CompletionItemKind.File,
-                    insert_text=text,
-                    documentation=mod_info.ir.doc.value if mod_info.ir.doc else "",
+                    label=name,
+                    kind=PY_MEMBER_KINDS.get(kind, CompletionItemKind.Variable),
+                    data={"py_module": py_module, "name": name},
                 )
+                for name, (kind, _, _) in py_members.members.items()
+            ]
+
+        key = ("py_members", py_module, py_members.version, py_members.complete)
+        indexes.append(
+            cache.get(
+                key, get_py_member_items, static=True, complete=py_members.complete
             )
+        )
+    if last_word == "include:jac":
+
+        def get_jac_module_items():
+            items = []
+            for mod in ls.jlws.modules:
+                rel_path = get_relative_path(
+                    doc.uri.replace("file://", ""), mod
+                ).replace(".jac", "")
+                text = (
+                    rel_path.replace("/", "")
+                    if rel_path.startswith("..")
+                    else rel_path.replace("/", ".")
+                )
+                items.append(
+                    CompletionItem(
+                        label=text,
+                        kind=CompletionItemKind.File,
+                        insert_text=text,
+                        data={"module": mod},
+                    )
+                )
+            return items
+
+        indexes.append(cache.get(("include", doc.uri), get_jac_module_items))
 
     # Snippets inside a node, walker, object
     # checks if the last word is just spaces/tabs
-    if params.position.character > 0 and last_word == "":
-        completion_items += [
-            CompletionItem(
-                label=snippet["label"],
-                kind=CompletionItemKind.Snippet,
-                detail=snippet["detail"],
-                documentation=snippet["documentation"],
-                insert_text=snippet["insert_text"],
-                insert_text_format=InsertTextFormat.Snippet,
+    if not at_start and last_word == "":
+
+        def get_inside_items():
+            return _get_snippet_items(
+                [s for s in SNIPPETS if "inside" in s["positions"]]
             )
-            for snippet in SNIPPETS
-            if "inside" in snippet["positions"]
-        ]
+
+        indexes.append(cache.get("inside", get_inside_items, static=True))
 
     # inside a node, walker, object, enum
     """
@@ -315,18 +437,7 @@ def get_completion_items(
         {enum_key} = {enum_value},
     }
     """
-    if scope_sym:
-        completion_items += [
-            CompletionItem(
-                label=snippet["label"],
-                kind=CompletionItemKind.Snippet,
-                detail=snippet["detail"],
-                documentation=snippet["documentation"],
-                insert_text=snippet["insert_text"],
-                insert_text_format=InsertTextFormat.Snippet,
-            )
-            for snippet in SCOPE_SNIPPETS.get(scope_sym.sym_type, [])
-        ]
+    scope_types = [scope_sym.sym_type] if scope_sym else []
 
     # inside a ability
     """
@@ -339,27 +450,51 @@ def get_completion_items(
         visit -->;
     }
     """
-    if scope_sym and (
-        scope_sym.sym_type == "ability"
-        or (
-            scope_sym.sym_type == "impl"
-            and scope_sym.ws_symbol.decl.decl_link.sym_type == "ability"
-        )
+    if (
+        scope_sym
+        and scope_sym.sym_type == "impl"
+        and scope_sym.ws_symbol.decl.decl_link.sym_type == "ability"
     ):
-        completion_items += [
-            CompletionItem(
-                label=snippet["label"],
-                kind=CompletionItemKind.Snippet,
-                detail=snippet["detail"],
-                documentation=snippet["documentation"],
-                insert_text=snippet["insert_text"],
-                insert_text_format=InsertTextFormat.Snippet,
+        scope_types.append("ability")
+    for scope_type in scope_types:
+        indexes.append(
+            cache.get(
+                ("scope", scope_type),
+                lambda: _get_snippet_items(SCOPE_SNIPPETS.get(scope_type, [])),
+                static=True,
             )
-            for snippet in SCOPE_SNIPPETS.get("ability", [])
-        ]
+        )
 
     # inside a python block
     """
     {normal python stuff}
     """
-    return completion_items
+    return prefix, indexes
+
+
+def _get_symbol_data(symbol) -> Optional[dict]:
+    try:
+        return {"key": symbol.decl_key, "type": symbol.sym_type}
+    except Exception:
+        return None
+
+
+def _get_markdown(language: str, header: str, doc: Optional[str]) -> MarkupContent:
+    value = f"```{language}\n{header}\n```"
+    if doc:
+        value += f"\n---\n{doc.strip()}"
+    return MarkupContent(kind=MarkupKind.Markdown, value=value)
+
+
+def _get_snippet_items(snippets: list[dict]) -> list[CompletionItem]:
+    return [
+        CompletionItem(
+            label=snippet["label"],
+            kind=CompletionItemKind.Snippet,
+            detail=snippet["detail"],
+            documentation=snippet["documentation"],
+            insert_text=snippet["insert_text"],
+            insert_text_format=InsertTextFormat.Snippet,
+        )
+        for snippet in snippets
+    ]
@@ -0,0 +1,105 @@
+import threading
+from typing import Callable, Hashable, List
+
+from lsprotocol.types import CompletionItem
+
+PREFIX_MATCH = 0
+FUZZY_MATCH = 1
+
+
+class CandidateIndex:
+    """
+    Completion candidates of one context, in a prefix trie over their labels.
+
+    Labels are indexed lowercased, so lookups are case insensitive. When the
+    prefix does not match enough labels, labels containing its characters in
+    order (eg- `gg` for `GuessGame`) are added as fuzzy matches. An index that
+    is not `complete` (its candidates are still being discovered) makes the
+    completion list incomplete, so the client asks again.
+    """
+
+    def __init__(self, items: List[CompletionItem], complete: bool = True):
+        self.items = items
+        self.complete = complete
+        self.trie: dict = {}
+        for i, item in enumerate(items):
+            node = self.trie
+            for char in item.label.lower():
+                node = node.setdefault(char, {})
+            node.setdefault(None, []).append(i)
+
+    def lookup(self, prefix: str, limit: int) -> List[tuple[int, CompletionItem]]:
+        """Returns (match kind, item) pairs, at least `limit` of them if possible."""
+        prefix = prefix.lower()
+        node = self.trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                break
+        found = set(_collect(node)) if node is not None else set()
+        matches = [(PREFIX_MATCH, self.items[i]) for i in sorted(found)]
+        if len(matches) < limit and prefix:
+            matches += [
+                (FUZZY_MATCH, item)
+                for i, item in enumerate(self.items)
+                if i not in found and _is_subsequence(prefix, item.label.lower())
+            ]
+        return matches
+
+
+class CompletionCache:
+    """
+    Candidate indexes by context key.
+
+    Static contexts (keywords, snippets, python modules) are built once; the
+    ones derived from workspace symbols are dropped whenever a module is rebuilt.
+    Indexes are built outside the lock; one built across an invalidation is
+    returned but not kept.
+    """
+
+    def __init__(self):
+        self.static: dict[Hashable, CandidateIndex] = {}
+        self.symbols: dict[Hashable, CandidateIndex] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        key: Hashable,
+        build: Callable[[], List[CompletionItem]],
+        static: bool = False,
+        complete: bool = True,
+    ) -> CandidateIndex:
+        indexes = self.static if static else self.symbols
+        with self._lock:
+            index = indexes.get(key)
+            generation = self._generation
+        if index is not None:
+            return index
+        index = CandidateIndex(build(), complete)
+        with self._lock:
+            if static or generation == self._generation:
+                index = indexes.setdefault(key, index)
+        return index
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.symbols.clear()
+
+
+def _collect(node: dict) -> List[int]:
+    stack, found = [node], []
+    while stack:
+        node = stack.pop()
+        for char, child in node.items():
+            if char is None:
+                found += child
+            else:
+                stack.append(child)
+    return found
+
+
+def _is_subsequence(prefix: str, label: str) -> bool:
+    chars = iter(label)
+    return all(char in chars for char in prefix)
@@ -1,9 +1,11 @@
 import os
 import threading
-import pkgutil
 
 SERVER_CWD = os.getcwd()
 CWD_LOCK = threading.Lock()
+CACHE_DIR = os.path.join(
+    os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "jaclang-vscode"
+)
 ERROR_CODE_BASE_URL = "INCLUDE ERROR CODE BASE URL HERE"
 SEE_HREF_PREFIX = "See LINK"
 SEE_PREFIX_LEN = len("See ")
@@ -246,5 +248,3 @@ JAC_KW = {
         "positions": ["inside"],
     },
 }
-
-PY_LIBS = [name for _, name, _ in pkgutil.iter_modules() if "_" not in name]
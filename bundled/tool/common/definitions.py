@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+from lsprotocol.types import Location, Position, Range
+from jaclang.compiler.absyntree import (
+    AbilityDef,
+    ArchDef,
+    AstImplOnlyNode,
+    Module,
+)
+from jaclang.compiler.workspace import sym_tab_list
+
+from .constants import CACHE_DIR
+from .index import get_decl_key, get_node_range
+
+DEFINITION = "definitions"
+IMPLEMENTATION = "implementations"
+# seconds a save waits for more modules to be rebuilt before writing the index
+SAVE_DELAY = 5.0
+
+
+class DefinitionIndex:
+    """
+    Declaration key (`<uri>#<qualified name>`) -> definition and implementation.
+
+    Locations are stored as plain `[uri, line, char, end line, end char]` lists,
+    indexed per module, so a module's entries outlive its IR and the whole
+    index can be saved with the workspace and loaded back before compiling.
+    Implementations are contributed by the module declaring an ability with
+    a separate body and by the module holding the `:node:X:ability:y` block.
+
+    A module loaded from the saved index is not indexed again when it is
+    first compiled, as its file did not change since. Saves are written by a
+    timer thread a few seconds after the last `schedule_save`, from a copy
+    of the module table, so they never hold up the workspace state lock.
+    """
+
+    def __init__(self):
+        self.modules: dict[str, dict] = {}
+        self.entries: dict[str, dict[str, dict[str, list]]] = {
+            DEFINITION: {},
+            IMPLEMENTATION: {},
+        }
+        self.loaded: set[str] = set()
+        self._save_timer: Optional[threading.Timer] = None
+        self._save_lock = threading.Lock()
+
+    def update_module(self, doc_uri: str, module: Optional[Module]) -> None:
+        """Re-indexes `doc_uri`, keeping its last entries if it did not compile."""
+        if not isinstance(module, Module) or module.sym_tab is None:
+            return
+        mod_path = doc_uri.replace("file://", "")
+        if doc_uri in self.loaded:
+            self.loaded.discard(doc_uri)
+            if self.modules[doc_uri]["mtime"] == _get_mtime(mod_path):
+                return
+        self.remove_module(doc_uri)
+        entries: dict[str, dict[str, list]] = {DEFINITION: {}, IMPLEMENTATION: {}}
+        sym_tabs = sym_tab_list(module.sym_tab, file_path=mod_path)
+        for sym in [sym for sym_tab in sym_tabs for sym in sym_tab.tab.values()]:
+            decl = sym.decl
+            if decl.loc.mod_path != mod_path or decl.loc.first_line < 1:
+                continue
+            if isinstance(decl, (AbilityDef, ArchDef)):
+                continue
+            key = get_decl_key(decl)
+            entries[DEFINITION][key] = _to_entry(decl.sym_name_node)
+            body = getattr(decl, "body", None)
+            if isinstance(body, AstImplOnlyNode):
+                entries[IMPLEMENTATION][key] = _to_entry(body)
+        for impl in module.get_all_sub_nodes(AbilityDef) + module.get_all_sub_nodes(
+            ArchDef
+        ):
+            if impl.loc.mod_path == mod_path and impl.decl_link is not None:
+                entries[IMPLEMENTATION][get_decl_key(impl)] = _to_entry(impl)
+        self._add_module(doc_uri, _get_mtime(mod_path), entries)
+
+    def remove_module(self, doc_uri: str) -> None:
+        self.loaded.discard(doc_uri)
+        module = self.modules.pop(doc_uri, None)
+        if module is None:
+            return
+        for kind in (DEFINITION, IMPLEMENTATION):
+            for key in module[kind]:
+                providers = self.entries[kind].get(key, {})
+                providers.pop(doc_uri, None)
+                if not providers:
+                    self.entries[kind].pop(key, None)
+
+    def get_definition(self, key: str) -> Optional[Location]:
+        return self._get(DEFINITION, key)
+
+    def get_implementation(self, key: str) -> Optional[Location]:
+        return self._get(IMPLEMENTATION, key)
+
+    def save(self, path: str) -> None:
+        # modules are replaced, never changed in place: a shallow copy is a snapshot
+        modules = dict(self.modules)
+        with self._save_lock:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(modules, f)
+                os.replace(tmp_path, path)
+            except OSError:
+                pass
+
+    def schedule_save(self, path: str, delay: float = SAVE_DELAY) -> None:
+        """Saves the index `delay` seconds from now, unless scheduled again."""
+        with self._save_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(delay, self.save, (path,))
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def load(self, path: str) -> None:
+        """Adds the saved modules whose file did not change since they were saved."""
+        try:
+            with open(path) as f:
+                modules = json.load(f)
+        except (OSError, ValueError):
+            return
+        for doc_uri, module in modules.items():
+            if module.get("mtime") == _get_mtime(doc_uri.replace("file://", "")):
+                self.remove_module(doc_uri)
+                self._add_module(doc_uri, module["mtime"], module)
+                self.loaded.add(doc_uri)
+
+    def _add_module(self, doc_uri: str, mtime: int, entries: dict) -> None:
+        self.modules[doc_uri] = {
+            "mtime": mtime,
+            DEFINITION: entries[DEFINITION],
+            IMPLEMENTATION: entries[IMPLEMENTATION],
+        }
+        for kind in (DEFINITION, IMPLEMENTATION):
+            for key, entry in entries[kind].items():
+                self.entries[kind].setdefault(key, {})[doc_uri] = entry
+
+    def _get(self, kind: str, key: str) -> Optional[Location]:
+        providers = self.entries[kind].get(key)
+        if not providers:
+            return None
+        uri, line, char, end_line, end_char = next(iter(providers.values()))
+        return Location(
+            uri=uri,
+            range=Range(
+                start=Position(line=line, character=char),
+                end=Position(line=end_line, character=end_char),
+            ),
+        )
+
+
+def get_index_path(root_path: str, cache_dir: str = CACHE_DIR) -> str:
+    """File the definition index of the workspace at `root_path` is saved to."""
+    root_hash = hashlib.sha1(os.path.abspath(root_path).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"definitions-{root_hash}.json")
+
+
+def _to_entry(node) -> list:
+    rng = get_node_range(node)
+    return [
+        f"file://{node.loc.mod_path}",
+        rng.start.line,
+        rng.start.character,
+        rng.end.line,
+        rng.end.character,
+    ]
+
+
+def _get_mtime(file_path: str) -> int:
+    try:
+        return os.stat(file_path).st_mtime_ns
+    except OSError:
+        return 0
@@ -1,9 +1,18 @@
+import difflib
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from lsprotocol.types import Position, Range, TextEdit
 from jaclang.compiler.passes.tool import (
     FuseCommentsPass,
     JacFormatPass,
 )
 from jaclang.compiler.transpiler import jac_str_to_pass
 
+from .line_index import LineIndex
+
 
 def format_jac(source: str) -> str:
     try:
@@ -15,3 +24,166 @@ def format_jac(source: str) -> str:
         ).ir.gen.jac
     except Exception:
         return source
+
+
+class FormatCache:
+    """
+    Formatter output by hash of the source.
+
+    A source the formatter leaves unchanged is recorded as canonical, and so
+    is the output of each format, so formatting a document again after its
+    edits were applied (or saving it unchanged) does not run the compiler.
+
+    Shared by the formatting handlers and the workspace command, which run on
+    different threads: entries are read and added under a lock, the formatter
+    runs outside it. Sources that do not parse (the formatter outputs nothing)
+    are not recorded.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        # None when the source is already formatted
+        self.entries: OrderedDict[str, Optional[str]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def format(self, source: str) -> str:
+        formatted = self.get(source)
+        if formatted is None:
+            formatted = format_jac(source)
+            self.add(source, formatted)
+        return formatted
+
+    def get(self, source: str) -> Optional[str]:
+        """Formatted `source`, or None if it was never formatted."""
+        key = _get_hash(source)
+        with self._lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            formatted = self.entries[key]
+        return source if formatted is None else formatted
+
+    def add(self, source: str, formatted: str) -> None:
+        if not formatted.strip():
+            return
+        source_key = _get_hash(source)
+        formatted_key = _get_hash(formatted)
+        with self._lock:
+            if formatted == source:
+                self._add(source_key, None)
+            else:
+                self._add(source_key, formatted)
+                self._add(formatted_key, None)
+
+    def _add(self, key: str, formatted: Optional[str]) -> None:
+        self.entries[key] = formatted
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+def format_ranges(
+    lines: LineIndex,
+    ranges: List[Range],
+    formatter: Callable[[str], str] = format_jac,
+) -> List[TextEdit]:
+    """
+    Formats the top level declarations overlapping `ranges`.
+
+    Each declaration (or run of adjacent ones) is formatted on its own, so the
+    cost depends on the size of the selection and not of the document. Those
+    that do not parse on their own are left as they are.
+    """
+    blocks: List[List[int]] = []
+    for first, last in sorted(_get_lines(rng) for rng in ranges):
+        start, end = get_declaration_lines(lines, first, last)
+        if blocks and start <= blocks[-1][1]:
+            blocks[-1][1] = max(blocks[-1][1], end)
+        else:
+            blocks.append([start, end])
+    edits = []
+    for start, end in blocks:
+        rng = Range(
+            start=Position(line=start, character=0),
+            end=lines.position_at(lines.starts[end - 1] + len(lines.get_line(end - 1))),
+        )
+        source = lines.text[lines.offset_at(rng.start) : lines.offset_at(rng.end)]
+        formatted = formatter(source).rstrip("\n")
+        if formatted.strip():
+            edits += get_text_edits(source, formatted, start)
+    return edits
+
+
+def get_text_edits(source: str, formatted: str, first_line: int = 0) -> List[TextEdit]:
+    """
+    Line edits turning `source` into `formatted` (none if they are the same).
+
+    `source` starts on `first_line` of the document. Only the runs of lines
+    that differ are replaced, so the client keeps its folding and cursor
+    around the untouched ones.
+    """
+    if formatted == source:
+        return []
+    old_lines = source.splitlines(keepends=True)
+    new_lines = formatted.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    edits = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        edits.append(
+            TextEdit(
+                range=Range(
+                    start=_get_line_start(old_lines, first_line, i1),
+                    end=_get_line_start(old_lines, first_line, i2),
+                ),
+                new_text="".join(new_lines[j1:j2]),
+            )
+        )
+    return edits
+
+
+def get_declaration_lines(lines: LineIndex, first: int, last: int) -> tuple[int, int]:
+    """
+    First and end lines of the top level declarations spanning `first`-`last`.
+
+    A declaration starts on an unindented line, and runs until the next one
+    (closing brackets and comments excluded); trailing blank lines are left out.
+    """
+    last = min(last, len(lines) - 1)
+    start = min(first, last)
+    while start > 0 and not _is_declaration_start(lines.get_line(start)):
+        start -= 1
+    end = last + 1
+    while end < len(lines) and not _is_declaration_start(lines.get_line(end)):
+        end += 1
+    while end > last + 1 and not lines.get_line(end - 1).strip():
+        end -= 1
+    return start, end
+
+
+def _is_declaration_start(line: str) -> bool:
+    return line[:1] not in ("", " ", "\t", "#", "}", ")", "]")
+
+
+def _get_hash(source: str) -> str:
+    return hashlib.sha1(source.encode()).hexdigest()
+
+
+def _get_line_start(lines: List[str], first_line: int, i: int) -> Position:
+    """Start of `lines[i]`, or the end of the text past the last line."""
+    if i < len(lines) or not lines or lines[-1].endswith("\n"):
+        return Position(line=first_line + i, character=0)
+    return Position(line=first_line + i - 1, character=len(lines[-1]))
+
+
+def _get_lines(rng: Range) -> tuple[int, int]:
+    """Lines of `rng`, without the last one when only its line break is selected."""
+    last = rng.end.line
+    if rng.end.character == 0 and last > rng.start.line:
+        last -= 1
+    return rng.start.line, last
@@ -0,0 +1,82 @@
+from typing import List, Optional
+
+from lsprotocol.types import SymbolKind, TypeHierarchyItem
+from jaclang.compiler.absyntree import Architype, AtomTrailer, Module, Name
+
+from .index import get_decl_key, get_node_range, get_qualified_name
+
+ARCH_TYPES = ["object", "node", "edge", "walker"]
+
+
+class InheritanceIndex:
+    """
+    Architype inheritance index, answering supertype and subtype queries.
+
+    Each `sub -> base` edge is owned by the module declaring the subclass, so a
+    rebuild only replaces the edges of the architypes declared in that module.
+    """
+
+    def __init__(self):
+        self.items: dict[str, TypeHierarchyItem] = {}
+        self.supertypes: dict[str, List[str]] = {}
+        self.subtypes: dict[str, dict[str, None]] = {}
+        self.module_edges: dict[str, List[tuple[str, str]]] = {}
+
+    def update_module(self, doc_uri: str, module: Optional[Module]) -> None:
+        """Replaces the architypes and edges contributed by `doc_uri`."""
+        self.remove_module(doc_uri)
+        if not isinstance(module, Module):
+            return
+        mod_path = doc_uri.replace("file://", "")
+        edges = []
+        for arch in module.get_all_sub_nodes(Architype):
+            if arch.loc.mod_path != mod_path or str(arch.sym_type) not in ARCH_TYPES:
+                continue
+            key = self._add_item(arch)
+            for base in _get_base_archs(arch):
+                edges.append((key, self._add_item(base)))
+        for sub, base in edges:
+            self.supertypes.setdefault(sub, []).append(base)
+            self.subtypes.setdefault(base, {})[sub] = None
+        self.module_edges[doc_uri] = edges
+
+    def remove_module(self, doc_uri: str) -> None:
+        for sub, base in self.module_edges.pop(doc_uri, []):
+            self.supertypes.pop(sub, None)
+            self.subtypes.get(base, {}).pop(sub, None)
+            if not self.subtypes.get(base, True):
+                del self.subtypes[base]
+        for key in [k for k in self.items if k.split("#")[0] == doc_uri]:
+            del self.items[key]
+
+    def get_item(self, key: str) -> Optional[TypeHierarchyItem]:
+        return self.items.get(key)
+
+    def get_supertypes(self, key: str) -> List[TypeHierarchyItem]:
+        return [self.items[k] for k in self.supertypes.get(key, []) if k in self.items]
+
+    def get_subtypes(self, key: str) -> List[TypeHierarchyItem]:
+        return [self.items[k] for k in self.subtypes.get(key, {}) if k in self.items]
+
+    def _add_item(self, arch: Architype) -> str:
+        key = get_decl_key(arch)
+        self.items[key] = TypeHierarchyItem(
+            name=arch.sym_name,
+            kind=SymbolKind.Class,
+            uri=f"file://{arch.loc.mod_path}",
+            range=get_node_range(arch),
+            selection_range=get_node_range(arch.sym_name_node),
+            detail=f"{arch.sym_type} {get_qualified_name(arch)}",
+            data=key,
+        )
+        return key
+
+
+def _get_base_archs(arch: Architype) -> List[Architype]:
+    bases = []
+    for expr in arch.base_classes.items if arch.base_classes else []:
+        name = expr.right if isinstance(expr, AtomTrailer) else expr
+        decl = name.sym_link.decl if isinstance(name, Name) and name.sym_link else None
+        if isinstance(decl, Architype):
+            bases.append(decl)
+    return bases
@@ -28,13 +28,15 @@ def get_hover_info(
     """
     symbol: Symbol = get_symbol_at_pos(ls, doc, pos)
     if symbol is not None:
-        return Hover(
-            contents=MarkupContent(
-                kind=MarkupKind.PlainText,
-                value="\n".join(
-                    [f"({symbol.sym_type}) {symbol.sym_name}", symbol.sym_doc]
-                ),
-            ),
-            range=symbol.location.range,
-        )
+        return get_symbol_hover(symbol)
     return None
+
+
+def get_symbol_hover(symbol: Symbol) -> Hover:
+    return Hover(
+        contents=MarkupContent(
+            kind=MarkupKind.PlainText,
+            value="\n".join([f"({symbol.sym_type}) {symbol.sym_name}", symbol.sym_doc]),
+        ),
+        range=symbol.location.range,
+    )
@@ -0,0 +1,230 @@
+import bisect
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+from lsprotocol.types import Position, Range
+from jaclang.compiler.absyntree import (
+    AstNode,
+    Ability,
+    AbilityDef,
+    Architype,
+    ArchDef,
+    Enum,
+)
+
+from .constants import LINE_OFFSET, CHAR_OFFSET
+
+SCOPE_NODES = (Architype, ArchDef, Enum, Ability, AbilityDef)
+
+if TYPE_CHECKING:
+    from .symbols import Symbol
+
+
+class SymbolIndex:
+    """
+    (name, kind) -> declarations index, kept per module and for the whole workspace.
+
+    Only declarations are indexed (top level symbols and their children), uses are
+    left out so a lookup never has to skip over them.
+
+    `scopes` keeps the line ranges of each module's declarations as a tree, each
+    level sorted by first line, so the scope at a position is found by
+    bisecting down the tree.
+    """
+
+    def __init__(self):
+        self.modules: dict[str, dict[tuple[str, str], List["Symbol"]]] = {}
+        self.scopes: dict[str, ScopeLevel] = {}
+        self.workspace: dict[tuple[str, str], List["Symbol"]] = {}
+        self.names: dict[str, set[str]] = {}
+        self.kinds: dict[str, set[str]] = {}
+
+    def update_module(self, doc_uri: str, symbols: Iterable["Symbol"]) -> None:
+        """Replaces the declarations indexed for `doc_uri` with `symbols`."""
+        self.remove_module(doc_uri)
+        mod_index: dict[tuple[str, str], List["Symbol"]] = {}
+        for sym in _iter_declarations(symbols):
+            try:
+                key = (sym.sym_name, sym.sym_type)
+            except Exception:
+                continue
+            mod_index.setdefault(key, []).append(sym)
+        self.modules[doc_uri] = mod_index
+        self.scopes[doc_uri] = _get_scope_level(symbols)
+        for key, syms in mod_index.items():
+            self.workspace.setdefault(key, []).extend(syms)
+            self.names.setdefault(key[0], set()).add(key[1])
+            self.kinds.setdefault(key[1], set()).add(key[0])
+
+    def remove_module(self, doc_uri: str) -> None:
+        """Drops every declaration coming from `doc_uri`."""
+        self.scopes.pop(doc_uri, None)
+        mod_index = self.modules.pop(doc_uri, None)
+        if not mod_index:
+            return
+        for key, syms in mod_index.items():
+            ids = {id(s) for s in syms}
+            remaining = [s for s in self.workspace.get(key, []) if id(s) not in ids]
+            if remaining:
+                self.workspace[key] = remaining
+            else:
+                self.workspace.pop(key, None)
+                self.names.get(key[0], set()).discard(key[1])
+                self.kinds.get(key[1], set()).discard(key[0])
+
+    def lookup(
+        self, name: str, sym_type: Optional[str] = None, doc_uris: List[str] = None
+    ) -> List["Symbol"]:
+        """
+        Returns the declarations of `name`, optionally filtered by kind.
+
+        Args:
+            name (str): The symbol name.
+            sym_type (str, optional): The symbol kind (walker, node, ability...).
+            doc_uris (list, optional): Restrict the lookup to these modules, in order.
+
+        Returns:
+            list: The matching declarations.
+        """
+        sym_types = [sym_type] if sym_type else sorted(self.names.get(name, ()))
+        if doc_uris is None:
+            return [s for t in sym_types for s in self.workspace.get((name, t), [])]
+        found = []
+        for doc_uri in doc_uris:
+            mod_index = self.modules.get(doc_uri, {})
+            for t in sym_types:
+                found += mod_index.get((name, t), [])
+        return found
+
+    def first(
+        self, name: str, sym_type: Optional[str] = None, doc_uris: List[str] = None
+    ) -> Optional["Symbol"]:
+        found = self.lookup(name, sym_type, doc_uris)
+        return found[0] if found else None
+
+    def of_kind(self, sym_type: str, doc_uris: List[str] = None) -> List["Symbol"]:
+        """Returns every declaration of the given kind."""
+        names = sorted(self.kinds.get(sym_type, ()))
+        return [s for name in names for s in self.lookup(name, sym_type, doc_uris)]
+
+    def get_scope(self, doc_uri: str, line: int) -> Optional["Symbol"]:
+        """Returns the innermost declaration of `doc_uri` whose lines contain `line`."""
+        scope = None
+        level = self.scopes.get(doc_uri)
+        while level is not None:
+            found = level.find(line)
+            if found is None:
+                break
+            scope, level = found
+        return scope
+
+
+class ScopeLevel:
+    """
+    Declarations sharing a parent, sorted by first line, with their children.
+
+    `max_ends[i]` is the last line reached by the first `i + 1` declarations,
+    which stops the backward scan for a declaration containing a line.
+    """
+
+    def __init__(self, scopes: list[tuple[int, int, int, "Symbol", "ScopeLevel"]]):
+        scopes.sort(key=lambda scope: scope[0])
+        self.starts = [scope[0] for scope in scopes]
+        self.scopes = scopes
+        self.max_ends = []
+        for scope in scopes:
+            self.max_ends.append(
+                max(scope[1], self.max_ends[-1] if self.max_ends else -1)
+            )
+
+    def find(self, line: int) -> Optional[tuple["Symbol", "ScopeLevel"]]:
+        """The first declared (in source order) of the declarations containing `line`."""
+        found = None
+        for i in range(bisect.bisect_right(self.starts, line) - 1, -1, -1):
+            if self.max_ends[i] < line:
+                break
+            _, end, order, sym, kids = self.scopes[i]
+            if end >= line and (found is None or order < found[0]):
+                found = (order, sym, kids)
+        return found[1:] if found is not None else None
+
+
+def _get_scope_level(symbols: Iterable["Symbol"]) -> ScopeLevel:
+    scopes = []
+    for order, sym in enumerate(symbols):
+        try:
+            if sym.is_use or sym.ws_symbol is None:
+                continue
+            loc = sym.node.loc
+            kids = _get_scope_level(sym.children)
+        except Exception:
+            continue
+        scopes.append(
+            (
+                loc.first_line - LINE_OFFSET,
+                loc.last_line - LINE_OFFSET,
+                order,
+                sym,
+                kids,
+            )
+        )
+    return ScopeLevel(scopes)
+
+
+def _iter_declarations(symbols: Iterable["Symbol"]) -> Iterable["Symbol"]:
+    for sym in symbols:
+        if sym.is_use:
+            continue
+        yield sym
+        try:
+            children = list(sym.children)
+        except Exception:
+            children = []
+        yield from _iter_declarations(children)
+
+
+def get_visible_uris(doc) -> List[str]:
+    """Returns the uris whose declarations are visible from `doc` (itself first)."""
+    uris = [doc.uri]
+    for dep_path in getattr(doc, "dependencies", {}).keys():
+        uris.append(f"file://{dep_path}")
+    return uris
+
+
+def get_node_range(node: AstNode) -> Range:
+    """Returns the LSP range covered by an AST node."""
+    return Range(
+        start=Position(
+            line=node.loc.first_line - LINE_OFFSET,
+            character=node.loc.col_start - CHAR_OFFSET,
+        ),
+        end=Position(
+            line=node.loc.last_line - LINE_OFFSET,
+            character=node.loc.col_end - CHAR_OFFSET,
+        ),
+    )
+
+
+def get_qualified_name(node: AstNode) -> str:
+    """
+    Returns the dotted name of a declaration inside its module, eg- `Room.greet`.
+
+    Impl blocks (`:node:Room:ability:greet`) resolve to the name of the declaration
+    they implement, so both (and the locals declared in them) share one name.
+    """
+    if isinstance(node, (AbilityDef, ArchDef)):
+        if node.decl_link is not None:
+            return get_qualified_name(node.decl_link)
+        return ".".join(arch.py_resolve_name() for arch in node.target.archs)
+    parent = node.parent
+    while parent is not None and not isinstance(parent, SCOPE_NODES):
+        parent = parent.parent
+    if parent is None:
+        return node.sym_name
+    return f"{get_qualified_name(parent)}.{node.sym_name}"
+
+
+def get_decl_key(node: AstNode) -> str:
+    """Returns a workspace unique key for a declaration: `<uri>#<qualified name>`."""
+    if isinstance(node, (AbilityDef, ArchDef)) and node.decl_link is not None:
+        node = node.decl_link
+    return f"file://{node.loc.mod_path}#{get_qualified_name(node)}"
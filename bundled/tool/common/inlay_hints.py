@@ -0,0 +1,261 @@
+import bisect
+import copy
+import threading
+from array import array
+from typing import List, Optional
+
+from lsprotocol.types import (
+    InlayHint,
+    InlayHintKind,
+    MarkupContent,
+    MarkupKind,
+    Position,
+    Range,
+)
+from jaclang.compiler.absyntree import (
+    Ability,
+    ArchHas,
+    Architype,
+    Assignment,
+    AstNode,
+    FuncCall,
+    FuncSignature,
+    KWPair,
+    Module,
+    Name,
+    SubNodeList,
+)
+
+from .line_index import LineIndex
+from .signatures import SignatureIndex, get_node_text
+
+LITERAL_TYPES = {
+    "Int": "int",
+    "Float": "float",
+    "String": "str",
+    "MultiString": "str",
+    "FString": "str",
+    "Bool": "bool",
+    "ListVal": "list",
+    "DictVal": "dict",
+    "SetVal": "set",
+    "TupleVal": "tuple",
+}
+
+
+# lines of a module whose hints are computed together
+HINT_BLOCK_LINES = 64
+
+
+class ModuleHints:
+    """
+    The nodes of a module that may carry hints, and the hints computed so far.
+
+    `lines` holds the first line of each node, in order, so the nodes of a
+    range are found by bisecting it. Hints are computed by blocks of
+    `HINT_BLOCK_LINES` lines when first requested. Each is kept with the
+    source it is anchored to (the variable it follows, the argument it
+    precedes) as `(hint, character, text)`, `text` starting at `character` of
+    the hint's line.
+    """
+
+    def __init__(self, nodes: List[AstNode]):
+        nodes.sort(key=lambda node: (node.loc.first_line, node.loc.col_start))
+        self.nodes = nodes
+        self.lines = array("I", [node.loc.first_line - 1 for node in nodes])
+        # lines spanned by the longest node, which may start before a range
+        self.max_span = max(
+            (node.loc.last_line - node.loc.first_line for node in nodes), default=0
+        )
+        self.blocks: dict[int, List[tuple[InlayHint, int, str]]] = {}
+
+    def get_block(self, block: int) -> List[tuple[InlayHint, int, str]]:
+        if block not in self.blocks:
+            start = bisect.bisect_left(self.lines, block * HINT_BLOCK_LINES)
+            end = bisect.bisect_left(self.lines, (block + 1) * HINT_BLOCK_LINES)
+            hints = []
+            for node in self.nodes[start:end]:
+                if isinstance(node, Assignment):
+                    hints += _get_type_hints(node)
+                else:
+                    hints += _get_parameter_hints(node)
+            self.blocks[block] = hints
+        return self.blocks[block]
+
+
+class InlayHintIndex:
+    """
+    Inlay hints of each module, computed lazily for the ranges requested.
+
+    When the module compiles, only the nodes that may carry hints are kept:
+    assignments without a type tag and calls. A request computes the hints
+    of the blocks of lines it covers (the type of variables first assigned a
+    literal or the result of a call, an architype or an ability with a return
+    type, and the parameter names of positional call arguments), and keeps
+    them until the module is rebuilt.
+
+    Hints come from the last successful compile, so like the symbol tokens
+    one is only returned while the document still has its anchor at the same
+    place; edited lines lose their hints until the next compile. Tooltips are
+    left to `inlayHint/resolve`.
+    """
+
+    def __init__(self):
+        self.modules: dict[str, ModuleHints] = {}
+        self._lock = threading.Lock()
+
+    def update_module(self, doc_uri: str, module: Optional[Module]) -> None:
+        self.remove_module(doc_uri)
+        if not isinstance(module, Module):
+            return
+        mod_path = doc_uri.replace("file://", "")
+        nodes = [
+            assign
+            for assign in module.get_all_sub_nodes(Assignment)
+            if assign.loc.mod_path == mod_path and assign.type_tag is None
+        ]
+        nodes += [
+            call
+            for call in module.get_all_sub_nodes(FuncCall)
+            if call.loc.mod_path == mod_path
+        ]
+        self.modules[doc_uri] = ModuleHints(nodes)
+
+    def remove_module(self, doc_uri: str) -> None:
+        self.modules.pop(doc_uri, None)
+
+    def get_range(self, doc_uri: str, rng: Range, lines: LineIndex) -> List[InlayHint]:
+        """Hints of `rng` whose anchors are still in place in the text of `lines`."""
+        module = self.modules.get(doc_uri)
+        if module is None:
+            return []
+        first = max(rng.start.line - module.max_span, 0) // HINT_BLOCK_LINES
+        last = rng.end.line // HINT_BLOCK_LINES
+        start = (rng.start.line, rng.start.character)
+        end = (rng.end.line, rng.end.character)
+        # requests run on several threads: blocks are computed one at a time
+        with self._lock:
+            anchored = [
+                entry
+                for block in range(first, last + 1)
+                for entry in module.get_block(block)
+                if start <= (entry[0].position.line, entry[0].position.character) <= end
+            ]
+        hints = [
+            hint
+            for hint, character, text in anchored
+            if lines.get_line(hint.position.line)[character : character + len(text)]
+            == text
+        ]
+        hints.sort(key=lambda hint: (hint.position.line, hint.position.character))
+        return hints
+
+
+def resolve_inlay_hint(signatures: SignatureIndex, hint: InlayHint) -> InlayHint:
+    """Returns a copy of `hint` with the signature of the callee it comes from."""
+    hint = copy.copy(hint)
+    data = hint.data if isinstance(hint.data, dict) else {}
+    if "callee" in data:
+        for sig in signatures.lookup(data["callee"], [data["uri"]]):
+            value = f"```jac\n{sig.label}\n```"
+            if sig.documentation:
+                value += f"\n---\n{sig.documentation}"
+            hint.tooltip = MarkupContent(kind=MarkupKind.Markdown, value=value)
+            break
+    return hint
+
+
+def _get_type_hints(assign: Assignment) -> List[tuple[InlayHint, int, str]]:
+    targets = assign.target.items
+    if len(targets) != 1 or not isinstance(targets[0], Name):
+        return []
+    target = targets[0]
+    if target.sym_link is None or target.sym_link.decl is not target:
+        return []  # only where the variable is declared
+    type_name, data = _get_value_type(assign.value)
+    if type_name is None:
+        return []
+    hint = InlayHint(
+        position=Position(
+            line=target.loc.last_line - 1, character=target.loc.col_end - 1
+        ),
+        label=f": {type_name}",
+        kind=InlayHintKind.Type,
+        data=data,
+    )
+    return [(hint, target.loc.col_start - 1, target.sym_name)]
+
+
+def _get_value_type(value: AstNode) -> tuple[Optional[str], Optional[dict]]:
+    if type(value).__name__ in LITERAL_TYPES:
+        return LITERAL_TYPES[type(value).__name__], None
+    callee = _get_callee(value) if isinstance(value, FuncCall) else None
+    if isinstance(callee, Architype):
+        return callee.sym_name, _get_callee_data(callee)
+    if (
+        isinstance(callee, Ability)
+        and isinstance(callee.signature, FuncSignature)
+        and callee.signature.return_type is not None
+    ):
+        return _get_text(callee.signature.return_type), _get_callee_data(callee)
+    return None, None
+
+
+def _get_parameter_hints(call: FuncCall) -> List[tuple[InlayHint, int, str]]:
+    callee = _get_callee(call)
+    if callee is None or call.params is None:
+        return []
+    names = _get_parameter_names(callee)
+    hints = []
+    for arg, name in zip(call.params.items, names):
+        if isinstance(arg, KWPair):
+            break
+        if isinstance(arg, Name) and arg.sym_name == name:
+            continue
+        hint = InlayHint(
+            position=Position(
+                line=arg.loc.first_line - 1, character=arg.loc.col_start - 1
+            ),
+            label=f"{name}:",
+            kind=InlayHintKind.Parameter,
+            padding_right=True,
+            data=_get_callee_data(callee),
+        )
+        hints.append((hint, hint.position.character, _get_text(arg).split("\n")[0]))
+    return hints
+
+
+def _get_callee(call: FuncCall) -> Optional[AstNode]:
+    target = call.target
+    if not isinstance(target, Name) or target.sym_link is None:
+        return None
+    decl = target.sym_link.decl
+    return decl if isinstance(decl, (Ability, Architype)) else None
+
+
+def _get_parameter_names(callee: AstNode) -> List[str]:
+    if isinstance(callee, Ability):
+        signature = callee.signature
+        if isinstance(signature, FuncSignature) and signature.params:
+            return [param.name.value for param in signature.params.items]
+        return []
+    if not isinstance(callee.body, SubNodeList):
+        return []
+    return [
+        var.name.value
+        for stmt in callee.body.items
+        if isinstance(stmt, ArchHas) and not stmt.is_static
+        for var in stmt.vars.items
+    ]
+
+
+def _get_text(node: AstNode) -> str:
+    """Source of `node`, read from the module it was parsed from."""
+    module = node.parent
+    while not isinstance(module, Module):
+        module = module.parent
+    return get_node_text(module.source.code, node)
+
+
+def _get_callee_data(callee: AstNode) -> dict:
+    return {"uri": f"file://{callee.loc.mod_path}", "callee": callee.sym_name}
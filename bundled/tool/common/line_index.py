@@ -0,0 +1,125 @@
+import bisect
+import re
+from array import array
+from typing import Optional
+
+from lsprotocol.types import Position, PositionEncodingKind, Range
+
+_NEWLINE = re.compile("\r\n|\r|\n")
+
+
+class LineIndex:
+    """
+    Start offsets of the lines of a document's text.
+
+    Lines are read and positions converted to offsets (and back) by indexing or
+    bisecting `starts`, without splitting the text. An edit gives a new index
+    with the offsets of the lines it touches updated and the ones after them
+    shifted, so the index follows `didChange` without rescanning the document;
+    an index is never changed, so readers on other threads can keep using it. `\r\n`, `\r` and `\n` all
+    end a line, as in the LSP specification.
+
+    Position characters are counted in the code units of `encoding`, the
+    position encoding negotiated with the client (UTF-16 unless the client
+    offered another one); offsets are python string indexes.
+
+    `text` is the source the offsets were computed for, referenced rather
+    than copied; an index whose `text` is not the document's current source
+    is stale.
+    """
+
+    def __init__(
+        self,
+        text: str,
+        encoding: str = PositionEncodingKind.Utf16,
+        starts: Optional[array] = None,
+    ):
+        self.text = text
+        self.encoding = encoding
+        if starts is None:
+            starts = array("I", [0])
+            starts.extend(m.end() for m in _NEWLINE.finditer(text))
+        self.starts = starts
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def get_line(self, line: int) -> str:
+        """Returns `line` without its line break ("" past the last line)."""
+        if line >= len(self.starts):
+            return ""
+        return self.text[self.starts[line] : self._get_line_end(line)]
+
+    def offset_at(self, pos: Position) -> int:
+        """Offset of `pos`, clamped to the end of its line (or of the text)."""
+        if pos.line >= len(self.starts):
+            return len(self.text)
+        start, end = self.starts[pos.line], self._get_line_end(pos.line)
+        line = self.text[start:end]
+        if self.encoding == PositionEncodingKind.Utf32 or line.isascii():
+            return min(start + pos.character, end)
+        units = 0
+        for i, char in enumerate(line):
+            if units >= pos.character:
+                return start + i
+            units += _get_units(char, self.encoding)
+        return end
+
+    def column_at(self, pos: Position) -> int:
+        """Index of `pos` in the string `get_line(pos.line)`."""
+        if pos.line >= len(self.starts):
+            return 0
+        return self.offset_at(pos) - self.starts[pos.line]
+
+    def position_at(self, offset: int) -> Position:
+        line = bisect.bisect_right(self.starts, offset) - 1
+        before = self.text[self.starts[line] : offset]
+        if self.encoding == PositionEncodingKind.Utf32 or before.isascii():
+            return Position(line=line, character=len(before))
+        units = sum(_get_units(char, self.encoding) for char in before)
+        return Position(line=line, character=units)
+
+    def with_change(self, text: str, rng: Optional[Range], source: str) -> "LineIndex":
+        """
+        Index of `source`, the text once `rng` (the whole text if None) is
+        replaced by `text`.
+
+        The line breaks are only looked for in `source` from the line before
+        `rng` (an edit may join a `\r` and a `\n`) to the end of its last
+        line; the offsets of the lines after it are shifted. An edit that does
+        not account for the length of `source` rebuilds the index.
+        """
+        start = end = 0
+        if rng is not None:
+            start, end = self.offset_at(rng.start), self.offset_at(rng.end)
+        delta = len(text) - (end - start)
+        if rng is None or len(self.text) + delta != len(source):
+            return LineIndex(source, self.encoding)
+        first = max(min(rng.start.line, len(self.starts) - 1) - 1, 0)
+        last = min(rng.end.line, len(self.starts) - 1)
+        scan_end = (
+            self.starts[last + 1] + delta
+            if last + 1 < len(self.starts)
+            else len(source)
+        )
+        starts = self.starts[: first + 1]
+        starts.extend(
+            m.end() for m in _NEWLINE.finditer(source, self.starts[first], scan_end)
+        )
+        starts.extend(offset + delta for offset in self.starts[last + 2 :])
+        return LineIndex(source, self.encoding, starts)
+
+    def _get_line_end(self, line: int) -> int:
+        """Offset of the line break ending `line`."""
+        if line + 1 >= len(self.starts):
+            return len(self.text)
+        end = self.starts[line + 1] - 1
+        if end > self.starts[line] and self.text[end - 1 : end + 1] == "\r\n":
+            end -= 1
+        return end
+
+
+def _get_units(char: str, encoding: str) -> int:
+    if encoding == PositionEncodingKind.Utf8:
+        return len(char.encode("utf-8"))
+    return 2 if ord(char) > 0xFFFF else 1
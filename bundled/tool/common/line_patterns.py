@@ -0,0 +1,137 @@
+import re
+from collections import Counter
+from typing import Hashable, Iterator, List, Optional
+
+from jaclang.compiler.absyntree import Module
+
+from .line_index import LineIndex
+
+MAX_CONTEXT_TOKENS = 4
+
+_TOKEN = re.compile(r"\w+|[^\w\s]+")
+_DECL = re.compile(r"(?:\w+\s+)?(node|walker|edge|obj|object|enum|can|test)\b")
+_IMPL = re.compile(r":(\w+):\w+(?::(can|ability):)?")
+
+
+class LinePatternIndex:
+    """
+    Recurring lines of the workspace, for whole line inline completions.
+
+    Every line is counted under the kind of declaration it is written in
+    (`walker`, `node`, `can`, ... or `module` for top level lines) and under its
+    first `MAX_CONTEXT_TOKENS` tokens, so the first words typed select the
+    `has`/`can` lines usually written there. Lines are also counted after the
+    line preceding them, to suggest the next line on an empty one.
+
+    Counts are kept per module and subtracted when the module is rebuilt.
+    """
+
+    def __init__(self):
+        self.patterns: dict[Hashable, Counter] = {}
+        self.modules: dict[str, Counter] = {}
+
+    def update_module(self, doc_uri: str, module: Optional[Module]) -> None:
+        self.remove_module(doc_uri)
+        if not isinstance(module, Module):
+            return
+        counts: Counter = Counter()
+        prev_line = None
+        for kind, line in get_line_kinds(module.source.code.splitlines()):
+            line = normalize(line)
+            if not line:
+                continue
+            tokens = tuple(_TOKEN.findall(line))
+            for i in range(min(len(tokens), MAX_CONTEXT_TOKENS) + 1):
+                counts[((kind, tokens[:i]), line)] += 1
+            if prev_line is not None:
+                counts[((kind, prev_line), line)] += 1
+            prev_line = line
+        self.modules[doc_uri] = counts
+        for (key, line), count in counts.items():
+            self.patterns.setdefault(key, Counter())[line] += count
+
+    def remove_module(self, doc_uri: str) -> None:
+        for (key, line), count in self.modules.pop(doc_uri, Counter()).items():
+            lines = self.patterns[key]
+            lines[line] -= count
+            if lines[line] <= 0:
+                del lines[line]
+            if not lines:
+                del self.patterns[key]
+
+    def suggest(
+        self, kind: str, typed: str, prev_line: Optional[str] = None, limit: int = 3
+    ) -> List[str]:
+        """
+        Returns the rest of the `limit` most frequent lines starting with `typed`.
+
+        Args:
+            kind (str): Declaration kind the line is written in.
+            typed (str): Text of the line before the cursor.
+            prev_line (str): Previous non blank line, used when nothing is typed.
+        """
+        typed_line = normalize(typed)
+        if typed_line and typed[-1].isspace():
+            typed_line += " "
+        if not typed_line:
+            key = (kind, normalize(prev_line or ""))
+        else:
+            tokens = _TOKEN.findall(typed_line)
+            if typed_line[-1].isalnum() or typed_line[-1] == "_":
+                tokens = tokens[:-1]  # the word being typed
+            key = (kind, tuple(tokens[:MAX_CONTEXT_TOKENS]))
+        matches = [
+            (-count, line)
+            for line, count in self.patterns.get(key, {}).items()
+            if line.startswith(typed_line) and line != typed_line
+        ]
+        return [line[len(typed_line) :] for _, line in sorted(matches)[:limit]]
+
+
+def normalize(line: str) -> str:
+    return " ".join(line.split())
+
+
+def get_line_kinds(lines: List[str]) -> Iterator[tuple[str, str]]:
+    """Yields (kind of the enclosing top level declaration, line) for each line."""
+    kind = "module"
+    for line in lines:
+        if line[:1].isspace() or not line.strip():
+            yield kind, line
+            continue
+        if line.startswith("}"):
+            yield kind, line
+            kind = "module"
+            continue
+        yield "module", line
+        kind = get_decl_kind(line)
+
+
+def get_line_context(lines: LineIndex, line: int, typed: str) -> tuple[str, str]:
+    """
+    Returns the declaration kind `line` is written in and the line before it.
+
+    Scans back only up to the enclosing top level line.
+    """
+    prev_line = ""
+    for i in range(line - 1, -1, -1):
+        text = lines.get_line(i)
+        if not prev_line and text.strip():
+            prev_line = text
+        if text[:1].isspace() or not text.strip():
+            continue
+        if typed[:1].isspace() or not typed:
+            return get_decl_kind(text) if text[0] != "}" else "module", prev_line
+        break
+    return "module", prev_line
+
+
+def get_decl_kind(line: str) -> str:
+    """Kind of the declaration starting at `line` ("module" if none)."""
+    impl = _IMPL.match(line)
+    if impl:
+        return "can" if impl.group(2) else impl.group(1)
+    decl = _DECL.match(line)
+    if decl:
+        return "object" if decl.group(1) == "obj" else decl.group(1)
+    return "module"
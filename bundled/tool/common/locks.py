@@ -0,0 +1,94 @@
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+
+class ReadWriteLock:
+    """
+    Lock of the workspace state: shared by readers, exclusive to one writer.
+
+    Read-only handlers run concurrently on the thread pool under `read()`;
+    rebuilds of the workspace, modules and dependency table run under
+    `write()`. Writers are preferred: once one waits, new readers queue
+    behind it so a rebuild is not starved by a stream of requests.
+
+    Both are reentrant. A writer may read; a reader that needs to write gives
+    up its reads while it writes and gets them back afterwards, so two such
+    readers cannot deadlock. Handlers should not rely on it: what they read is
+    no longer what it was before the write, so trees missing on first use are
+    built before the reads are taken (see `symbols.builds_doc_tree`).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = None
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        if self._writer == threading.get_ident():
+            yield
+            return
+        with self._cond:
+            if not self._get_reads():
+                while self._writer is not None or self._waiting_writers:
+                    self._cond.wait()
+            self._readers += 1
+        self._local.reads = self._get_reads() + 1
+        try:
+            yield
+        finally:
+            self._local.reads -= 1
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        if self._writer == threading.get_ident():
+            yield
+            return
+        reads = self._get_reads()
+        with self._cond:
+            self._readers -= reads
+            self._waiting_writers += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = threading.get_ident()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = None
+                self._readers += reads
+                self._cond.notify_all()
+
+    def _get_reads(self) -> int:
+        return getattr(self._local, "reads", 0)
+
+
+def reads_state(f: Callable) -> Callable:
+    """Runs the handler `f(ls, ...)` under the read lock of the workspace state."""
+
+    @functools.wraps(f)
+    def wrapper(ls, *args, **kwargs):
+        with ls.state_lock.read():
+            return f(ls, *args, **kwargs)
+
+    return wrapper
+
+
+def writes_state(f: Callable) -> Callable:
+    """Runs `f(ls, ...)` under the write lock of the workspace state."""
+
+    @functools.wraps(f)
+    def wrapper(ls, *args, **kwargs):
+        with ls.state_lock.write():
+            return f(ls, *args, **kwargs)
+
+    return wrapper
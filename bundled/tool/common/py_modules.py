@@ -0,0 +1,278 @@
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import pkgutil
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional
+
+from .constants import CACHE_DIR
+
+
+class ModuleNames(NamedTuple):
+    generation: int
+    names: List[str]
+    complete: bool
+
+
+class ModuleMembers(NamedTuple):
+    version: str
+    # name -> [kind, signature, doc]
+    members: dict[str, List[str]]
+    complete: bool
+
+
+class PyModuleCatalog:
+    """
+    Names of the python modules importable from the server's interpreter.
+
+    Nothing is scanned until the names are first asked for. The catalogue is
+    read from a disk cache keyed by the interpreter and its `sys.path` entries,
+    and rebuilt with `pkgutil` in a background thread once per session, so
+    packages installed since are picked up. The rebuilt catalogue replaces
+    the cache file, and those of the interpreter's previous `sys.path`. While
+    no cache exists, the previous names (or, at first, the standard library
+    ones) stand in and `complete` stays False.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.names: Optional[List[str]] = None
+        self.key: Optional[str] = None
+        self.complete = False
+        self.generation = 0
+        self.scanned: set[str] = set()
+        self._lock = threading.Lock()
+        self._refresh: Optional[threading.Thread] = None
+
+    def get_names(self) -> ModuleNames:
+        """
+        Returns the known module names right away, never walking `sys.path`.
+
+        `generation` changes whenever the names do, so anything built from them
+        can be cached under it.
+        """
+        key = get_cache_key()
+        with self._lock:
+            if key != self.key:
+                names = self._load(key)
+                if names is not None or self.names is None:
+                    self.names = STDLIB_NAMES if names is None else names
+                    self.generation += 1
+                self.key, self.complete = key, names is not None
+            if key not in self.scanned and self._refresh is None:
+                self._refresh = threading.Thread(target=self.refresh, daemon=True)
+                self._refresh.start()
+            return ModuleNames(self.generation, self.names, self.complete)
+
+    def refresh(self) -> None:
+        """Scans `sys.path` for modules and stores the result on disk."""
+        key = get_cache_key()
+        names = sorted(
+            {name for _, name, _ in pkgutil.iter_modules() if "_" not in name}
+        )
+        with self._lock:
+            if names != self.names:
+                self.generation += 1
+            self.names, self.key, self.complete = names, key, True
+            self.scanned.add(key)
+            self._refresh = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self._cache_path(key)}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(names, f)
+            os.replace(tmp_path, self._cache_path(key))
+            interpreter = key.split("-")[0]
+            for path in glob.glob(self._cache_path(f"{interpreter}-*")):
+                if path != self._cache_path(key):
+                    os.remove(path)
+        except OSError:
+            pass
+
+    def _load(self, key: str) -> Optional[List[str]]:
+        try:
+            with open(self._cache_path(key)) as f:
+                names = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return names if isinstance(names, list) else None
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"py_modules-{key}.json")
+
+
+def get_cache_key() -> str:
+    """Hash of the interpreter path, then hash of the `sys.path` entries."""
+    interpreter = hashlib.sha1(sys.executable.encode()).hexdigest()[:8]
+    paths = hashlib.sha1("\n".join(sys.path).encode()).hexdigest()[:8]
+    return f"{interpreter}-{paths}"
+
+
+STDLIB_NAMES = sorted(name for name in sys.stdlib_module_names if "_" not in name)
+
+INTROSPECTION_TIMEOUT = 1.0
+INTROSPECTION_MAX_TIME = 60.0
+MAX_DOC_LENGTH = 2000
+
+# runs in the worker: imports the module and writes its members to argv[2]. A
+# module that fails to import exits non-zero without writing, so it is retried
+# in a later session rather than cached as empty.
+_WORKER_SOURCE = f"""
+import importlib, inspect, json, os, sys
+members = {{}}
+try:
+    module = importlib.import_module(sys.argv[1])
+    names = dir(module)
+except BaseException:
+    sys.exit(1)
+for name in names:
+    try:
+        obj = getattr(module, name)
+        kind = (
+            "module" if inspect.ismodule(obj)
+            else "class" if inspect.isclass(obj)
+            else "function" if callable(obj)
+            else "variable"
+        )
+        try:
+            signature = str(inspect.signature(obj)) if callable(obj) else ""
+        except (TypeError, ValueError):
+            signature = ""
+        doc = (inspect.getdoc(obj) or "")[:{MAX_DOC_LENGTH}]
+        members[name] = (kind, signature, doc)
+    except Exception:
+        continue
+tmp_path = f"{{sys.argv[2]}}.{{os.getpid()}}.tmp"
+with open(tmp_path, "w") as f:
+    json.dump(members, f)
+os.replace(tmp_path, sys.argv[2])
+"""
+
+
+class PyMemberCache:
+    """
+    Members of python modules, for `import:py from X, ...` completions.
+
+    Modules are never imported by the server: a worker process imports them
+    and writes their members (kind, signature and doc) to a disk cache keyed by
+    the interpreter and the module file's path and mtime, so an upgraded package
+    is introspected again. The last `max_modules` lists are kept in memory.
+
+    A request waits `timeout` seconds for the worker. Slower imports go on in
+    the background, for at most `INTROSPECTION_MAX_TIME`, and are answered from
+    the disk cache once written.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = CACHE_DIR,
+        timeout: float = INTROSPECTION_TIMEOUT,
+        max_modules: int = 32,
+    ):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.max_modules = max_modules
+        self.members: OrderedDict[str, dict] = OrderedDict()
+        self.pending: dict[str, threading.Thread] = {}
+        self.failed: set[str] = set()
+        self._lock = threading.Lock()
+
+    def get_members(self, module: str) -> ModuleMembers:
+        version = get_module_version(module)
+        if version is None:
+            return ModuleMembers("", {}, True)
+        with self._lock:
+            if version in self.members:
+                self.members.move_to_end(version)
+                return ModuleMembers(version, self.members[version], True)
+        members = self._load(version)
+        if members is None and version not in self.failed:
+            self._introspect(module, version).join(self.timeout)
+            members = self._load(version)
+        if members is None:
+            return ModuleMembers(version, {}, version in self.failed)
+        with self._lock:
+            self.members[version] = members
+            while len(self.members) > self.max_modules:
+                self.members.popitem(last=False)
+        return ModuleMembers(version, members, True)
+
+    def _introspect(self, module: str, version: str) -> threading.Thread:
+        with self._lock:
+            if version not in self.pending:
+                self.pending[version] = threading.Thread(
+                    target=self._run_worker, args=(module, version), daemon=True
+                )
+                self.pending[version].start()
+            return self.pending[version]
+
+    def _run_worker(self, module: str, version: str) -> None:
+        returncode = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            proc = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-c",
+                    _WORKER_SOURCE,
+                    module,
+                    self._cache_path(version),
+                ],
+                env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                returncode = proc.wait(INTROSPECTION_MAX_TIME)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                if returncode != 0:
+                    self.failed.add(version)
+                del self.pending[version]
+
+    def _load(self, version: str) -> Optional[dict]:
+        try:
+            with open(self._cache_path(version)) as f:
+                members = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return members if isinstance(members, dict) else None
+
+    def _cache_path(self, version: str) -> str:
+        return os.path.join(self.cache_dir, f"py_members-{version}.json")
+
+
+def get_module_version(module: str) -> Optional[str]:
+    """
+    Hash of the interpreter and of the path and mtime of `module`'s file.
+
+    Found without importing the module; None when it can not be found.
+    """
+    try:
+        spec = importlib.util.find_spec(module)
+    except (ImportError, ValueError):
+        return None
+    if spec is None:
+        return None
+    origin = spec.origin or ""
+    try:
+        mtime = os.stat(origin).st_mtime_ns if os.path.isfile(origin) else 0
+    except OSError:
+        mtime = 0
+    version = f"{sys.executable}\n{module}\n{origin}\n{mtime}"
+    return hashlib.sha1(version.encode()).hexdigest()[:16]
+
+
+PY_MODULES = PyModuleCatalog()
+PY_MEMBERS = PyMemberCache()
@@ -0,0 +1,220 @@
+import os
+import bisect
+from typing import List, Optional
+
+from lsprotocol.types import (
+    OptionalVersionedTextDocumentIdentifier,
+    Position,
+    Range,
+    TextDocumentEdit,
+    TextEdit,
+    WorkspaceEdit,
+)
+from jaclang.compiler.absyntree import (
+    AstSymbolNode,
+    AbilityDef,
+    ArchDef,
+    Import,
+    Module,
+    ModuleItem,
+    ModulePath,
+    SpecialVarRef,
+)
+from jaclang.compiler.workspace import sym_tab_list
+from jaclang.utils.helpers import import_target_to_relative_path
+
+from .index import get_decl_key, get_node_range
+
+
+class UseIndex:
+    """
+    Declaration/use index for the workspace.
+
+    For every declaration key (see `get_decl_key`) it keeps the ranges of the
+    declared name and of all its uses, impl headers (`:node:X:ability:y`)
+    included, per module. It also records the `include:jac` paths of every
+    module so file renames can rewrite them.
+
+    The ranges are those of the last successful compile of each module; a
+    hash of the source it was compiled from tells whether they still hold for
+    the document's current text.
+    """
+
+    def __init__(self):
+        self.occurrences: dict[str, dict[str, List[Range]]] = {}
+        self.declarations: dict[str, str] = {}
+        self.module_occurrences: dict[str, List[tuple]] = {}
+        self.imports: dict[str, List[tuple[str, Range]]] = {}
+        self.sources: dict[str, int] = {}
+
+    def update_module(self, doc_uri: str, module: Optional[Module]) -> None:
+        """Re-indexes the occurrences found while compiling `doc_uri`."""
+        self.remove_module(doc_uri)
+        if not isinstance(module, Module) or module.sym_tab is None:
+            return
+        mod_path = doc_uri.replace("file://", "")
+        self.sources[doc_uri] = hash(module.source.code)
+        sym_tabs = sym_tab_list(module.sym_tab, file_path=mod_path)
+        found: dict[tuple[int, int], tuple[Range, str]] = {}
+        for sym in [sym for sym_tab in sym_tabs for sym in sym_tab.tab.values()]:
+            decl = sym.decl
+            if not _is_renameable(decl) or decl.loc.mod_path != mod_path:
+                continue
+            sym_range = get_node_range(decl.sym_name_node)
+            key = get_decl_key(decl)
+            found[(sym_range.start.line, sym_range.start.character)] = (sym_range, key)
+            self.declarations[key] = doc_uri
+        for use in [use for sym_tab in sym_tabs for use in sym_tab.uses]:
+            decl = use.sym_link.decl if use.sym_link else None
+            if not _is_renameable(decl) or isinstance(use.sym_name_node, SpecialVarRef):
+                continue
+            use_range = get_node_range(use.sym_name_node)
+            found[(use_range.start.line, use_range.start.character)] = (
+                use_range,
+                get_decl_key(decl),
+            )
+        entries = sorted((pos, rng, key) for pos, (rng, key) in found.items())
+        for _, rng, key in entries:
+            self.occurrences.setdefault(key, {}).setdefault(doc_uri, []).append(rng)
+        self.module_occurrences[doc_uri] = entries
+        self.imports[doc_uri] = [
+            (
+                f"file://{resolve_jac_import_path(mod_path, i.path.path_str)}",
+                _path_range(i.path),
+            )
+            for i in module.get_all_sub_nodes(Import)
+            if i.loc.mod_path == mod_path and i.lang.tag.value == "jac"
+        ]
+
+    def remove_module(self, doc_uri: str) -> None:
+        for _, _, key in self.module_occurrences.pop(doc_uri, []):
+            self.occurrences.get(key, {}).pop(doc_uri, None)
+            if not self.occurrences.get(key, True):
+                del self.occurrences[key]
+            if self.declarations.get(key) == doc_uri:
+                del self.declarations[key]
+        self.imports.pop(doc_uri, None)
+        self.sources.pop(doc_uri, None)
+
+    def is_current(self, doc_uri: str, source: str) -> bool:
+        """Whether `doc_uri` was indexed from `source`."""
+        return self.sources.get(doc_uri) == hash(source)
+
+    def find(self, doc_uri: str, pos: Position) -> Optional[tuple[str, Range]]:
+        """Returns the (key, range) of the occurrence under `pos`, if any."""
+        entries = self.module_occurrences.get(doc_uri, [])
+        i = bisect.bisect_right(entries, ((pos.line, pos.character),))
+        for _, rng, key in entries[max(i - 1, 0) : i + 1]:
+            if _contains(rng, pos):
+                return key, rng
+        return None
+
+    def get_locations(self, key: str) -> dict[str, List[Range]]:
+        return self.occurrences.get(key, {})
+
+    def get_rename_edit(
+        self, key: str, new_name: str, versions: dict[str, Optional[int]]
+    ) -> WorkspaceEdit:
+        """
+        Renames every occurrence of `key`, in the `versions` of the documents
+        they were indexed from (None for documents not open in the client).
+        """
+        return WorkspaceEdit(
+            document_changes=[
+                TextDocumentEdit(
+                    text_document=OptionalVersionedTextDocumentIdentifier(
+                        uri=uri, version=versions.get(uri)
+                    ),
+                    edits=[TextEdit(range=rng, new_text=new_name) for rng in ranges],
+                )
+                for uri, ranges in self.occurrences.get(key, {}).items()
+            ]
+        )
+
+    def get_file_rename_edit(self, renames: List[tuple[str, str]]) -> WorkspaceEdit:
+        """
+        Rewrites `include:jac` paths affected by moving files.
+
+        Args:
+            renames (list): (old_uri, new_uri) pairs.
+
+        Returns:
+            WorkspaceEdit: Edits on the importing files (keyed by their current uri).
+        """
+        moved = dict(renames)
+        changes: dict[str, List[TextEdit]] = {}
+        for importer, imports in self.imports.items():
+            for target, path_range in imports:
+                if target not in moved and importer not in moved:
+                    continue
+                old_path = get_jac_import_path(
+                    importer.replace("file://", ""), target.replace("file://", "")
+                )
+                new_path = get_jac_import_path(
+                    moved.get(importer, importer).replace("file://", ""),
+                    moved.get(target, target).replace("file://", ""),
+                )
+                if new_path != old_path:
+                    changes.setdefault(importer, []).append(
+                        TextEdit(range=path_range, new_text=new_path)
+                    )
+        return WorkspaceEdit(changes=changes)
+
+
+def get_indexed_versions(
+    index: UseIndex, workspace, key: str
+) -> Optional[dict[str, Optional[int]]]:
+    """
+    Versions of the documents `key` occurs in, or None if any of them was
+    edited since it was indexed (its ranges would land at shifted positions).
+    """
+    versions = {}
+    for uri in index.get_locations(key):
+        doc = workspace.get_text_document(uri)
+        if not index.is_current(uri, doc.source):
+            return None
+        # documents read from disk by fill_workspace are not open in the client
+        versions[uri] = doc.version or None
+    return versions
+
+
+def get_jac_import_path(file_path: str, target_path: str) -> str:
+    """
+    Returns the `include:jac` path of `target_path` as seen from `file_path`.
+
+    eg- `utils.math` for a sub folder, `..shared` for a file one folder up.
+    """
+    rel_path = os.path.relpath(target_path, start=os.path.dirname(file_path))
+    parts = os.path.splitext(rel_path)[0].split(os.sep)
+    levels = 0
+    while parts and parts[0] == "..":
+        levels += 1
+        parts.pop(0)
+    prefix = "." * (levels + 1) if levels else ""
+    return prefix + ".".join(parts)
+
+
+def resolve_jac_import_path(file_path: str, import_path: str) -> str:
+    """Returns the file an `include:jac` path points to, relative to `file_path`."""
+    return os.path.normpath(
+        import_target_to_relative_path(import_path, os.path.dirname(file_path))
+    )
+
+
+def _is_renameable(decl: Optional[AstSymbolNode]) -> bool:
+    return (
+        decl is not None
+        and decl.loc.first_line > 0
+        and not isinstance(decl, (ModulePath, ModuleItem, AbilityDef, ArchDef))
+    )
+
+
+def _path_range(path: ModulePath) -> Range:
+    first, last = get_node_range(path.path[0]), get_node_range(path.path[-1])
+    return Range(start=first.start, end=last.end)
+
+
+def _contains(rng: Range, pos: Position) -> bool:
+    start = (rng.start.line, rng.start.character)
+    end = (rng.end.line, rng.end.character)
+    return start <= (pos.line, pos.character) <= end
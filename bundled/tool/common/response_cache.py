@@ -0,0 +1,78 @@
+import threading
+from typing import Any, Callable, Hashable, Iterable
+
+# responses that depend on every module, dropped whenever any module rebuilds
+WORKSPACE_METHODS = {"references"}
+
+
+class ResponseCache:
+    """
+    Responses of position based requests, per document version and symbol.
+
+    Requests at different positions of the same symbol share a response, as
+    long as the document keeps its version. Only the latest version of each
+    document is kept; the responses of a document are dropped when it, or a
+    module it imports, is rebuilt.
+
+    Handlers run on several threads: the cache is only read and changed under
+    its lock, and responses are computed outside it. A response computed
+    across an invalidation is returned but not kept.
+    """
+
+    def __init__(self):
+        self.responses: dict[str, tuple[int, dict[Hashable, Any]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        method: str,
+        doc_uri: str,
+        version: int,
+        symbol_id: Hashable,
+        compute: Callable[[], Any],
+    ) -> Any:
+        key = (method, symbol_id)
+        with self._lock:
+            cached_version, responses = self.responses.get(doc_uri, (None, {}))
+            if cached_version != version:
+                responses = {}
+                self.responses[doc_uri] = (version, responses)
+            if key in responses:
+                self.hits += 1
+                return responses[key]
+            self.misses += 1
+            generation = self._generation
+        response = compute()
+        with self._lock:
+            current = self.responses.get(doc_uri, (None, None))[1]
+            if generation == self._generation and current is responses:
+                responses.setdefault(key, response)
+        return response
+
+    def invalidate(self, doc_uris: Iterable[str]) -> None:
+        """Drops the responses of `doc_uris`, and every workspace wide response."""
+        with self._lock:
+            self._generation += 1
+            for doc_uri in doc_uris:
+                if self.responses.pop(doc_uri, None) is not None:
+                    self.invalidations += 1
+            for _, responses in self.responses.values():
+                for key in [key for key in responses if key[0] in WORKSPACE_METHODS]:
+                    del responses[key]
+
+    def get_stats(self) -> dict:
+        """Counters and sizes, snapshotted under the lock."""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "documents": len(self.responses),
+                "responses": sum(len(r) for _, r in self.responses.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / requests if requests else 0.0,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,203 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from enum import IntEnum
+from typing import Callable, Optional
+
+# longest a checkpoint holds background work back, so it always progresses
+CHECKPOINT_MAX_PAUSE = 1.0
+# latencies kept per priority class for the stats
+LATENCY_SAMPLES = 1000
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # completion, hover, signature help: keystroke latency
+    VISIBLE = 1  # semantic tokens, diagnostics of the open documents
+    BACKGROUND = 2  # indexing, workspace wide work
+
+
+def scheduled(priority: Priority) -> Callable:
+    """Sets the priority class the scheduler runs a threaded handler with."""
+
+    def decorator(f):
+        f.priority = priority
+        return f
+
+    return decorator
+
+
+def get_priority(func: Callable) -> Priority:
+    """Priority of a handler, looked up through the partials pygls wraps it in."""
+    while not hasattr(func, "priority") and hasattr(func, "func"):
+        func = func.func
+    return getattr(func, "priority", Priority.VISIBLE)
+
+
+class Scheduler:
+    """
+    Runs work on a fixed set of threads, highest priority class first.
+
+    Used as the server's thread pool: pygls hands it the threaded handlers
+    through `apply_async`, and they run in priority order rather than in
+    arrival order. One worker is kept for interactive work, and at most one
+    runs background work, so a request typed by the user never waits for a
+    worker behind an index build.
+
+    Background work is time-sliced: long tasks call `checkpoint()` between
+    units of work, which pauses them while interactive or visible work is
+    queued or running. A checkpoint must not be reached while holding the
+    workspace state lock.
+
+    `shutdown()` cancels the queued work and stops the workers once the work
+    they are running is done.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max(max_workers, 2)
+        self._cond = threading.Condition()
+        self._queue: list = []
+        self._seq = itertools.count()
+        self._queued: Counter = Counter()
+        self._running: Counter = Counter()
+        self._workers: list[threading.Thread] = []
+        self._stopping = False
+        self._latencies = {p: deque(maxlen=LATENCY_SAMPLES) for p in Priority}
+
+    def submit(self, priority: Priority, func: Callable, *args, **kwargs) -> Future:
+        future: Future = Future()
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("cannot schedule new work after shutdown")
+            if not self._workers:
+                self._start_workers()
+            heapq.heappush(
+                self._queue,
+                (
+                    priority,
+                    next(self._seq),
+                    time.monotonic(),
+                    future,
+                    func,
+                    args,
+                    kwargs,
+                ),
+            )
+            self._queued[priority] += 1
+            self._cond.notify_all()
+        return future
+
+    def apply_async(
+        self,
+        func: Callable,
+        args: tuple = (),
+        kwds: Optional[dict] = None,
+        callback: Optional[Callable] = None,
+        error_callback: Optional[Callable] = None,
+    ) -> Future:
+        """`ThreadPool.apply_async`, run with the priority of the handler."""
+        future = self.submit(get_priority(func), func, *args, **(kwds or {}))
+
+        def done(future: Future) -> None:
+            if future.exception() is not None:
+                if error_callback is not None:
+                    error_callback(future.exception())
+            elif callback is not None:
+                callback(future.result())
+
+        future.add_done_callback(done)
+        return future
+
+    def checkpoint(self, max_pause: float = CHECKPOINT_MAX_PAUSE) -> None:
+        """Pauses background work while higher priority work is waiting or running."""
+        deadline = time.monotonic() + max_pause
+        with self._cond:
+            while self._has_foreground_work():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cancels the queued work and stops the workers, waiting for them with `wait`."""
+        with self._cond:
+            self._stopping = True
+            queue, self._queue = self._queue, []
+            self._queued.clear()
+            self._cond.notify_all()
+        for item in queue:
+            item[3].cancel()
+        if wait:
+            for worker in self._workers:
+                if worker is not threading.current_thread():
+                    worker.join()
+
+    def get_stats(self) -> dict:
+        """Recent tasks of each class, and their latency from queued to done."""
+        stats = {}
+        with self._cond:
+            for priority, latencies in self._latencies.items():
+                samples = sorted(latencies)
+                stats[priority.name.lower()] = {
+                    "tasks": len(samples),
+                    "queued": self._queued[priority],
+                    "running": self._running[priority],
+                    "p50Ms": _get_percentile(samples, 0.5),
+                    "p99Ms": _get_percentile(samples, 0.99),
+                }
+        return stats
+
+    def _start_workers(self) -> None:
+        for _ in range(self.max_workers):
+            worker = threading.Thread(target=self._work, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopping and not self._can_run_next():
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                priority, _, queued_at, future, func, args, kwargs = heapq.heappop(
+                    self._queue
+                )
+                self._queued[priority] -= 1
+                self._running[priority] += 1
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(func(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running[priority] -= 1
+                    self._latencies[priority].append(time.monotonic() - queued_at)
+                    self._cond.notify_all()
+
+    def _can_run_next(self) -> bool:
+        if not self._queue:
+            return False
+        priority = self._queue[0][0]
+        if priority == Priority.INTERACTIVE:
+            return True
+        busy = sum(self._running.values())
+        if priority == Priority.BACKGROUND and self._running[priority]:
+            return False
+        return busy < self.max_workers - 1
+
+    def _has_foreground_work(self) -> bool:
+        return any(
+            self._queued[p] or self._running[p]
+            for p in (Priority.INTERACTIVE, Priority.VISIBLE)
+        )
+
+
+def _get_percentile(samples: list, fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    return round(samples[min(int(len(samples) * fraction), len(samples) - 1)] * 1000, 2)
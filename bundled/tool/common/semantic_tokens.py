@@ -0,0 +1,436 @@
+import bisect
+import copy
+import itertools
+import threading
+from array import array
+from typing import Callable, Iterator, List, Optional, Sequence
+
+from lsprotocol.types import (
+    Range,
+    SemanticTokens,
+    SemanticTokensDelta,
+    SemanticTokensEdit,
+)
+from jaclang.compiler import jac_lark as jl
+from jaclang.compiler.absyntree import (
+    Ability,
+    ArchHas,
+    Architype,
+    AstImplOnlyNode,
+    AstSymbolNode,
+    Enum,
+    HasVar,
+    Module,
+    ParamVar,
+    SubNodeList,
+)
+from jaclang.compiler.parser import JacParser
+from jaclang.compiler.workspace import sym_tab_list
+
+from .constants import SEMANTIC_TOKEN_TYPES, SEMANTIC_TOKEN_MODIFIERS
+
+TOKEN_TYPES = {name: i for i, name in enumerate(SEMANTIC_TOKEN_TYPES)}
+TOKEN_MODIFIERS = {name: 1 << i for i, name in enumerate(SEMANTIC_TOKEN_MODIFIERS)}
+DECLARATION = TOKEN_MODIFIERS["declaration"]
+
+SYMBOL_TYPES = {
+    "mod_var": "variable",
+    "var": "variable",
+    "immutable": "variable",
+    "ability": "function",
+    "object": "class",
+    "node": "class",
+    "edge": "class",
+    "walker": "class",
+    "enum": "enum",
+    "test": "function",
+    "type": "typeParameter",
+    "impl": "method",
+    "field": "property",
+    "method": "method",
+    "constructor": "method",
+    "enum_member": "enumMember",
+}
+
+LEXICAL_TYPES = {
+    "COMMENT": "comment",
+    "STRING": "string",
+    "DOC_STRING": "string",
+    "INT": "number",
+    "FLOAT": "number",
+    "HEX": "number",
+    "BIN": "number",
+    "OCT": "number",
+    "BOOL": "keyword",
+    "NULL": "keyword",
+    "DECOR_OP": "decorator",
+    "ELVIS_OP": "operator",
+}
+# the name following these tokens is the one being declared
+DECLARING_TOKENS = {
+    "KW_CAN": "function",
+    "KW_TEST": "function",
+    "KW_HAS": "property",
+    "KW_OBJECT": "class",
+    "KW_NODE": "class",
+    "KW_EDGE": "class",
+    "KW_WALKER": "class",
+    "KW_ENUM": "enum",
+    "OBJECT_OP": "class",
+    "NODE_OP": "class",
+    "EDGE_OP": "class",
+    "WALKER_OP": "class",
+    "ENUM_OP": "enum",
+    "ABILITY_OP": "method",
+}
+UNCLASSIFIED = {
+    "WS",
+    "NAME",
+    "KWESC_NAME",
+    "LBRACE",
+    "RBRACE",
+    "LPAREN",
+    "RPAREN",
+    "LSQUARE",
+    "RSQUARE",
+    "COMMA",
+    "SEMI",
+    "COLON",
+    "DOT",
+}
+
+# result ids are never reused, even when the workspace (and its cache) is rebuilt,
+# so a stale `previousResultId` can never match a newer array
+_result_ids = itertools.count(1)
+_lexer = None
+
+
+def encode_tokens(tokens: Sequence[int]) -> array:
+    """
+    Encodes absolute tokens into the relative LSP semantic tokens array.
+
+    Args:
+        tokens (Sequence): [line, startChar, length, tokenType, tokenModifiers] * n,
+            sorted by position.
+
+    Returns:
+        array: [deltaLine, deltaStart, length, tokenType, tokenModifiers] * n.
+            Tokens starting inside the previous token are dropped.
+    """
+    data = array("I", [0]) * len(tokens)
+    size = 0
+    prev_line = prev_char = prev_end = 0
+    for i in range(0, len(tokens), 5):
+        line, char = tokens[i], tokens[i + 1]
+        if size and line == prev_line and char < prev_end:
+            continue
+        data[size] = line - prev_line
+        data[size + 1] = char - prev_char if line == prev_line else char
+        data[size + 2] = tokens[i + 2]
+        data[size + 3] = tokens[i + 3]
+        data[size + 4] = tokens[i + 4]
+        prev_line, prev_char, prev_end = line, char, char + tokens[i + 2]
+        size += 5
+    del data[size:]
+    return data
+
+
+def get_token_edits(old: Sequence[int], new: Sequence[int]) -> List[SemanticTokensEdit]:
+    """Returns the single edit turning `old` into `new`, or none if they are equal."""
+    if old == new:
+        return []
+    start = 0
+    max_start = min(len(old), len(new))
+    while start < max_start and old[start] == new[start]:
+        start += 1
+    end = 0
+    max_end = max_start - start
+    while end < max_end and old[-end - 1] == new[-end - 1]:
+        end += 1
+    return [
+        SemanticTokensEdit(
+            start=start,
+            delete_count=len(old) - start - end,
+            data=list(new[start : len(new) - end]),
+        )
+    ]
+
+
+def get_symbol_tokens(module: Module, mod_path: str) -> array:
+    """
+    Absolute tokens of the declarations and uses compiled from `mod_path`.
+
+    Written in a single pass over the module's symbol tables into a buffer sized
+    for all of them, computing the token modifiers along the way, then sorted
+    by position (keeping the first token at a position) for the merge in
+    `get_document_tokens`.
+    """
+    sym_tabs = sym_tab_list(module.sym_tab, file_path=mod_path)
+    tokens = array("I", [0]) * (5 * sum(len(t.tab) + len(t.uses) for t in sym_tabs))
+    size = 0
+    for tab in sym_tabs:
+        for node, decl in itertools.chain(
+            ((sym.decl, sym.decl) for sym in tab.tab.values()),
+            ((use, use.sym_link.decl) for use in tab.uses if use.sym_link),
+        ):
+            loc = node.sym_name_node.loc
+            if loc.mod_path != mod_path or loc.first_line < 1:
+                continue
+            if loc.first_line != loc.last_line:
+                continue
+            tokens[size] = loc.first_line - 1
+            tokens[size + 1] = loc.col_start - 1
+            tokens[size + 2] = loc.col_end - loc.col_start
+            tokens[size + 3] = get_token_type(decl)
+            tokens[size + 4] = get_token_modifiers(decl, node is decl)
+            size += 5
+    del tokens[size:]
+    return _sort_tokens(tokens)
+
+
+def get_token_type(decl: AstSymbolNode) -> int:
+    if isinstance(decl, ParamVar):
+        return TOKEN_TYPES["parameter"]
+    if isinstance(decl, Ability) and decl.is_method:
+        return TOKEN_TYPES["method"]
+    return TOKEN_TYPES[SYMBOL_TYPES.get(str(decl.sym_type), "keyword")]
+
+
+def get_token_modifiers(decl: AstSymbolNode, is_declaration: bool) -> int:
+    """Modifier bits of an occurrence of `decl` (`is_declaration` at its name)."""
+    modifiers = 0
+    if is_declaration:
+        modifiers |= DECLARATION
+        has_body = isinstance(decl, (Ability, Architype, Enum)) and isinstance(
+            decl.body, SubNodeList
+        )
+        if has_body or isinstance(decl, AstImplOnlyNode):
+            modifiers |= TOKEN_MODIFIERS["definition"]
+    has_stmt = decl.parent.parent if isinstance(decl, HasVar) else None
+    if str(decl.sym_type) in ("immutable", "enum_member") or (
+        isinstance(has_stmt, ArchHas) and has_stmt.is_frozen
+    ):
+        modifiers |= TOKEN_MODIFIERS["readonly"]
+    if (isinstance(decl, Ability) and decl.is_static) or (
+        isinstance(has_stmt, ArchHas) and has_stmt.is_static
+    ):
+        modifiers |= TOKEN_MODIFIERS["static"]
+    return modifiers
+
+
+def get_document_tokens(source: str, resolved: Optional["TokenIndex"] = None) -> array:
+    """
+    Classifies `source` with the lexer alone, then overlays symbol table tokens.
+
+    Returns the absolute tokens sorted by position, five ints each.
+
+    Works on sources that do not compile. A token in `resolved` (from the last
+    successful compile) only replaces a name the lexer still finds at the same
+    place, so stale symbol positions never colour edited text. The lexer yields
+    tokens in order, so they are written straight into the buffer and the
+    symbol tokens are merged in as the lexer reaches them.
+    """
+    # a token spans at least one character, this is rarely outgrown
+    tokens = array("I", [0]) * (5 * (len(source) // 4 + 1))
+    size = 0
+    positions = resolved.positions if resolved is not None else ()
+    next_resolved = 0
+    declaring = None
+    for tok in _lex(source):
+        line, char = tok.line - 1, tok.column - 1
+        token_type = None
+        if tok.type == "NAME":
+            next_resolved = bisect.bisect_left(
+                positions, line << 32 | char, next_resolved
+            )
+            if (
+                next_resolved < len(positions)
+                and positions[next_resolved] == line << 32 | char
+                and resolved.tokens[5 * next_resolved + 2] == len(tok.value)
+            ):
+                if size == len(tokens):
+                    tokens.extend(tokens)
+                start = 5 * next_resolved
+                tokens[size : size + 5] = resolved.tokens[start : start + 5]
+                size += 5
+                declaring = None
+                continue
+            token_type = declaring
+        elif tok.type not in UNCLASSIFIED:
+            token_type = _get_lexical_type(tok.type)
+        if token_type is not None:
+            modifiers = DECLARATION if tok.type == "NAME" else 0
+            # tokens can not span lines, multi line strings are split
+            for i, text in enumerate(tok.value.split("\n")):
+                if not text:
+                    continue
+                if size == len(tokens):
+                    tokens.extend(tokens)
+                tokens[size] = line + i
+                tokens[size + 1] = char if i == 0 else 0
+                tokens[size + 2] = len(text)
+                tokens[size + 3] = TOKEN_TYPES[token_type]
+                tokens[size + 4] = modifiers
+                size += 5
+        if tok.type not in ("WS", "COMMENT"):
+            declaring = DECLARING_TOKENS.get(tok.type)
+    del tokens[size:]
+    return tokens
+
+
+def _sort_tokens(tokens: array) -> array:
+    """Sorts absolute tokens by position, keeping the first one at each position."""
+    positions = [tokens[i] << 32 | tokens[i + 1] for i in range(0, len(tokens), 5)]
+    result = array("I", [0]) * len(tokens)
+    size = 0
+    previous = None
+    for i in sorted(range(len(positions)), key=positions.__getitem__):
+        if positions[i] == previous:
+            continue
+        previous = positions[i]
+        result[size : size + 5] = tokens[5 * i : 5 * i + 5]
+        size += 5
+    del result[size:]
+    return result
+
+
+def _get_lexical_type(tok_type: str) -> str:
+    if tok_type in LEXICAL_TYPES:
+        return LEXICAL_TYPES[tok_type]
+    if tok_type.startswith("TYP_"):
+        return "type"
+    if tok_type.startswith("KW_") or tok_type.endswith("_OP"):
+        return "keyword"
+    return "operator"
+
+
+def is_name(text: str) -> bool:
+    """Whether `text` lexes as a single name (not a keyword), eg- a new identifier."""
+    tokens = list(itertools.islice(_lex(text), 2))
+    return len(tokens) == 1 and tokens[0].type == "NAME" and tokens[0].value == text
+
+
+def _lex(source: str) -> Iterator[jl.Token]:
+    """Lexes `source` in one pass, skipping characters the lexer can not match."""
+    global _lexer
+    if _lexer is None:
+        # f-string pieces only lex inside f-strings, which needs the parser state
+        conf = copy.copy(JacParser.parser.lexer_conf)
+        conf.terminals = [t for t in conf.terminals if not t.name.startswith("FSTR_")]
+        conf.ignore, conf.callbacks, conf.skip_validation = (), {}, True
+        _lexer = jl.BasicLexer(conf)
+    state = jl.LexerState(source)
+    while True:
+        try:
+            yield _lexer.next_token(state)
+        except EOFError:
+            return
+        except jl.UnexpectedCharacters:
+            state.line_ctr.feed(source[state.line_ctr.char_pos])
+
+
+class TokenIndex:
+    """
+    Absolute tokens of a document version sorted by position, for range queries.
+
+    `positions` packs each token start as `line << 32 | char` so a range is found
+    by bisecting a flat array.
+    """
+
+    def __init__(self, tokens: array, version: int = 0):
+        self.tokens = tokens
+        self.positions = array(
+            "Q", [tokens[i] << 32 | tokens[i + 1] for i in range(0, len(tokens), 5)]
+        )
+        self.version = version
+
+    def get_range(self, rng: Range) -> array:
+        start = bisect.bisect_left(
+            self.positions, rng.start.line << 32 | rng.start.character
+        )
+        end = bisect.bisect_left(self.positions, rng.end.line << 32 | rng.end.character)
+        return self.tokens[5 * start : 5 * end]
+
+    def encode(self, rng: Optional[Range] = None) -> array:
+        return encode_tokens(self.tokens if rng is None else self.get_range(rng))
+
+
+class SemanticTokensCache:
+    """
+    Semantic tokens state of the open documents.
+
+    Keeps the symbol table tokens of each document until its module is rebuilt,
+    the token index of its current version, and the last full array sent for it
+    together with its result id. The state is only read and changed under the
+    lock; token indexes are built outside it, and one built across an
+    invalidation is returned but not kept.
+    """
+
+    def __init__(self):
+        self.symbol_tokens: dict[str, TokenIndex] = {}
+        self.indexes: dict[str, TokenIndex] = {}
+        self.results: dict[str, tuple[str, array]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_index(
+        self,
+        doc_uri: str,
+        source: str,
+        version: int,
+        get_symbol_tokens: Callable[[], TokenIndex],
+    ) -> TokenIndex:
+        """
+        Token index of `source` as version `version` of `doc_uri`.
+
+        The symbol tokens are taken from `get_symbol_tokens` when the document
+        has none since its module was last rebuilt.
+        """
+        with self._lock:
+            index = self.indexes.get(doc_uri)
+            if index is not None and index.version == version:
+                return index
+            symbol_tokens = self.symbol_tokens.get(doc_uri)
+            generation = self._generation
+        if symbol_tokens is None:
+            symbol_tokens = get_symbol_tokens()
+        index = TokenIndex(get_document_tokens(source, symbol_tokens), version)
+        with self._lock:
+            current = self.indexes.get(doc_uri)
+            if generation == self._generation and (
+                current is None or current.version <= version
+            ):
+                self.symbol_tokens.setdefault(doc_uri, symbol_tokens)
+                self.indexes[doc_uri] = index
+        return index
+
+    def full(self, doc_uri: str, data: array) -> SemanticTokens:
+        result_id = str(next(_result_ids))
+        with self._lock:
+            self.results[doc_uri] = (result_id, data)
+        return SemanticTokens(data=data.tolist(), result_id=result_id)
+
+    def delta(
+        self, doc_uri: str, previous_result_id: Optional[str], data: array
+    ) -> SemanticTokens | SemanticTokensDelta:
+        """
+        Returns the edits from the array sent as `previous_result_id` to `data`.
+
+        Falls back to the full array when that result is no longer known.
+        """
+        result_id = str(next(_result_ids))
+        with self._lock:
+            previous = self.results.get(doc_uri)
+            self.results[doc_uri] = (result_id, data)
+        if previous is None or previous[0] != previous_result_id:
+            return SemanticTokens(data=data.tolist(), result_id=result_id)
+        return SemanticTokensDelta(
+            edits=get_token_edits(previous[1], data), result_id=result_id
+        )
+
+    def invalidate(self, doc_uri: str) -> None:
+        """Drops the tokens of `doc_uri`; the last result is kept for deltas."""
+        with self._lock:
+            self._generation += 1
+            self.symbol_tokens.pop(doc_uri, None)
+            self.indexes.pop(doc_uri, None)
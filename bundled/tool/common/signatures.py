@@ -0,0 +1,221 @@
+import re
+from typing import List, Optional
+
+from lsprotocol.types import (
+    ParameterInformation,
+    Position,
+    SignatureHelp,
+    SignatureInformation,
+)
+from jaclang.compiler.absyntree import (
+    Ability,
+    ArchHas,
+    Architype,
+    AstNode,
+    FuncSignature,
+    Module,
+    SubNodeList,
+)
+
+from .line_index import LineIndex
+
+# how far back the open paren of a call is looked for
+MAX_CALL_LINES = 10
+
+# the name called before an open paren, and the receiver of a method call
+_CALLEE = re.compile(r"(?:([\w<>]+)\s*\.\s*)?(\w+)\s*$")
+_CLOSING = {")": "(", "]": "[", "}": "{"}
+
+
+class SignatureIndex:
+    """
+    Parameter lists of the abilities and architypes of each module, by name.
+
+    Built from the IR when a module compiles: the parameters of an ability, or
+    the `has` fields of an architype (its constructor), with their types and
+    defaults as written in the source. Each signature is kept with the name
+    of the architype owning the ability (None for free abilities and
+    constructors), to tell methods from functions at the call.
+    """
+
+    def __init__(self):
+        self.modules: dict[
+            str, dict[str, List[tuple[Optional[str], SignatureInformation]]]
+        ] = {}
+
+    def update_module(self, doc_uri: str, module: Optional[Module]) -> None:
+        self.remove_module(doc_uri)
+        if not isinstance(module, Module):
+            return
+        mod_path = doc_uri.replace("file://", "")
+        code = module.source.code
+        signatures: dict[str, List[tuple[Optional[str], SignatureInformation]]] = {}
+        for ability in module.get_all_sub_nodes(Ability):
+            if ability.loc.mod_path != mod_path or not isinstance(
+                ability.signature, FuncSignature
+            ):
+                continue
+            params = ability.signature.params.items if ability.signature.params else []
+            return_type = ability.signature.return_type
+            signatures.setdefault(ability.sym_name, []).append(
+                (
+                    _get_owner(ability),
+                    _get_signature(
+                        ability.sym_name,
+                        [get_node_text(code, param) for param in params],
+                        f" -> {get_node_text(code, return_type)}"
+                        if return_type
+                        else "",
+                        ability.doc,
+                    ),
+                )
+            )
+        for arch in module.get_all_sub_nodes(Architype):
+            if arch.loc.mod_path != mod_path or not isinstance(arch.body, SubNodeList):
+                continue
+            fields = [
+                get_node_text(code, var)
+                for stmt in arch.body.items
+                if isinstance(stmt, ArchHas) and not stmt.is_static
+                for var in stmt.vars.items
+            ]
+            signatures.setdefault(arch.sym_name, []).append(
+                (None, _get_signature(arch.sym_name, fields, "", arch.doc))
+            )
+        self.modules[doc_uri] = signatures
+
+    def remove_module(self, doc_uri: str) -> None:
+        self.modules.pop(doc_uri, None)
+
+    def lookup(
+        self, name: str, doc_uris: List[str], receiver: Optional[str] = None
+    ) -> List[SignatureInformation]:
+        """
+        Signatures `name` may call, one per owner, the first of `doc_uris` first.
+
+        A method call (with a `receiver`) only matches abilities of an
+        architype, narrowed to those of the receiver when it names one; a plain
+        call only matches free abilities and constructors. When that leaves
+        nothing, every signature of `name` is returned.
+        """
+        found: dict[Optional[str], SignatureInformation] = {}
+        for uri in doc_uris:
+            for owner, sig in self.modules.get(uri, {}).get(name, []):
+                found.setdefault(owner, sig)
+        if receiver is not None and receiver in found:
+            return [found[receiver]]
+        matching = [
+            sig for owner, sig in found.items() if (owner is None) == (receiver is None)
+        ]
+        return matching or list(found.values())
+
+    def get_signature_help(
+        self, lines: LineIndex, pos: Position, doc_uris: List[str]
+    ) -> Optional[SignatureHelp]:
+        """Signature of the call the cursor is in, with the argument it is on."""
+        call = find_call(lines, pos)
+        if call is None:
+            return None
+        receiver, name, active_parameter = call
+        signatures = self.lookup(name, doc_uris, receiver)
+        if not signatures:
+            return None
+        return SignatureHelp(
+            signatures=signatures,
+            active_signature=0,
+            active_parameter=active_parameter,
+        )
+
+
+def find_call(
+    lines: LineIndex, pos: Position
+) -> Optional[tuple[Optional[str], str, int]]:
+    """
+    Finds the unclosed `(` of a call before `pos`.
+
+    Scans forward from a few lines up, skipping strings and comments, and
+    keeps the open brackets with the commas seen in each. Returns the
+    receiver (for a method call), the name called and the index of the
+    argument at `pos`, or None when the cursor is not inside call parentheses.
+    """
+    # [bracket, callee match, commas] of the open brackets
+    stack: list = []
+    quote = None
+    first_line = max(pos.line - MAX_CALL_LINES, 0)
+    for line_no in range(first_line, pos.line + 1):
+        text = lines.get_line(line_no)
+        if line_no == pos.line:
+            text = text[: lines.column_at(pos)]
+        i = 0
+        while i < len(text):
+            char = text[i]
+            if quote is not None:
+                if char == "\\":
+                    i += 2
+                    continue
+                if text.startswith(quote, i):
+                    i += len(quote)
+                    quote = None
+                    continue
+                i += 1
+                continue
+            if char in "'\"":
+                quote = char * 3 if text.startswith(char * 3, i) else char
+                i += len(quote)
+                continue
+            if text.startswith("#*", i):
+                quote = "*#"
+                i += 2
+                continue
+            if char == "#":
+                break
+            if char in "([{":
+                stack.append([char, _CALLEE.search(text[:i]), 0])
+            elif char in _CLOSING:
+                if stack:
+                    stack.pop()
+            elif char == "," and stack:
+                stack[-1][2] += 1
+            elif char == ";":
+                # a statement ends: drop what it left open, up to its block
+                while stack and stack[-1][0] != "{":
+                    stack.pop()
+            i += 1
+        if quote in ("'", '"'):
+            quote = None  # single quoted strings end with the line
+    if not stack or stack[-1][0] != "(" or stack[-1][1] is None:
+        return None
+    _, callee, commas = stack[-1]
+    return callee.group(1), callee.group(2), commas
+
+
+def _get_signature(
+    name: str, params: List[str], suffix: str, doc: Optional[AstNode]
+) -> SignatureInformation:
+    label = f"{name}("
+    parameters = []
+    for i, param in enumerate(params):
+        if i:
+            label += ", "
+        parameters.append(
+            ParameterInformation(label=(len(label), len(label) + len(param)))
+        )
+        label += param
+    return SignatureInformation(
+        label=f"{label}){suffix}",
+        documentation=doc.value[3:-3].strip() if doc else None,
+        parameters=parameters,
+    )
+
+
+def _get_owner(ability: Ability) -> Optional[str]:
+    """Name of the architype `ability` is a method of, None for free abilities."""
+    node = ability.parent
+    while node is not None and not isinstance(node, (Architype, Ability, Module)):
+        node = node.parent
+    return node.sym_name if isinstance(node, Architype) else None
+
+
+def get_node_text(code: str, node: AstNode) -> str:
+    """Source of `node` in `code`, on one line."""
+    return " ".join(code[node.loc.pos_start : node.loc.pos_end].split())
@@ -1,6 +1,7 @@
+import functools
 import os
 from pathlib import Path
-from typing import List
+from typing import Callable, List
 
 from pygls.server import LanguageServer
 from lsprotocol.types import (
@@ -13,9 +14,13 @@ from lsprotocol.types import (
     DocumentSymbol,
 )
 
-from jaclang.compiler.workspace import Workspace
+from jaclang.compiler.workspace import ModuleInfo, Workspace
+from jaclang.compiler.passes.main import DefUsePass
+from jaclang.compiler.transpiler import jac_str_to_pass
 from jaclang.compiler.absyntree import (
     AstNode,
+    JacSource,
+    Module,
     Ability,
     Architype,
     HasVar,
@@ -29,33 +34,205 @@ from jaclang.compiler.absyntree import (
 )
 from jaclang.compiler.symtable import SymbolTable, Symbol as JSymbol
 
+from .callgraph import CallGraph
+from .completion_index import CompletionCache
+from .definitions import DefinitionIndex, get_index_path
+from .format import FormatCache
+from .hierarchy import InheritanceIndex
+from .inlay_hints import InlayHintIndex
+from .index import SymbolIndex, get_decl_key
+from .line_patterns import LinePatternIndex
+from .locks import writes_state
+from .rename import UseIndex
+from .response_cache import ResponseCache
+from .semantic_tokens import SemanticTokensCache
+from .signatures import SignatureIndex
+
 OFFSET = 1
 
 
-def fill_workspace(ls: LanguageServer) -> None:
-    ls.jlws = Workspace(path=ls.workspace.root_path)
-    for mod_path, mod_info in ls.jlws.modules.items():
-        doc = TextDocumentItem(
-            uri=f"file://{mod_path}",
-            language_id="jac",
-            version=0,
-            text=mod_info.ir.source.code,
+def build_module(file_path: str, source: str) -> ModuleInfo:
+    """Compiles `source` as the module at `file_path`, like `Workspace.rebuild_file`."""
+    build = jac_str_to_pass(jac_str=source, file_path=file_path, target=DefUsePass)
+    ir = build.ir
+    if not isinstance(ir, Module):
+        src = JacSource(source, mod_path=file_path)
+        ir = Module(
+            name="", doc=None, body=[], source=src, is_imported=False, kid=[src]
         )
-        ls.workspace.put_document(doc)
-        update_doc_tree(ls, doc.uri)
-    for doc in ls.workspace.documents.values():
-        update_doc_deps(ls, doc.uri)
+    return ModuleInfo(ir=ir, errors=build.errors_had, warnings=build.warnings_had)
+
+
+def fill_workspace(ls: LanguageServer) -> None:
+    """
+    Compiles the workspace and rebuilds every index from it.
+
+    Documents open in the client (the ones with a version) keep their text,
+    and their modules are compiled from it rather than from the disk.
+
+    Runs as background work: the write lock is taken for one module at a
+    time, with a scheduler checkpoint between modules, so requests are
+    answered while the workspace is indexed. Must not be called while
+    holding the state lock.
+    """
+    jlws = Workspace(path=ls.workspace.root_path)
+    open_docs = {
+        doc_uri: doc.source
+        for doc_uri, doc in list(ls.workspace.documents.items())
+        if doc.version
+    }
+    for doc_uri, source in open_docs.items():
+        mod_path = doc_uri.replace("file://", "")
+        module = jlws.modules.get(mod_path)
+        if module and module.ir.source.code != source:
+            jlws.modules[mod_path] = build_module(mod_path, source)
+    with ls.state_lock.write():
+        ls.jlws = jlws
+        ls.symbol_index = SymbolIndex()
+        ls.call_graph = CallGraph()
+        ls.use_index = UseIndex()
+        ls.inheritance_index = InheritanceIndex()
+        ls.semantic_tokens = SemanticTokensCache()
+        ls.completion_index = CompletionCache()
+        ls.line_indexes = {}
+        ls.line_patterns = LinePatternIndex()
+        ls.responses = ResponseCache()
+        ls.definitions = DefinitionIndex()
+        ls.signatures = SignatureIndex()
+        ls.inlay_hints = InlayHintIndex()
+        ls.formats = FormatCache()
+        ls.definitions.load(get_index_path(ls.workspace.root_path, ls.cache_dir))
+        for mod_path, mod_info in jlws.modules.items():
+            open_doc = ls.workspace.documents.get(f"file://{mod_path}")
+            if open_doc is not None and open_doc.version:
+                # also the documents opened while the workspace compiled
+                continue
+            ls.workspace.put_document(
+                TextDocumentItem(
+                    uri=f"file://{mod_path}",
+                    language_id="jac",
+                    version=0,
+                    text=mod_info.ir.source.code,
+                )
+            )
+    for mod_path in list(jlws.modules):
+        ls.scheduler.checkpoint()
+        update_doc_tree(ls, f"file://{mod_path}")
+    for doc_uri in list(ls.workspace.documents):
+        ls.scheduler.checkpoint()
+        update_doc_deps(ls, doc_uri)
+    ls.definitions.schedule_save(get_index_path(ls.workspace.root_path, ls.cache_dir))
     ls.workspace_filled = True
 
 
+@writes_state
 def update_doc_tree(ls: LanguageServer, doc_uri: str) -> None:
     doc = ls.workspace.get_text_document(doc_uri)
     try:
         doc.symbols = get_doc_symbols(ls, doc.uri)
     except Exception:
         doc.symbols = []
+    ls.symbol_index.update_module(doc.uri, doc.symbols)
+    ls.completion_index.invalidate()
+    ls.semantic_tokens.invalidate(doc.uri)
+    for doc_url, deps in ls.dep_table.items():
+        if any(dep["uri"] == doc.uri for dep in deps):
+            ls.semantic_tokens.invalidate(f"file://{doc_url}")
+    ls.responses.invalidate(get_importer_uris(ls, doc.uri))
+    module = ls.jlws.modules.get(doc.uri.replace("file://", ""))
+    for index in get_module_indexes(ls):
+        try:
+            index.update_module(doc.uri, module.ir if module else None)
+        except Exception:
+            index.remove_module(doc.uri)
+
+
+def ensure_doc_tree(ls: LanguageServer, doc_uri: str) -> None:
+    """
+    Builds the tree and the dependencies of `doc_uri` under the write lock,
+    if they were never built.
+    """
+    doc = ls.workspace.get_text_document(doc_uri)
+    if not hasattr(doc, "symbols") or not hasattr(doc, "dependencies"):
+        with ls.state_lock.write():
+            if not hasattr(doc, "symbols"):
+                update_doc_tree(ls, doc_uri)
+            if not hasattr(doc, "dependencies"):
+                try:
+                    update_doc_deps(ls, doc_uri)
+                except Exception:
+                    # not a module of the workspace
+                    doc.dependencies = {}
+
+
+def builds_doc_tree(f: Callable) -> Callable:
+    """
+    Builds the tree (and dependencies) of the request's document before
+    `f(ls, params)` runs.
+
+    Goes above `reads_state`, so the tree is built by a writer rather than by
+    upgrading the reads of the handler.
+    """
+
+    @functools.wraps(f)
+    def wrapper(ls, params, *args, **kwargs):
+        ensure_doc_tree(ls, params.text_document.uri)
+        return f(ls, params, *args, **kwargs)
+
+    return wrapper
+
+
+def get_importer_uris(ls: LanguageServer, doc_uri: str) -> set[str]:
+    """Returns `doc_uri` and the uris of the modules importing it, transitively."""
+    importers: dict[str, list[str]] = {}
+    for doc_url, deps in ls.dep_table.items():
+        for dep in deps:
+            importers.setdefault(dep["uri"], []).append(f"file://{doc_url}")
+    found, stack = {doc_uri}, [doc_uri]
+    while stack:
+        for importer in importers.get(stack.pop(), []):
+            if importer not in found:
+                found.add(importer)
+                stack.append(importer)
+    return found
+
+
+def update_dependents(ls: LanguageServer, doc_uri: str) -> None:
+    """
+    Rebuilds the dependencies of `doc_uri` and of the modules importing it,
+    once its tree was rebuilt.
+
+    Runs as background work, with a scheduler checkpoint between modules.
+    Must not be called while holding the state lock.
+    """
+    with ls.state_lock.read():
+        doc_uris = get_importer_uris(ls, doc_uri)
+    for uri in doc_uris:
+        ls.scheduler.checkpoint()
+        update_doc_deps(ls, uri)
+
+
+def get_module_indexes(ls: LanguageServer) -> list:
+    """Indexes rebuilt from a module's IR every time the module is compiled."""
+    return [
+        ls.call_graph,
+        ls.use_index,
+        ls.inheritance_index,
+        ls.line_patterns,
+        ls.definitions,
+        ls.signatures,
+        ls.inlay_hints,
+    ]
 
 
+@writes_state
+def remove_doc_indexes(ls: LanguageServer, doc_uri: str) -> None:
+    ls.symbol_index.remove_module(doc_uri)
+    for index in get_module_indexes(ls):
+        index.remove_module(doc_uri)
+
+
+@writes_state
 def update_doc_deps(ls: LanguageServer, doc_uri: str) -> None:
     doc = ls.workspace.get_text_document(doc_uri)
     doc_url = doc.uri.replace("file://", "")
@@ -117,6 +294,10 @@ class Symbol:
             return self.is_use.sym_type
         return str(self.node.sym_type)
 
+    @property
+    def decl_key(self):
+        return get_decl_key(self.is_use.node if self.is_use else self.node)
+
     @property
     def sym_doc(self):
         try:
@@ -134,7 +315,7 @@ class Symbol:
             else self.ws_symbol.decl
         )
         return Location(
-            uri=f"file://{os.path.join(os.getcwd(), defn_node.loc.mod_path)}",
+            uri=f"file://{defn_node.loc.mod_path}",
             range=Range(
                 start=Position(
                     line=defn_node.sym_name_node.loc.first_line - OFFSET,
@@ -193,7 +374,7 @@ class Symbol:
             ws_symbol = self.is_use.ws_symbol if self.is_use else self.ws_symbol
             if isinstance(ws_symbol.decl.body, AstImplOnlyNode):
                 return Location(
-                    uri=f"file://{os.path.join(os.getcwd(), ws_symbol.decl.body.loc.mod_path)}",
+                    uri=f"file://{ws_symbol.decl.body.loc.mod_path}",
                     range=Range(
                         start=Position(
                             line=ws_symbol.decl.body.loc.first_line - OFFSET,
@@ -208,18 +389,6 @@ class Symbol:
         except Exception:
             return None
 
-    @property
-    def semantic_token(self):
-        location = self.location
-        token = [
-            location.range.start.line,  # deltaLine
-            location.range.start.character,  # deltaStart
-            len(self.sym_name),  # length
-            self._get_token_type(self.sym_type),  # tokenType
-            self._get_token_modifier(self.sym_type),  # tokenModifiers
-        ]
-        return token
-
     @property
     def location(self):
         return self.sym_info.location
@@ -290,34 +459,6 @@ class Symbol:
         }
         return sym_type_map.get(sym_type, SymbolKind.Variable)
 
-    @staticmethod
-    def _get_token_type(sym_type: str) -> int:
-        sym_type_map = {
-            "mod": 14,
-            "mod_var": 7,
-            "var": 7,
-            "immutable": 7,
-            "ability": 11,
-            "object": 1,
-            "node": 1,
-            "edge": 1,
-            "walker": 1,
-            "enum": 2,
-            "test": 11,
-            "type": 5,
-            "impl": 12,
-            "field": 8,
-            "method": 12,
-            "constructor": 12,
-            "enum_member": 9,
-        }
-        return sym_type_map.get(sym_type, 14)
-
-    @staticmethod
-    def _get_token_modifier(sym_type: str) -> int:
-        # TODO: Add support for modifiers
-        return 0
-
     def __repr__(self) -> str:
         return f"Symbol({self.sym_name}:{self.sym_type} Location:{self.location.range} {f'Use of {self.is_use.sym_name}' if self.is_use is not None else ''})"
 
@@ -335,17 +476,3 @@ def get_doc_symbols(ls: LanguageServer, doc_uri: str) -> List[Symbol]:
             continue
         symbols.append(Symbol(sym, doc_uri))
     return symbols
-
-
-def get_symbol_by_name(
-    name: str, symbol_list: List[Symbol], sym_type: str = None
-) -> Symbol:
-    for symbol in symbol_list:
-        if symbol.sym_name == name and not symbol.is_use:
-            if sym_type:
-                if symbol.sym_type == sym_type:
-                    return symbol
-            else:
-                continue
-            return symbol
-    return None
@@ -1,5 +1,7 @@
 from __future__ import annotations
-from typing import Any, List, Tuple, Union, Optional
+from typing import Any, Callable, Hashable, Iterable, List, Tuple, Union, Optional
+from itertools import groupby
+from array import array
 import os
 import pathlib
 import sysconfig
@@ -7,10 +9,22 @@ import site
 import sys
 import platform
 
-from lsprotocol.types import Position, Range, TextDocumentItem
+from lsprotocol.types import (
+    PROGRESS,
+    DidChangeTextDocumentParams,
+    Location,
+    Position,
+    ProgressParams,
+    ProgressToken,
+    Range,
+    TextDocumentItem,
+)
 from pygls.server import LanguageServer
 
-from .symbols import Symbol, update_doc_deps
+from .index import get_node_range
+from .line_index import LineIndex
+from .semantic_tokens import TokenIndex, get_symbol_tokens
+from .symbols import Symbol
 from .logging import log_to_output
 
 
@@ -114,6 +128,138 @@ def get_symbol_at_pos(
     return None
 
 
+def get_symbol_response(
+    ls: LanguageServer,
+    method: str,
+    doc: TextDocumentItem,
+    pos: Position,
+    compute: Callable[[Symbol], Any],
+    variant: Hashable = None,
+) -> Any:
+    """
+    Returns `compute(symbol at pos)` for `method`, cached per document version.
+
+    The symbol under `pos` is identified by its occurrence in the use index, so
+    every position on the same name shares one response. `variant` tells apart
+    responses depending on other request parameters.
+    """
+    occurrence = ls.use_index.find(doc.uri, pos)
+    if occurrence is not None:
+        key, rng = occurrence
+        symbol_id = (key, rng.start.line, rng.start.character, variant)
+    else:
+        symbol_id = (None, pos.line, pos.character, variant)
+
+    def get_response():
+        symbol = get_symbol_at_pos(ls, doc, pos)
+        return compute(symbol) if symbol is not None else None
+
+    return ls.responses.get(method, doc.uri, doc.version, symbol_id, get_response)
+
+
+def send_symbol_chunks(
+    ls: LanguageServer,
+    method: str,
+    doc: TextDocumentItem,
+    pos: Position,
+    token: Optional[ProgressToken],
+    get_chunks: Callable[[Symbol], Iterable[list]],
+    variant: Hashable = None,
+) -> Optional[list]:
+    """
+    Streams `get_chunks(symbol at pos)` as partial results, cached like
+    `get_symbol_response`.
+
+    On a miss each chunk is sent as soon as it is produced, and the chunks are
+    cached once all of them are; on a hit the cached chunks are sent.
+    """
+    streamed = []
+
+    def compute(symbol: Symbol) -> List[list]:
+        chunks: List[list] = []
+
+        def collect() -> Iterable[list]:
+            for chunk in get_chunks(symbol):
+                chunks.append(chunk)
+                yield chunk
+
+        streamed.append(send_partial_results(ls, token, collect()))
+        return chunks
+
+    chunks = get_symbol_response(ls, method, doc, pos, compute, variant)
+    if streamed:
+        return streamed[0]
+    if chunks is not None:
+        return send_partial_results(ls, token, chunks)
+    return None
+
+
+def get_definition(ls: LanguageServer, symbol: Symbol) -> Optional[Location]:
+    """
+    Location of the declaration `symbol` uses (or `symbol` implements).
+
+    Resolved through the workspace definition index, so the target module does
+    not need to be compiled; symbols declared outside the workspace fall back
+    to their AST.
+    """
+    if symbol.is_use is None and symbol.sym_type != "impl":
+        return None
+    return ls.definitions.get_definition(symbol.decl_key) or symbol.defn_loc
+
+
+def get_implementation(ls: LanguageServer, symbol: Symbol) -> Optional[Location]:
+    """Location of the separate body (`:node:X:ability:y`) of `symbol`, if any."""
+    return ls.definitions.get_implementation(symbol.decl_key) or symbol.impl_loc
+
+
+def get_reference_chunks(
+    ls: LanguageServer,
+    symbol: Symbol,
+    first_uri: Optional[str] = None,
+    include_declaration: bool = False,
+) -> Iterable[List[Location]]:
+    """
+    Yields the locations of the references to `symbol`, one list per module.
+
+    References come from the workspace use index, starting with `first_uri`.
+    Symbols the index does not track (eg- python imports) fall back to scanning
+    the uses of every module.
+    """
+    decl = symbol.is_use.node if symbol.is_use else symbol.node
+    occurrences = ls.use_index.get_locations(symbol.decl_key)
+    if not occurrences:
+        for _, uses in groupby(symbol.uses(ls), key=lambda s: s.doc_uri):
+            yield [s.location for s in uses]
+        return
+    decl_uri = f"file://{decl.loc.mod_path}"
+    decl_range = get_node_range(decl.sym_name_node)
+    uris = sorted(occurrences, key=lambda uri: uri != first_uri)
+    for uri in uris:
+        yield [
+            Location(uri=uri, range=rng)
+            for rng in occurrences[uri]
+            if include_declaration or uri != decl_uri or rng != decl_range
+        ]
+
+
+def send_partial_results(
+    ls: LanguageServer, token: Optional[ProgressToken], chunks: Iterable[list]
+) -> list:
+    """
+    Streams `chunks` to the client as partial results of the current request.
+
+    Without a `partialResultToken` the chunks are joined and returned as the
+    response. With one, each chunk is sent as a `$/progress` notification as soon
+    as it is produced and the final response is empty, as the spec requires.
+    """
+    if token is None:
+        return [item for chunk in chunks for item in chunk]
+    for chunk in chunks:
+        if chunk:
+            ls.send_notification(PROGRESS, ProgressParams(token=token, value=chunk))
+    return []
+
+
 def get_relative_path(file_path, target_path):
     file_path = pathlib.Path(file_path)
     target_path = pathlib.Path(target_path)
@@ -152,29 +298,65 @@ def get_all_symbols(
         yield from sym.uses(ls)
         yield from get_all_children(ls, sym, True)
     if include_dep:
-        if not hasattr(doc, "dependencies"):
-            update_doc_deps(ls, doc.uri)
-        for dep in doc.dependencies.values():
+        # built with the tree by `builds_doc_tree`, before the reads were taken
+        for dep in getattr(doc, "dependencies", {}).values():
             for sym in dep["symbols"]:
                 yield sym
                 yield from sym.uses(ls)
 
 
-def get_scope_at_pos(
-    ls: LanguageServer, doc: TextDocumentItem, pos: Position, symbols: list[Symbol]
-) -> Optional[Symbol]:
-    for sym in symbols:
-        if sym.doc_uri != doc.uri or sym.ws_symbol is None:
-            continue
-        if (
-            sym.doc_sym.range.start.line <= pos.line
-            and sym.doc_sym.range.end.line >= pos.line
-        ):
-            kid = get_scope_at_pos(ls, doc, pos, sym.children)
-            if kid:
-                return kid
-            return sym
-    return None
+def get_token_index(ls: LanguageServer, doc: TextDocumentItem) -> TokenIndex:
+    """
+    Returns the semantic token index of the current version of `doc`.
+
+    The lexical tokens follow every edit, the symbol tokens are only recomputed
+    once the module has been rebuilt.
+    """
+
+    def get_module_tokens() -> TokenIndex:
+        doc_url = doc.uri.replace("file://", "")
+        module = ls.jlws.modules.get(doc_url)
+        try:
+            return TokenIndex(get_symbol_tokens(module.ir, doc_url))
+        except Exception:
+            return TokenIndex(array("I"))
+
+    return ls.semantic_tokens.get_index(
+        doc.uri, doc.source, doc.version, get_module_tokens
+    )
+
+
+def get_line_index(ls: LanguageServer, doc: TextDocumentItem) -> LineIndex:
+    """Returns the line index of the current source of `doc`, rebuilding it if stale."""
+    index = ls.line_indexes.get(doc.uri)
+    if index is None or index.text is not doc.source:
+        index = ls.line_indexes[doc.uri] = LineIndex(
+            doc.source, ls.workspace.position_encoding
+        )
+    return index
+
+
+def update_line_index(ls: LanguageServer, params: DidChangeTextDocumentParams) -> None:
+    """
+    Applies the edit of a `didChange` to the line index of the document.
+
+    The document's source is only known once every change of the
+    notification is applied, so an index is only updated for a single change;
+    otherwise it is dropped and rebuilt from the source when next used. The
+    updated index replaces the previous one, which handlers running on other
+    threads may still hold, so no lock is needed.
+    """
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    index = ls.line_indexes.get(doc.uri)
+    if index is None:
+        return
+    if len(params.content_changes) == 1:
+        change = params.content_changes[0]
+        ls.line_indexes[doc.uri] = index.with_change(
+            change.text, getattr(change, "range", None), doc.source
+        )
+    else:
+        ls.line_indexes.pop(doc.uri)
 
 
 def get_command(command):
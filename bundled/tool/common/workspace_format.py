@@ -0,0 +1,168 @@
+import glob
+import multiprocessing
+import os
+import subprocess
+import uuid
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    wait,
+)
+from typing import Callable, Dict, List, Optional
+
+from lsprotocol.types import (
+    WorkDoneProgressBegin,
+    WorkDoneProgressEnd,
+    WorkDoneProgressReport,
+    WorkspaceEdit,
+)
+from pygls.server import LanguageServer
+
+from .format import FormatCache, format_jac, get_text_edits
+from .logging import log_to_output
+
+# processes formatting the modules
+MAX_WORKERS = os.cpu_count() or 1
+
+
+def format_workspace(
+    ls: LanguageServer, changed_only: bool = False, check_only: bool = False
+) -> Optional[List[str]]:
+    """
+    Formats the `.jac` modules of the workspace in a process pool.
+
+    With `changed_only`, only the modules changed since git HEAD (or untracked)
+    are formatted. The edits of every module are applied as a single
+    `WorkspaceEdit`; with `check_only`, nothing is edited. Modules that do
+    not parse are left out of the edit and logged. Returns the uris of the
+    modules that were not formatted, or None if they could not be listed.
+    """
+    root_path = ls.workspace.root_path
+    try:
+        paths = get_workspace_modules(root_path, changed_only)
+    except (OSError, subprocess.CalledProcessError) as e:
+        log_to_output(ls, f"Could not list the changed modules: {e}")
+        return None
+    sources = {}
+    for path in paths:
+        uri = f"file://{path}"
+        if uri in ls.workspace.documents:
+            sources[uri] = ls.workspace.get_text_document(uri).source
+        else:
+            try:
+                with open(path) as f:
+                    sources[uri] = f.read()
+            except OSError:
+                continue
+
+    token = str(uuid.uuid4())
+    ls.progress.create(token)
+    ls.progress.begin(
+        token,
+        WorkDoneProgressBegin(
+            title="Checking formatting" if check_only else "Formatting workspace",
+            percentage=0,
+        ),
+    )
+
+    def report(done: int) -> None:
+        ls.progress.report(
+            token,
+            WorkDoneProgressReport(
+                message=f"{done}/{len(sources)} modules",
+                percentage=done * 100 // max(len(sources), 1),
+            ),
+        )
+
+    formatted = format_sources(sources, ls.formats, report, ls.scheduler.checkpoint)
+    unparsable = [uri for uri in sources if not formatted[uri].strip()]
+    unformatted = [
+        uri
+        for uri in sources
+        if uri not in unparsable and formatted[uri] != sources[uri]
+    ]
+    if unparsable:
+        log_to_output(ls, "Could not parse, not formatted:\n" + "\n".join(unparsable))
+    if unformatted and not check_only:
+        ls.apply_edit(
+            WorkspaceEdit(
+                changes={
+                    uri: get_text_edits(sources[uri], formatted[uri])
+                    for uri in unformatted
+                }
+            ),
+            "Format workspace",
+        )
+    message = f"{len(unformatted)} modules unformatted"
+    if unparsable:
+        message += f", {len(unparsable)} could not be parsed"
+    ls.progress.end(token, WorkDoneProgressEnd(message=message))
+    return unformatted
+
+
+def format_sources(
+    sources: Dict[str, str],
+    cache: FormatCache,
+    report: Callable[[int], None] = lambda done: None,
+    checkpoint: Callable[[], None] = lambda: None,
+) -> Dict[str, str]:
+    """
+    Formatted text of each source (by uri), computed in worker processes.
+
+    Sources found in `cache` are not sent to the workers, and the outputs of
+    the workers are added to it. `report` is called with the number of
+    sources done as they complete; a source that does not parse is formatted
+    to an empty string. Sources are handed to the workers a few
+    at a time, each after a `checkpoint` that may hold them back while the
+    server answers requests.
+    """
+    formatted = {}
+    for uri, source in sources.items():
+        cached = cache.get(source)
+        if cached is not None:
+            formatted[uri] = cached
+    report(len(formatted))
+    pending = [uri for uri in sources if uri not in formatted]
+    if not pending:
+        return formatted
+    workers = min(MAX_WORKERS, len(pending))
+    # forking would copy the server's threads and the locks they hold
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        futures: Dict[Future, str] = {}
+        while pending or futures:
+            while pending and len(futures) < workers:
+                checkpoint()
+                uri = pending.pop()
+                futures[pool.submit(format_jac, sources[uri])] = uri
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                uri = futures.pop(future)
+                formatted[uri] = future.result()
+                cache.add(sources[uri], formatted[uri])
+            report(len(formatted))
+    return formatted
+
+
+def get_workspace_modules(root_path: str, changed_only: bool = False) -> List[str]:
+    """
+    Paths of the `.jac` modules under `root_path`.
+
+    With `changed_only`, the modules git reports as modified since HEAD or
+    untracked.
+    """
+    if not changed_only:
+        return sorted(glob.glob(os.path.join(root_path, "**", "*.jac"), recursive=True))
+    changed = set()
+    for command in (
+        ["git", "diff", "--name-only", "--relative", "HEAD", "--", "*.jac"],
+        ["git", "ls-files", "--others", "--exclude-standard", "--", "*.jac"],
+    ):
+        output = subprocess.run(
+            command, cwd=root_path, capture_output=True, text=True, check=True
+        ).stdout
+        changed.update(line for line in output.splitlines() if line)
+    paths = [os.path.join(root_path, path) for path in changed]
+    return sorted(path for path in paths if os.path.isfile(path))
@@ -30,15 +30,41 @@ import lsprotocol.types as lsp  # noqa: E402
 from pygls import server, uris  # noqa: E402
 
 from common.validation import validate  # noqa: E402
-from common.completion import get_completion_items  # noqa: E402
-from common.format import format_jac  # noqa: E402
+from common.completion import (  # noqa: E402
+    get_completion_list,
+    get_inline_completion_list,
+    resolve_completion_item,
+)
+from common.completion_index import CompletionCache  # noqa: E402
+from common.format import (  # noqa: E402
+    FormatCache,
+    format_ranges,
+    get_text_edits,
+)
 from common.symbols import (  # noqa: E402
+    builds_doc_tree,
+    ensure_doc_tree,
     fill_workspace,
     update_doc_tree,
-    update_doc_deps,
+    update_dependents,
+    remove_doc_indexes,
 )
-from common.hover import get_hover_info  # noqa: E402
+from common.hover import get_symbol_hover  # noqa: E402
+from common.index import SymbolIndex, get_visible_uris  # noqa: E402
+from common.constants import CACHE_DIR  # noqa: E402
+from common.definitions import DefinitionIndex, get_index_path  # noqa: E402
+from common.callgraph import CallGraph  # noqa: E402
+from common.rename import UseIndex, get_indexed_versions  # noqa: E402
+from common.hierarchy import InheritanceIndex  # noqa: E402
+from common.inlay_hints import InlayHintIndex, resolve_inlay_hint  # noqa: E402
+from common.semantic_tokens import SemanticTokensCache, is_name  # noqa: E402
+from common.signatures import SignatureIndex  # noqa: E402
+from common.line_patterns import LinePatternIndex  # noqa: E402
+from common.response_cache import ResponseCache  # noqa: E402
+from common.scheduler import Priority, Scheduler, scheduled  # noqa: E402
+from common.locks import ReadWriteLock, reads_state  # noqa: E402
 from common.logging import log_to_output  # noqa: E402
+from common.workspace_format import format_workspace  # noqa: E402
 from common.constants import (  # noqa: E402
     SEMANTIC_TOKEN_TYPES,
     SEMANTIC_TOKEN_MODIFIERS,
@@ -47,8 +73,16 @@ from common.utils import (  # noqa: E402
     normalize_path,
     get_symbol_at_pos,
     show_doc_info,  # noqa: F401
-    get_all_symbols,
     get_command,
+    get_definition,
+    get_implementation,
+    get_line_index,
+    get_reference_chunks,
+    get_symbol_response,
+    get_token_index,
+    send_partial_results,
+    send_symbol_chunks,
+    update_line_index,
 )
 
 
@@ -58,6 +92,8 @@ class JacLanguageServer(server.LanguageServer):
     CMD_RUN_JAC = "jaclang.run"
     CMD_TEST_JAC = "jaclang.test"
     CMD_CLEAN_JAC = "jaclang.clean"
+    CMD_CACHE_STATS = "jaclang.cacheStats"
+    CMD_FORMAT_WORKSPACE = "jaclang.formatWorkspace"
 
     current_doc: Optional[lsp.TextDocumentItem] = None
 
@@ -65,6 +101,31 @@ class JacLanguageServer(server.LanguageServer):
         super().__init__(name=name, version=version, max_workers=max_workers)
         self.workspace_filled = False
         self.dep_table = {}
+        self.symbol_index = SymbolIndex()
+        self.call_graph = CallGraph()
+        self.use_index = UseIndex()
+        self.inheritance_index = InheritanceIndex()
+        self.semantic_tokens = SemanticTokensCache()
+        self.completion_index = CompletionCache()
+        self.line_indexes = {}
+        self.line_patterns = LinePatternIndex()
+        self.responses = ResponseCache()
+        self.definitions = DefinitionIndex()
+        self.signatures = SignatureIndex()
+        self.inlay_hints = InlayHintIndex()
+        self.formats = FormatCache()
+        self.cache_dir = CACHE_DIR
+        self.state_lock = ReadWriteLock()
+        self.scheduler = Scheduler(max_workers)
+
+    @property
+    def thread_pool(self) -> Scheduler:
+        """Threaded handlers run by priority class instead of in arrival order."""
+        return self.scheduler
+
+    def shutdown(self):
+        self.scheduler.shutdown(wait=False)
+        super().shutdown()
 
 
 WORKSPACE_SETTINGS = {}
@@ -89,23 +150,31 @@ def did_change(ls: server.LanguageServer, params: lsp.DidChangeTextDocumentParam
         ls (LanguageServer): The language server instance.
         params (lsp.DidChangeTextDocumentParams): The parameters for the text document change.
     """
+    update_line_index(ls, params)
     diagnostics = validate(ls, params, True, False)
     ls.publish_diagnostics(params.text_document.uri, diagnostics)
 
 
 @LSP_SERVER.feature(lsp.TEXT_DOCUMENT_DID_SAVE)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
 def did_save(ls, params: lsp.DidSaveTextDocumentParams):
     """
-    Updates the document tree and validates the saved text document.
+    Updates the document tree and validates the saved text document. The
+    dependencies of the document and of its importers are rebuilt in the
+    background.
 
     Args:
         ls (LanguageServer): The language server instance.
         params (lsp.DidSaveTextDocumentParams): The parameters for the saved text document.
     """
-    doc = ls.workspace.get_text_document(params.text_document.uri)
-    doc.version += 1
-
-    diagnostics = validate(ls, params, False, True)
+    if not ls.workspace_filled:
+        # the filling workspace compiles the saved text
+        diagnostics = validate(ls, params, True)
+        ls.publish_diagnostics(params.text_document.uri, diagnostics)
+        return
+    with ls.state_lock.write():
+        diagnostics = validate(ls, params, False, True)
     ls.publish_diagnostics(params.text_document.uri, diagnostics)
 
     # if any of the diagnostics are errors, then don't update the document tree
@@ -114,23 +183,33 @@ def did_save(ls, params: lsp.DidSaveTextDocumentParams):
         for diagnostic in diagnostics
     ):
         update_doc_tree(ls, params.text_document.uri)
-        update_doc_deps(ls, params.text_document.uri)
+        ls.scheduler.submit(
+            Priority.BACKGROUND, update_dependents, ls, params.text_document.uri
+        )
+        ls.definitions.schedule_save(
+            get_index_path(ls.workspace.root_path, ls.cache_dir)
+        )
 
 
 @LSP_SERVER.feature(lsp.TEXT_DOCUMENT_DID_OPEN)
-async def did_open(ls: server.LanguageServer, params: lsp.DidOpenTextDocumentParams):
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+def did_open(ls: server.LanguageServer, params: lsp.DidOpenTextDocumentParams):
     """
     This function is called when a text document is opened in the client.
-    It fills the workspace if it is not already filled and validates the parameters.
+    It validates the document and updates its tree; the workspace is filled,
+    and the dependencies rebuilt, in the background.
     """
     ls.current_doc = params.text_document
     if not ls.workspace_filled:
-        try:
-            fill_workspace(ls)
-        except Exception as e:
-            ls.show_message(f"Error: {e}", lsp.MessageType.Error)
+        # the filling workspace indexes the document from its open text
+        ls.scheduler.submit(Priority.BACKGROUND, fill_workspace_once, ls)
+        diagnostics = validate(ls, params, True)
+        ls.publish_diagnostics(params.text_document.uri, diagnostics)
+        return
 
-    diagnostics = validate(ls, params)
+    with ls.state_lock.read():
+        diagnostics = validate(ls, params)
     ls.publish_diagnostics(params.text_document.uri, diagnostics)
 
     # if any of the diagnostics are errors, then don't update the document tree
@@ -139,7 +218,19 @@ async def did_open(ls: server.LanguageServer, params: lsp.DidOpenTextDocumentPar
         for diagnostic in diagnostics
     ):
         update_doc_tree(ls, params.text_document.uri)
-        update_doc_deps(ls, params.text_document.uri)
+        ls.scheduler.submit(
+            Priority.BACKGROUND, update_dependents, ls, params.text_document.uri
+        )
+
+
+def fill_workspace_once(ls: server.LanguageServer) -> None:
+    """Fills the workspace unless it was filled since the fill was queued."""
+    if ls.workspace_filled:
+        return
+    try:
+        fill_workspace(ls)
+    except Exception as e:
+        ls.show_message(f"Error: {e}", lsp.MessageType.Error)
 
 
 # Handle File Operations
@@ -151,6 +242,8 @@ async def did_open(ls: server.LanguageServer, params: lsp.DidOpenTextDocumentPar
         filters=[lsp.FileOperationFilter(pattern=lsp.FileOperationPattern("**/*.jac"))]
     ),
 )
+@LSP_SERVER.thread()
+@scheduled(Priority.BACKGROUND)
 def did_create_files(ls: server.LanguageServer, params: lsp.CreateFilesParams):
     fill_workspace(ls)
 
@@ -161,56 +254,76 @@ def did_create_files(ls: server.LanguageServer, params: lsp.CreateFilesParams):
         filters=[lsp.FileOperationFilter(pattern=lsp.FileOperationPattern("**/*.jac"))]
     ),
 )
+@LSP_SERVER.thread()
+@scheduled(Priority.BACKGROUND)
 def did_rename_files(ls: server.LanguageServer, params: lsp.RenameFilesParams):
-    new_uri = params.files[0].new_uri
+    """
+    Drops the renamed file and its dependents from the dependency table and
+    rebuilds the workspace. Import paths were already rewritten by will_rename_files.
+    """
     old_uri = params.files[0].old_uri
 
-    ls.workspace_filled = False
-    dep_table_copy = ls.dep_table.copy()
-    for doc in dep_table_copy.keys():
-        if dep_table_copy[doc]:
-            for dep in dep_table_copy[doc]:
-                if dep["uri"] == old_uri:
-                    ls.show_message(
-                        f"Renamed {new_uri} is a dependency of {doc}",
-                        lsp.MessageType.Warning,
-                    )
-                    del ls.dep_table[doc]
-                    # FUTURE TODO: WINDOW_SHOW_MESSAGE_REQUEST is not yet supported by pygls
-                    # request_result = await show_message_request(ls, f"Renamed {new_uri} is a dependency of {doc}. Do you want to change the import statement?", ["Yes", "No"])
-                    request_result = "Yes"
-                    if request_result == "Yes":
-                        # TODO: Handle the rename of the import statement
-                        log_to_output(ls, "Accepted")
-    ls.workspace.remove_text_document(old_uri)
-    del ls.dep_table[old_uri.replace("file://", "")]
+    with ls.state_lock.write():
+        ls.workspace_filled = False
+        dep_table_copy = ls.dep_table.copy()
+        for doc in dep_table_copy.keys():
+            if dep_table_copy[doc]:
+                for dep in dep_table_copy[doc]:
+                    if dep["uri"] == old_uri:
+                        del ls.dep_table[doc]
+                        break
+        ls.workspace.remove_text_document(old_uri)
+        remove_doc_indexes(ls, old_uri)
+        ls.dep_table.pop(old_uri.replace("file://", ""), None)
     fill_workspace(ls)
 
 
+@LSP_SERVER.feature(
+    lsp.WORKSPACE_WILL_RENAME_FILES,
+    lsp.FileOperationRegistrationOptions(
+        filters=[lsp.FileOperationFilter(pattern=lsp.FileOperationPattern("**/*.jac"))]
+    ),
+)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@reads_state
+def will_rename_files(
+    ls: server.LanguageServer, params: lsp.RenameFilesParams
+) -> lsp.WorkspaceEdit:
+    """Rewrites the `include:jac` paths that point to (or from) the renamed files."""
+    return ls.use_index.get_file_rename_edit(
+        [(f.old_uri, f.new_uri) for f in params.files]
+    )
+
+
 @LSP_SERVER.feature(
     lsp.WORKSPACE_DID_DELETE_FILES,
     lsp.FileOperationRegistrationOptions(
         filters=[lsp.FileOperationFilter(pattern=lsp.FileOperationPattern("**/*.jac"))]
     ),
 )
+@LSP_SERVER.thread()
+@scheduled(Priority.BACKGROUND)
 def did_delete_files(ls: server.LanguageServer, params: lsp.DeleteFilesParams):
     """
     Removes the specified files from the workspace and dependency table.
     If a file is a dependency of another file, it will also be removed from the dependency table.
     """
-    for _file in params.files:
-        ls.workspace.remove_text_document(_file.uri)
-        del ls.dep_table[_file.uri.replace("file://", "")]
-        dep_table_copy = ls.dep_table.copy()
-        for doc in dep_table_copy.keys():
-            if dep_table_copy[doc]:
-                for dep in dep_table_copy[doc]:
-                    if dep["uri"] == _file.uri:
-                        ls.show_message(
-                            f"Deleted {_file.uri} is a dependency of {doc}",
-                            lsp.MessageType.Warning,
-                        )
-                        del ls.dep_table[doc]
+    with ls.state_lock.write():
+        for _file in params.files:
+            ls.workspace.remove_text_document(_file.uri)
+            remove_doc_indexes(ls, _file.uri)
+            del ls.dep_table[_file.uri.replace("file://", "")]
+            dep_table_copy = ls.dep_table.copy()
+            for doc in dep_table_copy.keys():
+                if dep_table_copy[doc]:
+                    for dep in dep_table_copy[doc]:
+                        if dep["uri"] == _file.uri:
+                            ls.show_message(
+                                f"Deleted {_file.uri} is a dependency of {doc}",
+                                lsp.MessageType.Warning,
+                            )
+                            del ls.dep_table[doc]
     fill_workspace(ls)
 
 
@@ -241,143 +354,363 @@ def did_delete_files(ls: server.LanguageServer, params: lsp.DeleteFilesParams):
 
 
 @LSP_SERVER.feature(lsp.TEXT_DOCUMENT_FORMATTING)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@reads_state
 def formatting(ls, params: lsp.DocumentFormattingParams):
-    """
-    TODO: Selective Formatting needs to be implemented
-    """
+    """Formats the document, editing only the lines the formatter changes."""
     doc = ls.workspace.get_text_document(params.text_document.uri)
     source = doc.source
-    formatted_text = format_jac(source)
-    return [
-        lsp.TextEdit(
-            range=lsp.Range(
-                start=lsp.Position(line=0, character=0),
-                end=lsp.Position(line=len(formatted_text), character=0),
-            ),
-            new_text=formatted_text,
-        )
-    ]
+    formatted = ls.formats.format(source)
+    if not formatted.strip():
+        # the document does not parse
+        return []
+    return get_text_edits(source, formatted)
+
+
+@LSP_SERVER.feature(
+    lsp.TEXT_DOCUMENT_RANGE_FORMATTING,
+    lsp.DocumentRangeFormattingOptions(ranges_support=True),
+)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@reads_state
+def range_formatting(ls, params: lsp.DocumentRangeFormattingParams):
+    """Formats the top level declarations the range is in."""
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    return format_ranges(get_line_index(ls, doc), [params.range], ls.formats.format)
+
+
+@LSP_SERVER.feature(lsp.TEXT_DOCUMENT_RANGES_FORMATTING)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@reads_state
+def ranges_formatting(ls, params: lsp.DocumentRangesFormattingParams):
+    """Formats the top level declarations the ranges are in."""
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    return format_ranges(get_line_index(ls, doc), params.ranges, ls.formats.format)
+
+
+@LSP_SERVER.feature(
+    lsp.TEXT_DOCUMENT_ON_TYPE_FORMATTING,
+    lsp.DocumentOnTypeFormattingOptions(
+        first_trigger_character=";", more_trigger_character=["}"]
+    ),
+)
+@LSP_SERVER.thread()
+@scheduled(Priority.INTERACTIVE)
+@reads_state
+def on_type_formatting(ls, params: lsp.DocumentOnTypeFormattingParams):
+    """Formats the top level declaration a statement or block was closed in."""
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    rng = lsp.Range(start=params.position, end=params.position)
+    return format_ranges(get_line_index(ls, doc), [rng], ls.formats.format)
 
 
 @LSP_SERVER.feature(
     lsp.TEXT_DOCUMENT_COMPLETION,
-    lsp.CompletionOptions(trigger_characters=[".", ":", ""]),
+    lsp.CompletionOptions(trigger_characters=[".", ":", ""], resolve_provider=True),
 )
-def completions(params: Optional[lsp.CompletionParams] = None) -> lsp.CompletionList:
-    completion_items = get_completion_items(LSP_SERVER, params)
-    return lsp.CompletionList(is_incomplete=False, items=completion_items)
+@LSP_SERVER.thread()
+@scheduled(Priority.INTERACTIVE)
+@builds_doc_tree
+@reads_state
+def completions(ls, params: lsp.CompletionParams) -> lsp.CompletionList:
+    return get_completion_list(ls, params)
 
 
-# @LSP_SERVER.feature(lsp.TEXT_DOCUMENT_INLINE_COMPLETION)
-# def inline_completions(ls, params: lsp.InlineCompletionParams):
-#     # https://www.youtube.com/watch?v=B89NXOqif-E
-#     completion_items = get_completion_items(ls, params)
-#     return lsp.InlineCompletionList(items=[
-#         lsp.InlineCompletionItem(insert_text=item.insert_text)
-#         for item in completion_items
-#     ])
+@LSP_SERVER.feature(lsp.COMPLETION_ITEM_RESOLVE)
+@LSP_SERVER.thread()
+@scheduled(Priority.INTERACTIVE)
+@reads_state
+def completion_item_resolve(ls, item: lsp.CompletionItem) -> lsp.CompletionItem:
+    return resolve_completion_item(ls, item)
 
 
-# @LSP_SERVER.feature(lsp.TEXT_DOCUMENT_INLAY_HINT)
-# def inlay_hints(ls, params: lsp.InlayHintParams):
-#     # https://www.youtube.com/watch?v=uvrIFZYW7eg
-#     pass
+@LSP_SERVER.feature(lsp.TEXT_DOCUMENT_INLINE_COMPLETION)
+@LSP_SERVER.thread()
+@scheduled(Priority.INTERACTIVE)
+@builds_doc_tree
+@reads_state
+def inline_completions(ls, params: lsp.InlineCompletionParams):
+    return get_inline_completion_list(ls, params)
 
 
-# @LSP_SERVER.feature(lsp.TEXT_DOCUMENT_SIGNATURE_HELP)
-# def signature_help(ls, params: lsp.SignatureHelpParams):
-#     # https://www.youtube.com/watch?v=vi2PLcLqVxI
-#     pass
+@LSP_SERVER.feature(
+    lsp.TEXT_DOCUMENT_INLAY_HINT, lsp.InlayHintOptions(resolve_provider=True)
+)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@builds_doc_tree
+@reads_state
+def inlay_hints(ls, params: lsp.InlayHintParams) -> list[lsp.InlayHint]:
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    return ls.inlay_hints.get_range(doc.uri, params.range, get_line_index(ls, doc))
+
+
+@LSP_SERVER.feature(lsp.INLAY_HINT_RESOLVE)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@reads_state
+def inlay_hint_resolve(ls, hint: lsp.InlayHint) -> lsp.InlayHint:
+    return resolve_inlay_hint(ls.signatures, hint)
+
+
+@LSP_SERVER.feature(
+    lsp.TEXT_DOCUMENT_SIGNATURE_HELP,
+    lsp.SignatureHelpOptions(trigger_characters=["(", ","]),
+)
+@LSP_SERVER.thread()
+@scheduled(Priority.INTERACTIVE)
+@builds_doc_tree
+@reads_state
+def signature_help(ls, params: lsp.SignatureHelpParams):
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    return ls.signatures.get_signature_help(
+        get_line_index(ls, doc), params.position, get_visible_uris(doc)
+    )
 
 
 @LSP_SERVER.feature(lsp.TEXT_DOCUMENT_DEFINITION)
+@LSP_SERVER.thread()
+@scheduled(Priority.INTERACTIVE)
+@builds_doc_tree
+@reads_state
 def definition(ls, params: lsp.DefinitionParams):
     doc = ls.workspace.get_text_document(params.text_document.uri)
-    if not hasattr(doc, "symbols"):
-        update_doc_tree(ls, doc.uri)
-    symbol = get_symbol_at_pos(ls, doc, params.position)
-    if symbol is not None:
-        return symbol.defn_loc
+    return get_symbol_response(
+        ls,
+        "definition",
+        doc,
+        params.position,
+        lambda symbol: get_definition(ls, symbol),
+    )
 
 
 @LSP_SERVER.feature(lsp.TEXT_DOCUMENT_IMPLEMENTATION)
+@LSP_SERVER.thread()
+@scheduled(Priority.INTERACTIVE)
+@builds_doc_tree
+@reads_state
 def implementation(ls, params: lsp.ImplementationParams):
     doc = ls.workspace.get_text_document(params.text_document.uri)
-    if not hasattr(doc, "symbols"):
-        update_doc_tree(ls, doc.uri)
-    symbol = get_symbol_at_pos(ls, doc, params.position)
-    if symbol is not None:
-        return symbol.impl_loc
+    return get_symbol_response(
+        ls,
+        "implementation",
+        doc,
+        params.position,
+        lambda symbol: get_implementation(ls, symbol),
+    )
 
 
 @LSP_SERVER.feature(lsp.TEXT_DOCUMENT_REFERENCES)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@builds_doc_tree
+@reads_state
 def references(ls, params: lsp.ReferenceParams):
     doc = ls.workspace.get_text_document(params.text_document.uri)
-    if not hasattr(doc, "symbols"):
-        update_doc_tree(ls, doc.uri)
+    include_declaration = params.context.include_declaration
+    return send_symbol_chunks(
+        ls,
+        "references",
+        doc,
+        params.position,
+        params.partial_result_token,
+        lambda symbol: get_reference_chunks(ls, symbol, doc.uri, include_declaration),
+        include_declaration,
+    )
+
+
+@LSP_SERVER.feature(lsp.TEXT_DOCUMENT_PREPARE_RENAME)
+@LSP_SERVER.thread()
+@scheduled(Priority.INTERACTIVE)
+@reads_state
+def prepare_rename(ls, params: lsp.PrepareRenameParams):
+    occurrence = ls.use_index.find(params.text_document.uri, params.position)
+    if occurrence is None:
+        return None
+    key, sym_range = occurrence
+    if key not in ls.use_index.declarations:
+        # declared outside of the workspace (builtins, python modules)
+        return None
+    if get_indexed_versions(ls.use_index, ls.workspace, key) is None:
+        # edited since the last compile, the ranges no longer hold
+        return None
+    return lsp.PrepareRenameResult_Type1(
+        range=sym_range, placeholder=key.split("#")[-1].split(".")[-1]
+    )
+
+
+@LSP_SERVER.feature(lsp.TEXT_DOCUMENT_RENAME, lsp.RenameOptions(prepare_provider=True))
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@reads_state
+def rename(ls, params: lsp.RenameParams) -> Optional[lsp.WorkspaceEdit]:
+    if not is_name(params.new_name):
+        ls.show_message(
+            f"'{params.new_name}' is not a valid Jac identifier", lsp.MessageType.Error
+        )
+        return None
+    occurrence = ls.use_index.find(params.text_document.uri, params.position)
+    if occurrence is None or occurrence[0] not in ls.use_index.declarations:
+        return None
+    versions = get_indexed_versions(ls.use_index, ls.workspace, occurrence[0])
+    if versions is None:
+        ls.show_message(
+            "Save the edited modules before renaming", lsp.MessageType.Warning
+        )
+        return None
+    return ls.use_index.get_rename_edit(occurrence[0], params.new_name, versions)
+
+
+@LSP_SERVER.feature(lsp.TEXT_DOCUMENT_PREPARE_CALL_HIERARCHY)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@builds_doc_tree
+@reads_state
+def prepare_call_hierarchy(ls, params: lsp.CallHierarchyPrepareParams):
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    symbol = get_symbol_at_pos(ls, doc, params.position)
+    if symbol is not None:
+        item = ls.call_graph.get_item(symbol.decl_key)
+        return [item] if item else None
+
+
+@LSP_SERVER.feature(lsp.CALL_HIERARCHY_INCOMING_CALLS)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@reads_state
+def call_hierarchy_incoming(ls, params: lsp.CallHierarchyIncomingCallsParams):
+    return ls.call_graph.incoming_calls(params.item.data)
+
+
+@LSP_SERVER.feature(lsp.CALL_HIERARCHY_OUTGOING_CALLS)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@reads_state
+def call_hierarchy_outgoing(ls, params: lsp.CallHierarchyOutgoingCallsParams):
+    return ls.call_graph.outgoing_calls(params.item.data)
+
+
+@LSP_SERVER.feature(lsp.TEXT_DOCUMENT_PREPARE_TYPE_HIERARCHY)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@builds_doc_tree
+@reads_state
+def prepare_type_hierarchy(ls, params: lsp.TypeHierarchyPrepareParams):
+    doc = ls.workspace.get_text_document(params.text_document.uri)
     symbol = get_symbol_at_pos(ls, doc, params.position)
     if symbol is not None:
-        return [s.location for s in symbol.uses(ls)]
+        item = ls.inheritance_index.get_item(symbol.decl_key)
+        return [item] if item else None
+
+
+@LSP_SERVER.feature(lsp.TYPE_HIERARCHY_SUPERTYPES)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@reads_state
+def type_hierarchy_supertypes(ls, params: lsp.TypeHierarchySupertypesParams):
+    return ls.inheritance_index.get_supertypes(params.item.data)
+
+
+@LSP_SERVER.feature(lsp.TYPE_HIERARCHY_SUBTYPES)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@reads_state
+def type_hierarchy_subtypes(ls, params: lsp.TypeHierarchySubtypesParams):
+    return ls.inheritance_index.get_subtypes(params.item.data)
 
 
 @LSP_SERVER.feature(lsp.TEXT_DOCUMENT_HOVER, lsp.HoverOptions(work_done_progress=True))
+@LSP_SERVER.thread()
+@scheduled(Priority.INTERACTIVE)
+@builds_doc_tree
+@reads_state
 def hover(ls, params: lsp.HoverParams) -> Optional[lsp.Hover]:
     """
     TODO: Add More information to the hover
     """
-    uri = params.text_document.uri
-    position = params.position
-    lsp_document = ls.workspace.get_text_document(uri)
-    all_symbols = list(get_all_symbols(ls, lsp_document, True, True))
-    log_to_output(ls, f"symbols: {all_symbols}")
-    return get_hover_info(ls, lsp_document, position)
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    return get_symbol_response(ls, "hover", doc, params.position, get_symbol_hover)
 
 
 # Symbol Handling
 
 
 @LSP_SERVER.feature(lsp.WORKSPACE_SYMBOL)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
 def workspace_symbol(
     ls, params: lsp.WorkspaceSymbolParams
 ) -> list[lsp.SymbolInformation]:
-    """Workspace symbols."""
-    symbols = []
-    for doc in ls.workspace.documents.values():
-        if not hasattr(doc, "symbols"):
-            update_doc_tree(ls, doc.uri)
-        symbols.extend([s.sym_info for s in doc.symbols])
-    return symbols
+    """Workspace symbols, streamed per document when the client asks for it."""
+
+    def get_chunks():
+        for doc in list(ls.workspace.documents.values()):
+            ensure_doc_tree(ls, doc.uri)
+            with ls.state_lock.read():
+                chunk = [s.sym_info for s in doc.symbols]
+            yield chunk
+
+    return send_partial_results(ls, params.partial_result_token, get_chunks())
 
 
 @LSP_SERVER.feature(lsp.TEXT_DOCUMENT_DOCUMENT_SYMBOL)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@builds_doc_tree
+@reads_state
 def document_symbol(ls, params: lsp.DocumentSymbolParams) -> list[lsp.DocumentSymbol]:
     """Document symbols."""
     uri = params.text_document.uri
     doc = ls.workspace.get_text_document(uri)
-    if not hasattr(doc, "symbols"):
-        update_doc_tree(ls, doc.uri)
     doc_syms = [s.doc_sym for s in doc.symbols]
     return doc_syms
 
 
-@LSP_SERVER.feature(
-    lsp.TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL,
-    lsp.SemanticTokensLegend(
-        token_types=SEMANTIC_TOKEN_TYPES, token_modifiers=SEMANTIC_TOKEN_MODIFIERS
-    ),
+SEMANTIC_TOKENS_LEGEND = lsp.SemanticTokensLegend(
+    token_types=SEMANTIC_TOKEN_TYPES, token_modifiers=SEMANTIC_TOKEN_MODIFIERS
 )
+
+
+@LSP_SERVER.feature(lsp.TEXT_DOCUMENT_SEMANTIC_TOKENS_RANGE, SEMANTIC_TOKENS_LEGEND)
+@LSP_SERVER.thread()
+@scheduled(Priority.VISIBLE)
+@builds_doc_tree
+@reads_state
+def semantic_tokens_range(
+    ls, params: lsp.SemanticTokensRangeParams
+) -> lsp.SemanticTokens:
+    """Tokens of the visible range, answered first so the viewport colours quickly."""
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    data = get_token_index(ls, doc).encode(params.range)
+    return lsp.SemanticTokens(data=data.tolist())
+
+
+@LSP_SERVER.feature(lsp.TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL, SEMANTIC_TOKENS_LEGEND)
+@LSP_SERVER.thread()
+@scheduled(Priority.BACKGROUND)
+@builds_doc_tree
+@reads_state
 def semantic_tokens_full(ls, params: lsp.SemanticTokensParams) -> lsp.SemanticTokens:
-    uri = params.text_document.uri
-    doc = ls.workspace.get_text_document(uri)
-    if not hasattr(doc, "symbols"):
-        update_doc_tree(ls, doc.uri)
-    symbols = get_all_symbols(ls, doc, True, True)
-    data = []
-    for sym in symbols:
-        if sym.doc_uri != doc.uri:
-            continue
-        data += sym.semantic_token
-    return lsp.SemanticTokens(data)
+    """Tokens of the whole document, refining the range tokens in the background."""
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    return ls.semantic_tokens.full(doc.uri, get_token_index(ls, doc).encode())
+
+
+@LSP_SERVER.feature(
+    lsp.TEXT_DOCUMENT_SEMANTIC_TOKENS_FULL_DELTA, SEMANTIC_TOKENS_LEGEND
+)
+@LSP_SERVER.thread()
+@scheduled(Priority.BACKGROUND)
+@builds_doc_tree
+@reads_state
+def semantic_tokens_delta(ls, params: lsp.SemanticTokensDeltaParams):
+    doc = ls.workspace.get_text_document(params.text_document.uri)
+    return ls.semantic_tokens.delta(
+        doc.uri, params.previous_result_id, get_token_index(ls, doc).encode()
+    )
 
 
 # Commands
@@ -399,6 +732,34 @@ def test_jac(ls, params: lsp.ExecuteCommandParams):
     subprocess.Popen(command, shell=True)
 
 
+@LSP_SERVER.command(JacLanguageServer.CMD_CACHE_STATS)
+def cache_stats(ls, params: lsp.ExecuteCommandParams) -> dict:
+    stats = ls.responses.get_stats()
+    log_to_output(ls, f"Response cache: {json.dumps(stats)}")
+    stats["scheduler"] = ls.scheduler.get_stats()
+    log_to_output(ls, f"Scheduler: {json.dumps(stats['scheduler'])}")
+    return stats
+
+
+@LSP_SERVER.command(JacLanguageServer.CMD_FORMAT_WORKSPACE)
+@LSP_SERVER.thread()
+@scheduled(Priority.BACKGROUND)
+def format_workspace_command(ls, params: list) -> Optional[list]:
+    """
+    Formats every module of the workspace, returning those that were not.
+
+    Takes an optional `{"changedOnly": bool, "checkOnly": bool}` argument to
+    only format the modules changed since git HEAD, or only list the modules
+    that are not formatted without editing them.
+    """
+    options = params[0] if params and isinstance(params[0], dict) else {}
+    return format_workspace(
+        ls,
+        changed_only=options.get("changedOnly", False),
+        check_only=options.get("checkOnly", False),
+    )
+
+
 @LSP_SERVER.command(JacLanguageServer.CMD_CLEAN_JAC)
 def clean_jac(ls, params: lsp.ExecuteCommandParams):
     # open a terminal and run the jac command "jac clean"
@@ -436,7 +797,13 @@ def initialize(params: lsp.InitializeParams) -> None:
     setting = _get_settings_by_path(pathlib.Path(os.getcwd()))
     for extra in setting.get("extraPaths", []):
         update_sys_path(extra, import_strategy)
-    fill_workspace(LSP_SERVER)
+    LSP_SERVER.scheduler.submit(Priority.BACKGROUND, fill_workspace_once, LSP_SERVER)
+
+
+@LSP_SERVER.feature(lsp.SHUTDOWN)
+def shutdown(ls, params=None) -> None:
+    """Stops the workers; work still queued is cancelled."""
+    ls.scheduler.shutdown(wait=False)
 
 
 @LSP_SERVER.feature(lsp.WORKSPACE_DID_CHANGE_CONFIGURATION)
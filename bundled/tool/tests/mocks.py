@@ -1,4 +1,12 @@
+import os
+import sys
+import tempfile
 from unittest.mock import MagicMock
+from lsprotocol.types import PositionEncodingKind
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.locks import ReadWriteLock  # noqa: E402
+from common.scheduler import Scheduler  # noqa: E402
 
 
 class MockLanguageServer(MagicMock):
@@ -6,12 +14,17 @@ class MockLanguageServer(MagicMock):
         super().__init__(*args, **kwargs)
         self.workspace = MockWorkspace(root_path)
         self.dep_table = {}
+        self.cache_tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = self.cache_tmp.name
+        self.state_lock = ReadWriteLock()
+        self.scheduler = Scheduler(2)
 
 
 class MockWorkspace:
     def __init__(self, root_path):
         self.documents = {}
         self.root_path = root_path
+        self.position_encoding = PositionEncodingKind.Utf16
 
     def put_document(self, doc):
         self.documents[doc.uri] = MockDocument(doc)
@@ -0,0 +1,83 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock
+from lsprotocol.types import Position
+
+from mocks import MockLanguageServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from lsp_server import (  # noqa: E402
+    prepare_call_hierarchy,
+    call_hierarchy_incoming,
+    call_hierarchy_outgoing,
+)
+from common.callgraph import CallGraph  # noqa: E402
+from common.symbols import fill_workspace, update_doc_tree  # noqa: E402
+
+
+class TestCallHierarchy(unittest.TestCase):
+    ls = MockLanguageServer("bundled/tool/tests/fixtures")
+    fill_workspace(ls)
+    uri = "file://bundled/tool/tests/fixtures/callgraph.jac"
+
+    def _prepare(self, line, character):
+        params = MagicMock()
+        params.position = Position(line=line, character=character)
+        params.text_document.uri = self.uri
+        return prepare_call_hierarchy(self.ls, params)
+
+    def _calls(self, handler, item):
+        params = MagicMock()
+        params.item = item
+        return handler(self.ls, params)
+
+    def test_prepare(self):
+        items = self._prepare(2, 5)
+        self.assertEqual(len(items), 1)
+        self.assertEqual(items[0].name, "helper")
+
+    def test_incoming_calls(self):
+        helper = self._prepare(2, 5)[0]
+        callers = {c.from_.name for c in self._calls(call_hierarchy_incoming, helper)}
+        self.assertEqual(callers, {"greet", "start"})
+
+    def test_outgoing_calls(self):
+        greet = self._prepare(13, 9)[0]
+        callees = {c.to.name for c in self._calls(call_hierarchy_outgoing, greet)}
+        self.assertEqual(callees, {"helper", "describe"})
+
+    def test_walker_triggers_ability(self):
+        walker = self._prepare(6, 9)[0]
+        callees = {c.to.name for c in self._calls(call_hierarchy_outgoing, walker)}
+        self.assertIn("greet", callees)
+
+    def test_rebuild_keeps_graph_consistent(self):
+        helper = self._prepare(2, 5)[0]
+        before = len(self._calls(call_hierarchy_incoming, helper))
+        update_doc_tree(self.ls, self.uri)
+        self.assertEqual(len(self._calls(call_hierarchy_incoming, helper)), before)
+        self.ls.call_graph.remove_module(self.uri)
+        self.assertEqual(self._calls(call_hierarchy_incoming, helper), [])
+        update_doc_tree(self.ls, self.uri)
+
+    def test_calls_by_name_follow_workspace(self):
+        graph = CallGraph()
+        fixtures = "bundled/tool/tests/fixtures"
+        check = f"file://{fixtures}/format.jac#turn.check"
+        guess = f"file://{fixtures}/format.jac#GuessGame.process_guess"
+        graph.update_module(
+            f"file://{fixtures}/format.jac",
+            self.ls.jlws.modules[f"{fixtures}/format.jac"].ir,
+        )
+        callees = {c.to.name for c in graph.outgoing_calls(check)}
+        self.assertIn("process_guess", callees)
+        self.assertEqual(len(graph.incoming_calls(guess)), 1)
+        # another `process_guess` makes the name ambiguous
+        graph.update_module(
+            f"file://{fixtures}/main.jac",
+            self.ls.jlws.modules[f"{fixtures}/main.jac"].ir,
+        )
+        callees = {c.to.name for c in graph.outgoing_calls(check)}
+        self.assertNotIn("process_guess", callees)
+        self.assertEqual(graph.incoming_calls(guess), [])
@@ -1,12 +1,26 @@
+import glob
 import sys
 import os
+import tempfile
 import unittest
 import lsprotocol.types as lsp
 
 from mocks import MockLanguageServer
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from common.completion import get_completion_items  # noqa: E402
+from common.completion import (  # noqa: E402
+    get_completion_items,
+    get_completion_list,
+    resolve_completion_item,
+)
+from common.completion_index import CompletionCache  # noqa: E402
+from common.py_modules import (  # noqa: E402
+    PY_MEMBERS,
+    PY_MODULES,
+    PyMemberCache,
+    PyModuleCatalog,
+    get_cache_key,
+)
 from common.symbols import fill_workspace  # noqa: E402
 
 
@@ -14,13 +28,25 @@ class TestGetCompletionItems(unittest.TestCase):
     ls = MockLanguageServer("bundled/tool/tests/fixtures")
     fill_workspace(ls)
 
+    @classmethod
+    def setUpClass(cls):
+        cls.cache_dir = tempfile.TemporaryDirectory()
+        cls.prev_cache_dirs = PY_MODULES.cache_dir, PY_MEMBERS.cache_dir
+        PY_MODULES.cache_dir = PY_MEMBERS.cache_dir = cls.cache_dir.name
+        PY_MODULES.refresh()
+
+    @classmethod
+    def tearDownClass(cls):
+        PY_MODULES.cache_dir, PY_MEMBERS.cache_dir = cls.prev_cache_dirs
+        cls.cache_dir.cleanup()
+
     def test_empty_before_cursor(self):
-        # Test when before_cursor is empty
+        # Test when before_cursor is empty, inside the body of node turn
         params = lsp.CompletionParams(
             text_document=lsp.TextDocumentIdentifier(
                 uri="file://bundled/tool/tests/fixtures/main.jac"
             ),
-            position=lsp.Position(line=15, character=0),
+            position=lsp.Position(line=13, character=0),
         )
         completions = get_completion_items(self.ls, params)
         self.assertGreater(len(completions), 12)
@@ -78,3 +104,117 @@ class TestGetCompletionItems(unittest.TestCase):
         completions = get_completion_items(self.ls, params)
         doc.source = prev_source
         self.assertGreater(len(completions), 0)
+
+    def _complete_line(self, text):
+        params = lsp.CompletionParams(
+            text_document=lsp.TextDocumentIdentifier(
+                uri="file://bundled/tool/tests/fixtures/main.jac"
+            ),
+            position=lsp.Position(line=3, character=len(text)),
+        )
+        doc = self.ls.workspace.get_document(params.text_document.uri)
+        prev_source = doc.source
+        doc.source = "\n".join(
+            doc.source.splitlines()[:3] + [text] + doc.source.splitlines()[3:]
+        )
+        completions = get_completion_list(self.ls, params, limit=10)
+        doc.source = prev_source
+        return completions
+
+    def test_prefix_filtering(self):
+        completions = self._complete_line("import:py ran")
+        self.assertFalse(completions.is_incomplete)
+        self.assertEqual(completions.items[0].label, "random")
+        labels = [c.label for c in self._complete_line("wal").items]
+        self.assertEqual(labels[0], "walker")
+        self.assertNotIn("node", labels)
+
+    def test_incomplete_when_truncated(self):
+        completions = self._complete_line("import:py ")
+        self.assertTrue(completions.is_incomplete)
+        self.assertEqual(len(completions.items), 10)
+
+    def test_index_built_across_rebuild_not_kept(self):
+        cache = CompletionCache()
+
+        def build():
+            cache.invalidate()
+            return [lsp.CompletionItem(label="walker")]
+
+        index = cache.get("keywords", build)
+        self.assertEqual(index.items[0].label, "walker")
+        self.assertNotIn("keywords", cache.symbols)
+        cache.get("keywords", build, static=True)
+        self.assertIn("keywords", cache.static)
+
+    def test_resolve_documentation(self):
+        items = self._complete_line("import:py from math, sq").items
+        sqrt = next(c for c in items if c.label == "sqrt")
+        self.assertIsNone(sqrt.documentation)
+        resolved = resolve_completion_item(self.ls, sqrt)
+        self.assertIn("sqrt", resolved.documentation.value)
+        self.assertIn("square root", resolved.documentation.value)
+
+    def test_resolve_symbol_documentation(self):
+        walker = next(
+            c
+            for c in self._complete_line(":walker:").items
+            if c.label.startswith("Guess")
+        )
+        self.assertIsNone(walker.documentation)
+        resolved = resolve_completion_item(self.ls, walker)
+        self.assertIn("Guessing Game", resolved.documentation.value)
+
+    def test_py_module_catalog(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            catalog = PyModuleCatalog(cache_dir)
+            first = catalog.get_names()
+            self.assertFalse(first.complete)
+            self.assertIn("json", first.names)
+            catalog._refresh.join()
+            scanned = catalog.get_names()
+            self.assertTrue(scanned.complete)
+            self.assertNotEqual(scanned.generation, first.generation)
+            stale = os.path.join(
+                cache_dir, f"py_modules-{get_cache_key().split('-')[0]}-0.json"
+            )
+            with open(stale, "w") as f:
+                f.write("[]")
+            cached_catalog = PyModuleCatalog(cache_dir)
+            cached = cached_catalog.get_names()
+            rescan = cached_catalog._refresh
+            self.assertTrue(cached.complete)
+            self.assertEqual(cached.names, scanned.names)
+            # rescanned once per session, replacing the older catalogues
+            if rescan is not None:
+                rescan.join()
+            self.assertEqual(cached_catalog.get_names(), cached)
+            self.assertEqual(
+                os.listdir(cache_dir),
+                [os.path.basename(cached_catalog._cache_path(get_cache_key()))],
+            )
+
+    def test_py_members_introspected_out_of_process(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            members = PyMemberCache(cache_dir, timeout=30).get_members("colorsys")
+            self.assertTrue(members.complete)
+            self.assertEqual(members.members["rgb_to_hsv"][0], "function")
+            self.assertNotIn("colorsys", sys.modules)
+            cached = PyMemberCache(cache_dir, timeout=0).get_members("colorsys")
+            self.assertEqual(cached, members)
+            missing = PyMemberCache(cache_dir).get_members("no_such_module")
+            self.assertEqual(missing.members, {})
+
+    def test_py_members_import_failure_not_cached(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with open(os.path.join(cache_dir, "broken_module.py"), "w") as f:
+                f.write("raise ImportError('broken')")
+            sys.path.append(cache_dir)
+            try:
+                cache = PyMemberCache(cache_dir, timeout=30)
+                members = cache.get_members("broken_module")
+            finally:
+                sys.path.remove(cache_dir)
+            self.assertTrue(members.complete)
+            self.assertEqual(members.members, {})
+            self.assertFalse(glob.glob(os.path.join(cache_dir, "py_members-*")))
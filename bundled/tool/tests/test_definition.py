@@ -1,5 +1,6 @@
 import sys
 import os
+import tempfile
 import unittest
 from unittest.mock import MagicMock
 from lsprotocol.types import Position
@@ -7,7 +8,8 @@ from lsprotocol.types import Position
 from mocks import MockLanguageServer
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from lsp_server import definition  # noqa: E402
+from lsp_server import definition, implementation  # noqa: E402
+from common.definitions import DefinitionIndex  # noqa: E402
 from common.symbols import fill_workspace  # noqa: E402
 
 
@@ -21,3 +23,45 @@ class TestDefinition(unittest.TestCase):
         def_params.text_document.uri = "file://bundled/tool/tests/fixtures/main.jac"
         output = definition(self.ls, def_params)
         self.assertEqual(output.range.start.line, 7)
+
+    def _params(self, line, character):
+        params = MagicMock()
+        params.position = Position(line=line, character=character)
+        params.text_document.uri = "file://bundled/tool/tests/fixtures/main.jac"
+        return params
+
+    def test_implementation(self):
+        output = implementation(self.ls, self._params(8, 10))
+        self.assertEqual(output.uri, "file://bundled/tool/tests/fixtures/main.jac")
+        self.assertEqual(output.range.start.line, 33)
+
+    def test_index_survives_without_ir(self):
+        uri = "file://bundled/tool/tests/fixtures/main.jac"
+        key = f"{uri}#turn"
+        with tempfile.TemporaryDirectory() as cache_dir:
+            path = os.path.join(cache_dir, "definitions.json")
+            self.ls.definitions.save(path)
+            index = DefinitionIndex()
+            index.load(path)
+        self.assertEqual(
+            index.get_definition(key), self.ls.definitions.get_definition(key)
+        )
+        index.update_module(uri, None)
+        self.assertEqual(index.get_definition(key).range.start.line, 11)
+        index.remove_module(uri)
+        self.assertIsNone(index.get_definition(key))
+
+    def test_saved_modules_not_indexed_again(self):
+        uri = "file://bundled/tool/tests/fixtures/main.jac"
+        module = self.ls.jlws.modules[uri.replace("file://", "")].ir
+        path = os.path.join(self.ls.cache_dir, "saved.json")
+        self.ls.definitions.schedule_save(path, delay=0)
+        self.ls.definitions._save_timer.join()
+        index = DefinitionIndex()
+        index.load(path)
+        saved = index.modules[uri]
+        index.update_module(uri, module)
+        self.assertIs(index.modules[uri], saved)
+        index.update_module(uri, module)
+        self.assertIsNot(index.modules[uri], saved)
+        self.assertEqual(index.modules[uri], saved)
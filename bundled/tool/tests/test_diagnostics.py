@@ -1,11 +1,16 @@
 import sys
 import os
+import threading
 import unittest
 from unittest.mock import MagicMock
 
+from lsprotocol.types import TextDocumentItem
+
 from mocks import MockLanguageServer
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from lsp_server import did_open, did_save  # noqa: E402
+from common.scheduler import Priority, get_priority  # noqa: E402
 from common.validation import validate  # noqa: E402
 from common.symbols import fill_workspace  # noqa: E402
 
@@ -22,3 +27,56 @@ class TestValidate(unittest.TestCase):
         )
         daignostics = validate(self.ls, mock_params)
         self.assertGreater(len(daignostics), 0)
+
+
+class TestSaveDiagnostics(unittest.TestCase):
+    uri = "file://bundled/tool/tests/fixtures/callgraph.jac"
+    importer_uri = "file://bundled/tool/tests/fixtures/importer.jac"
+
+    def setUp(self):
+        self.ls = MockLanguageServer("bundled/tool/tests/fixtures")
+        fill_workspace(self.ls)
+        self.ls.settings = {}
+        self.ls.publish_diagnostics = MagicMock()
+
+    def tearDown(self):
+        self.ls.scheduler.shutdown()
+
+    def test_scheduled_before_background_work(self):
+        self.assertEqual(get_priority(did_open), Priority.VISIBLE)
+        self.assertEqual(get_priority(did_save), Priority.VISIBLE)
+        importer = self.ls.workspace.get_text_document(self.importer_uri)
+        dependencies = importer.dependencies
+        release = threading.Event()
+        self.ls.scheduler.submit(Priority.BACKGROUND, release.wait, 5)
+        params = MagicMock()
+        params.text_document.uri = self.uri
+        did_save(self.ls, params)
+        self.ls.publish_diagnostics.assert_called_once_with(self.uri, [])
+        # the importers are rebuilt once the background work before them is done
+        self.assertIs(importer.dependencies, dependencies)
+        release.set()
+        self.ls.scheduler.submit(Priority.BACKGROUND, lambda: None).result(timeout=5)
+        doc = self.ls.workspace.get_text_document(self.uri)
+        self.assertEqual(
+            [dep["symbols"] for dep in importer.dependencies.values()], [doc.symbols]
+        )
+
+    def test_open_before_workspace_filled(self):
+        ls = MockLanguageServer("bundled/tool/tests/fixtures")
+        ls.settings = {}
+        ls.workspace_filled = False
+        ls.publish_diagnostics = MagicMock()
+        with open(self.uri.replace("file://", "")) as f:
+            source = f.read()
+        ls.workspace.put_document(
+            TextDocumentItem(uri=self.uri, language_id="jac", version=1, text=source)
+        )
+        params = MagicMock()
+        params.text_document.uri = self.uri
+        did_open(ls, params)
+        ls.publish_diagnostics.assert_called_once_with(self.uri, [])
+        ls.scheduler.submit(Priority.BACKGROUND, lambda: None).result(timeout=30)
+        self.assertTrue(ls.workspace_filled)
+        self.assertEqual(ls.workspace.get_text_document(self.uri).version, 1)
+        ls.scheduler.shutdown()
@@ -1,11 +1,20 @@
 import sys
 import os
 import unittest
+from unittest.mock import MagicMock, patch
+from lsprotocol.types import Position, Range
 
 from mocks import MockLanguageServer
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from common.format import format_jac  # noqa: E402
+from lsp_server import formatting, on_type_formatting, ranges_formatting  # noqa: E402
+from common.format import (  # noqa: E402
+    FormatCache,
+    format_jac,
+    get_declaration_lines,
+    get_text_edits,
+)
+from common.line_index import LineIndex  # noqa: E402
 from common.symbols import fill_workspace  # noqa: E402
 
 
@@ -21,3 +30,124 @@ class TestFormattingIntegration(unittest.TestCase):
         formatted = format_jac(source)
         with open("bundled/tool/tests/fixtures/formatted.txt") as f:
             self.assertEqual(formatted, f.read())
+
+    def _apply(self, source, edits):
+        lines = LineIndex(source)
+        for edit in sorted(edits, key=lambda e: lines.offset_at(e.range.start))[::-1]:
+            start = lines.offset_at(edit.range.start)
+            end = lines.offset_at(edit.range.end)
+            source = source[:start] + edit.new_text + source[end:]
+        return source
+
+    def test_text_edits(self):
+        source = "a\nb\nc\nd"
+        for formatted in ["a\nB\nc\nd", "a\nc\nd\n", "x\na\nb\nc\nd", "a\nb\nc\nd\ne"]:
+            edits = get_text_edits(source, formatted)
+            self.assertEqual(self._apply(source, edits), formatted)
+        edits = get_text_edits(source, "a\nB\nc\nd")
+        self.assertEqual(len(edits), 1)
+        self.assertEqual((edits[0].range.start.line, edits[0].range.end.line), (1, 2))
+        self.assertEqual(get_text_edits(source, source), [])
+
+    def test_document_formatting(self):
+        doc = self.ls.workspace.get_text_document(
+            uri="file://bundled/tool/tests/fixtures/format.jac"
+        )
+        source = doc.source
+        edits = formatting(self.ls, self._params())
+        formatted = self._apply(source, edits)
+        self.assertEqual(formatted, format_jac(source))
+        self.assertLess(sum(len(edit.new_text) for edit in edits), len(formatted))
+        doc.source = formatted
+        try:
+            self.assertEqual(formatting(self.ls, self._params()), [])
+        finally:
+            doc.source = source
+
+    def test_unparsable_document_not_formatted(self):
+        doc = self.ls.workspace.get_text_document(
+            uri="file://bundled/tool/tests/fixtures/format.jac"
+        )
+        source = doc.source
+        doc.source = "walker Foo {\n    can x( {\n}\n"
+        try:
+            self.assertEqual(formatting(self.ls, self._params()), [])
+        finally:
+            doc.source = source
+
+    def _params(self, **kwargs):
+        params = MagicMock()
+        params.text_document.uri = "file://bundled/tool/tests/fixtures/format.jac"
+        for name, value in kwargs.items():
+            setattr(params, name, value)
+        return params
+
+    def test_declaration_lines(self):
+        lines = LineIndex(
+            self.ls.workspace.get_text_document(
+                uri="file://bundled/tool/tests/fixtures/format.jac"
+            ).source
+        )
+        self.assertEqual(get_declaration_lines(lines, 17, 18), (15, 24))
+        self.assertEqual(get_declaration_lines(lines, 9, 9), (5, 10))
+        self.assertEqual(get_declaration_lines(lines, 8, 12), (5, 14))
+
+    def test_ranges_formatting(self):
+        ranges = [
+            Range(
+                start=Position(line=6, character=0), end=Position(line=7, character=0)
+            ),
+            Range(
+                start=Position(line=18, character=4), end=Position(line=19, character=8)
+            ),
+        ]
+        edits = ranges_formatting(self.ls, self._params(ranges=ranges))
+        for edit in edits:
+            self.assertTrue(
+                5 <= edit.range.start.line <= edit.range.end.line <= 9
+                or 15 <= edit.range.start.line <= edit.range.end.line <= 23
+            )
+        source = self.ls.workspace.get_text_document(
+            uri="file://bundled/tool/tests/fixtures/format.jac"
+        ).source
+        lines = self._apply(source, edits).splitlines()
+        self.assertEqual(lines[5], "walker GuessGame {")
+        self.assertEqual(lines[:5], source.splitlines()[:5])
+
+    def test_on_type_formatting(self):
+        doc = self.ls.workspace.get_text_document(
+            uri="file://bundled/tool/tests/fixtures/format.jac"
+        )
+        edits = on_type_formatting(
+            self.ls, self._params(position=Position(line=13, character=1), ch="}")
+        )
+        self.assertEqual(len(edits), 1)
+        self.assertEqual(edits[0].range.start.line, 11)
+        source = doc.source
+        doc.source = source.replace("visit-->;\n}", "visit-->;\n", 1)
+        try:
+            edits = on_type_formatting(
+                self.ls, self._params(position=Position(line=22, character=13), ch=";")
+            )
+        finally:
+            doc.source = source
+        self.assertEqual(edits, [])
+
+    def test_format_cache(self):
+        source = self.ls.workspace.get_text_document(
+            uri="file://bundled/tool/tests/fixtures/format.jac"
+        ).source
+        cache = FormatCache()
+        formatted = cache.format(source)
+        self.assertEqual(formatted, format_jac(source))
+        self.assertEqual(cache.format(source), formatted)
+        self.assertEqual(cache.format(formatted), formatted)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        with patch("common.format.format_jac") as format_jac_mock:
+            cache.format(source)
+        format_jac_mock.assert_not_called()
+
+    def test_failed_format_not_cached(self):
+        cache = FormatCache()
+        self.assertEqual(cache.format("walker Foo {\n    can x( {\n}\n"), "")
+        self.assertEqual(len(cache.entries), 0)
@@ -0,0 +1,47 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock
+from lsprotocol.types import Position
+
+from mocks import MockLanguageServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from lsp_server import (  # noqa: E402
+    prepare_type_hierarchy,
+    type_hierarchy_supertypes,
+    type_hierarchy_subtypes,
+)
+from common.symbols import fill_workspace, update_doc_tree  # noqa: E402
+
+
+class TestTypeHierarchy(unittest.TestCase):
+    ls = MockLanguageServer("bundled/tool/tests/fixtures")
+    fill_workspace(ls)
+    uri = "file://bundled/tool/tests/fixtures/hierarchy.jac"
+
+    def _prepare(self, line, character):
+        params = MagicMock()
+        params.position = Position(line=line, character=character)
+        params.text_document.uri = self.uri
+        return prepare_type_hierarchy(self.ls, params)[0]
+
+    def _query(self, handler, item):
+        params = MagicMock()
+        params.item = item
+        return [i.name for i in handler(self.ls, params)]
+
+    def test_supertypes(self):
+        puppy = self._prepare(10, 8)
+        self.assertEqual(puppy.name, "Puppy")
+        self.assertEqual(self._query(type_hierarchy_supertypes, puppy), ["Dog"])
+
+    def test_subtypes(self):
+        animal = self._prepare(2, 8)
+        subtypes = self._query(type_hierarchy_subtypes, animal)
+        self.assertEqual(sorted(subtypes), ["Cat", "Dog"])
+
+    def test_rebuild(self):
+        animal = self._prepare(2, 8)
+        update_doc_tree(self.ls, self.uri)
+        self.assertEqual(len(self._query(type_hierarchy_subtypes, animal)), 2)
@@ -0,0 +1,64 @@
+import sys
+import os
+import unittest
+import lsprotocol.types as lsp
+
+from mocks import MockLanguageServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.completion import get_completion_items  # noqa: E402
+from common.symbols import fill_workspace, update_doc_tree  # noqa: E402
+
+
+class TestSymbolIndex(unittest.TestCase):
+    ls = MockLanguageServer("bundled/tool/tests/fixtures")
+    fill_workspace(ls)
+    uri = "file://bundled/tool/tests/fixtures/main.jac"
+
+    def test_lookup_by_name_and_kind(self):
+        walker = self.ls.symbol_index.first("GuessGame", "walker", [self.uri])
+        self.assertIsNotNone(walker)
+        self.assertEqual(walker.doc_uri, self.uri)
+        self.assertIsNone(self.ls.symbol_index.first("GuessGame", "node"))
+        self.assertIsNotNone(self.ls.symbol_index.first("check", "ability"))
+
+    def test_lookup_skips_uses(self):
+        for sym in self.ls.symbol_index.lookup("GuessGame"):
+            self.assertIsNone(sym.is_use)
+
+    def test_rebuild_replaces_module_entries(self):
+        index = self.ls.symbol_index
+        before = len(index.lookup("turn", "node"))
+        update_doc_tree(self.ls, self.uri)
+        self.assertEqual(len(index.lookup("turn", "node")), before)
+        index.remove_module(self.uri)
+        self.assertEqual(index.lookup("turn", "node", [self.uri]), [])
+        self.assertEqual(len(index.lookup("turn", "node")), before - 1)
+        update_doc_tree(self.ls, self.uri)
+        self.assertEqual(len(index.lookup("turn", "node")), before)
+
+    def test_scope_at_line(self):
+        index = self.ls.symbol_index
+        self.assertEqual(index.get_scope(self.uri, 6).sym_name, "correct_number")
+        self.assertEqual(index.get_scope(self.uri, 8).sym_name, "guess")
+        self.assertEqual(index.get_scope(self.uri, 9).sym_name, "GuessGame")
+        self.assertEqual(index.get_scope(self.uri, 18).sym_type, "impl")
+        self.assertIsNone(index.get_scope(self.uri, 1))
+
+    def test_impl_header_completion(self):
+        params = lsp.CompletionParams(
+            text_document=lsp.TextDocumentIdentifier(uri=self.uri),
+            position=lsp.Position(line=3, character=18),
+        )
+        doc = self.ls.workspace.get_document(self.uri)
+        prev_source = doc.source
+        doc.source = "\n".join(
+            doc.source.splitlines()[:3]
+            + [":walker:GuessGame:"]
+            + doc.source.splitlines()[3:]
+        )
+        completions = get_completion_items(self.ls, params)
+        doc.source = prev_source
+        labels = [c.label for c in completions]
+        self.assertIn("start_game", labels)
+        self.assertIn("process_guess", labels)
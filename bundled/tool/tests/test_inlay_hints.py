@@ -0,0 +1,74 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock
+from lsprotocol.types import Position, Range
+
+from mocks import MockLanguageServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from lsp_server import inlay_hints, inlay_hint_resolve  # noqa: E402
+from common.symbols import fill_workspace  # noqa: E402
+
+
+class TestInlayHints(unittest.TestCase):
+    ls = MockLanguageServer("bundled/tool/tests/fixtures")
+    fill_workspace(ls)
+    uri = "file://bundled/tool/tests/fixtures/inlay.jac"
+
+    def _hints(self, start_line, end_line):
+        params = MagicMock()
+        params.text_document.uri = self.uri
+        params.range = Range(
+            start=Position(line=start_line, character=0),
+            end=Position(line=end_line, character=0),
+        )
+        return {
+            (h.position.line, h.position.character): h
+            for h in inlay_hints(self.ls, params)
+        }
+
+    def test_type_hints(self):
+        hints = self._hints(12, 17)
+        self.assertEqual(hints[(12, 5)].label, ": Point")
+        self.assertEqual(hints[(13, 5)].label, ": int")
+        self.assertEqual(hints[(14, 5)].label, ": str")
+        self.assertEqual(hints[(15, 5)].label, ": int")
+
+    def test_parameter_hints(self):
+        hints = self._hints(12, 17)
+        self.assertEqual(hints[(12, 14)].label, "x:")
+        self.assertNotIn((12, 17), hints)
+        self.assertEqual(hints[(15, 12)].label, "a:")
+        self.assertEqual(hints[(15, 15)].label, "b:")
+        self.assertNotIn((16, 12), hints)
+
+    def test_only_requested_range(self):
+        self.assertEqual(set(self._hints(13, 15)), {(13, 5), (14, 5)})
+
+    def test_resolve_tooltip(self):
+        hint = self._hints(12, 13)[(12, 14)]
+        self.assertIsNone(hint.tooltip)
+        resolved = inlay_hint_resolve(self.ls, hint)
+        self.assertIn("Point(x: int = 0, y: int = 0)", resolved.tooltip.value)
+        self.assertIsNone(hint.tooltip)
+
+    def test_computed_once(self):
+        self._hints(12, 13)
+        module = self.ls.inlay_hints.modules[self.uri]
+        self.assertEqual(list(module.blocks), [0])
+        block = module.blocks[0]
+        self._hints(13, 15)
+        self.assertIs(module.blocks[0], block)
+
+    def test_hints_follow_edits(self):
+        doc = self.ls.workspace.get_text_document(self.uri)
+        source = doc.source
+        lines = source.split("\n")
+        # line 13 moves down: its hints no longer match the text
+        doc.source = "\n".join(lines[:13] + [""] + lines[13:])
+        try:
+            self.assertEqual(set(self._hints(12, 17)), {(12, 5), (12, 14)})
+        finally:
+            doc.source = source
+        self.assertIn((13, 5), self._hints(12, 17))
@@ -0,0 +1,68 @@
+import sys
+import os
+import unittest
+import lsprotocol.types as lsp
+
+from mocks import MockLanguageServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.completion import get_inline_completion_list  # noqa: E402
+from common.line_patterns import LinePatternIndex, get_line_kinds  # noqa: E402
+from common.symbols import fill_workspace  # noqa: E402
+
+
+class TestInlineCompletion(unittest.TestCase):
+    ls = MockLanguageServer("bundled/tool/tests/fixtures")
+    fill_workspace(ls)
+    uri = "file://bundled/tool/tests/fixtures/main.jac"
+
+    def _inline_complete(self, line, text):
+        doc = self.ls.workspace.get_text_document(self.uri)
+        prev_source = doc.source
+        lines = doc.source.splitlines()
+        doc.source = "\n".join(lines[:line] + [text] + lines[line:])
+        params = lsp.InlineCompletionParams(
+            text_document=lsp.TextDocumentIdentifier(uri=self.uri),
+            position=lsp.Position(line=line, character=len(text)),
+            context=lsp.InlineCompletionContext(
+                trigger_kind=lsp.InlineCompletionTriggerKind.Automatic
+            ),
+        )
+        completions = get_inline_completion_list(self.ls, params)
+        doc.source = prev_source
+        return [item.insert_text for item in completions.items]
+
+    def test_line_kinds(self):
+        lines = ["walker W {", "    has x: int;", "}", ":node:n:can:c {", "    x;", "}"]
+        self.assertEqual(
+            [kind for kind, _ in get_line_kinds(lines)],
+            ["module", "walker", "walker", "module", "can", "can"],
+        )
+
+    def test_suggest_by_kind(self):
+        patterns = self.ls.line_patterns
+        self.assertEqual(
+            patterns.suggest("walker", "    has corr"),
+            ["ect_number: int = (1, 100) |> random.randint;"],
+        )
+        self.assertIn(
+            "check with GuessGame entry;", patterns.suggest("node", "    can ")
+        )
+        self.assertEqual(patterns.suggest("node", "    has corr"), [])
+
+    def test_inline_completion(self):
+        self.assertEqual(
+            self._inline_complete(12, "    can che"), ["ck with GuessGame entry;"]
+        )
+        self.assertEqual(self._inline_complete(12, "    zzz"), [])
+
+    def test_rebuild_replaces_module_patterns(self):
+        patterns = LinePatternIndex()
+        module = self.ls.jlws.modules[self.uri.replace("file://", "")].ir
+        patterns.update_module(self.uri, module)
+        patterns.update_module(self.uri, module)
+        self.assertEqual(
+            patterns.suggest("node", "    can "), ["check with GuessGame entry;"]
+        )
+        patterns.remove_module(self.uri)
+        self.assertEqual(patterns.patterns, {})
@@ -0,0 +1,101 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock
+from lsprotocol.types import Position, Range
+
+from mocks import MockLanguageServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.line_index import LineIndex  # noqa: E402
+from common.symbols import fill_workspace  # noqa: E402
+from common.utils import get_line_index, update_line_index  # noqa: E402
+
+
+def change(start, end, text):
+    return MagicMock(range=Range(start=Position(*start), end=Position(*end)), text=text)
+
+
+class TestLineIndex(unittest.TestCase):
+    ls = MockLanguageServer("bundled/tool/tests/fixtures")
+    fill_workspace(ls)
+    uri = "file://bundled/tool/tests/fixtures/main.jac"
+
+    def test_lines_and_positions(self):
+        index = LineIndex("walker A {\r\n  has x: int;\n}")
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.get_line(0), "walker A {")
+        self.assertEqual(index.get_line(1), "  has x: int;")
+        self.assertEqual(index.get_line(3), "")
+        self.assertEqual(index.offset_at(Position(line=1, character=2)), 14)
+        self.assertEqual(index.offset_at(Position(line=2, character=9)), 27)
+        self.assertEqual(index.position_at(14), Position(line=1, character=2))
+
+    def test_lone_carriage_return(self):
+        index = LineIndex("a\rbb\r\nc\n")
+        self.assertEqual(list(index.starts), [0, 2, 6, 8])
+        self.assertEqual(index.get_line(1), "bb")
+        self.assertEqual(index.offset_at(Position(line=1, character=9)), 4)
+
+    def test_utf16_positions(self):
+        text = 'x = "\U0001F60B", é;\ny'
+        index = LineIndex(text)
+        self.assertEqual(index.offset_at(Position(line=0, character=7)), 6)
+        self.assertEqual(index.position_at(6), Position(line=0, character=7))
+        self.assertEqual(index.position_at(9), Position(line=0, character=10))
+        utf8 = LineIndex(text, "utf-8")
+        self.assertEqual(utf8.offset_at(Position(line=0, character=9)), 6)
+        utf32 = LineIndex(text, "utf-32")
+        self.assertEqual(utf32.offset_at(Position(line=0, character=7)), 7)
+
+    def test_incremental_changes(self):
+        text = "a\nbb\nccc\ndddd"
+        index = LineIndex(text)
+        for start, end, new_text in [
+            ((1, 1), (2, 2), "X\nY\nZ"),
+            ((0, 0), (0, 0), "new\n"),
+            ((3, 0), (5, 4), ""),
+            ((1, 1), (1, 1), "\r"),
+            ((2, 0), (2, 0), "\n"),
+        ]:
+            first = index.offset_at(Position(*start))
+            last = index.offset_at(Position(*end))
+            text = text[:first] + new_text + text[last:]
+            previous = index
+            index = index.with_change(
+                new_text, change(start, end, new_text).range, text
+            )
+            self.assertIsNot(index.starts, previous.starts)
+            self.assertIs(index.text, text)
+            self.assertEqual(index.starts, LineIndex(text).starts)
+
+    def test_change_not_matching_source(self):
+        index = LineIndex("a\nbb")
+        index = index.with_change(
+            "x", Range(start=Position(0, 0), end=Position(0, 0)), "yy\n"
+        )
+        self.assertEqual(list(index.starts), [0, 3])
+        self.assertEqual(index.text, "yy\n")
+
+    def test_document_line_index(self):
+        doc = self.ls.workspace.get_text_document(self.uri)
+        index = get_line_index(self.ls, doc)
+        self.assertIs(get_line_index(self.ls, doc), index)
+        self.assertEqual(index.get_line(5), doc.source.splitlines()[5])
+        params = MagicMock()
+        params.text_document.uri = self.uri
+        params.content_changes = [change((0, 0), (0, 0), "# edited\n")]
+        prev_source = doc.source
+        doc.source = "# edited\n" + doc.source
+        update_line_index(self.ls, params)
+        edited = get_line_index(self.ls, doc)
+        self.assertIsNot(edited, index)
+        self.assertEqual(index.get_line(5), prev_source.splitlines()[5])
+        self.assertEqual(edited.starts, LineIndex(doc.source).starts)
+        index = edited
+        params.content_changes *= 2
+        doc.source = "# edited\n" + doc.source
+        update_line_index(self.ls, params)
+        self.assertIsNot(get_line_index(self.ls, doc), index)
+        doc.source = prev_source
+        self.assertIsNot(get_line_index(self.ls, doc), index)
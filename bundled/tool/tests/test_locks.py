@@ -0,0 +1,96 @@
+import sys
+import os
+import threading
+import time
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.locks import ReadWriteLock  # noqa: E402
+
+
+class TestReadWriteLock(unittest.TestCase):
+    def _run(self, *targets):
+        threads = [threading.Thread(target=target) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+            self.assertFalse(thread.is_alive())
+
+    def test_concurrent_readers(self):
+        lock = ReadWriteLock()
+        barrier = threading.Barrier(2, timeout=5)
+
+        def reader():
+            with lock.read():
+                barrier.wait()  # both readers hold the lock at once
+
+        self._run(reader, reader)
+
+    def test_writer_is_exclusive(self):
+        lock = ReadWriteLock()
+        events = []
+
+        def reader():
+            with lock.read():
+                events.append("read")
+                time.sleep(0.05)
+                events.append("read done")
+
+        def writer():
+            time.sleep(0.01)
+            with lock.write():
+                events.append("write")
+
+        self._run(reader, writer)
+        self.assertEqual(events, ["read", "read done", "write"])
+
+    def test_waiting_writer_goes_first(self):
+        lock = ReadWriteLock()
+        events = []
+
+        def first_reader():
+            with lock.read():
+                time.sleep(0.05)
+                events.append("first read")
+
+        def writer():
+            time.sleep(0.01)
+            with lock.write():
+                events.append("write")
+
+        def second_reader():
+            time.sleep(0.02)
+            with lock.read():
+                events.append("second read")
+
+        self._run(first_reader, writer, second_reader)
+        self.assertEqual(events, ["first read", "write", "second read"])
+
+    def test_reentrant(self):
+        lock = ReadWriteLock()
+        with lock.write():
+            with lock.write():
+                with lock.read():
+                    pass
+        with lock.read():
+            with lock.read():
+                with lock.write():
+                    with lock.read():
+                        pass
+        self.assertEqual(lock._readers, 0)
+        self.assertIsNone(lock._writer)
+
+    def test_readers_writing(self):
+        lock = ReadWriteLock()
+        barrier = threading.Barrier(2, timeout=5)
+        writes = []
+
+        def reader():
+            with lock.read():
+                barrier.wait()
+                with lock.write():
+                    writes.append(threading.get_ident())
+
+        self._run(reader, reader)
+        self.assertEqual(len(writes), 2)
@@ -0,0 +1,138 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+from lsprotocol.types import Position
+
+from mocks import MockLanguageServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from lsp_server import definition, hover, references, workspace_symbol  # noqa: E402
+from common.response_cache import ResponseCache  # noqa: E402
+from common.symbols import fill_workspace, update_doc_tree  # noqa: E402
+from common.utils import get_reference_chunks  # noqa: E402
+
+
+class TestReferences(unittest.TestCase):
+    ls = MockLanguageServer("bundled/tool/tests/fixtures")
+    fill_workspace(ls)
+    uri = "file://bundled/tool/tests/fixtures/callgraph.jac"
+    importer_uri = "file://bundled/tool/tests/fixtures/importer.jac"
+
+    def setUp(self):
+        self.ls.send_notification = MagicMock()
+
+    def _references(self, token=None, include_declaration=False):
+        params = MagicMock()
+        params.position = Position(line=2, character=5)
+        params.text_document.uri = self.uri
+        params.context.include_declaration = include_declaration
+        params.partial_result_token = token
+        return references(self.ls, params)
+
+    def _progress_values(self, token):
+        return [
+            c.args[1].value
+            for c in self.ls.send_notification.call_args_list
+            if c.args[1].token == token
+        ]
+
+    def test_references(self):
+        uris = [loc.uri for loc in self._references()]
+        self.assertEqual(uris.count(self.uri), 2)
+        self.assertEqual(uris.count(self.importer_uri), 1)
+
+    def test_include_declaration(self):
+        locations = self._references(include_declaration=True)
+        self.assertEqual(len(locations), 4)
+        self.assertIn(2, [loc.range.start.line for loc in locations])
+
+    def test_references_streamed_per_module(self):
+        self.assertEqual(self._references(token="refs"), [])
+        chunks = self._progress_values("refs")
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual({loc.uri for loc in chunks[0]}, {self.uri})
+        self.assertEqual({loc.uri for loc in chunks[1]}, {self.importer_uri})
+
+    def test_references_streamed_before_cached(self):
+        self.ls.responses.invalidate([self.uri])
+        sent = self.ls.send_notification
+
+        def get_chunks(*args):
+            chunks = list(get_reference_chunks(*args))
+            yield chunks[0]
+            # the first module was sent before the next one is looked for
+            self.assertEqual(sent.call_count, 1)
+            yield from chunks[1:]
+
+        with patch("lsp_server.get_reference_chunks", get_chunks):
+            self.assertEqual(self._references(token="miss"), [])
+        self.assertEqual(len(self._progress_values("miss")), 2)
+        self.assertEqual(self._references(token="hit"), [])
+        self.assertEqual(self._progress_values("hit"), self._progress_values("miss"))
+
+    def test_workspace_symbols_streamed(self):
+        params = MagicMock()
+        params.partial_result_token = None
+        symbols = workspace_symbol(self.ls, params)
+        params.partial_result_token = "ws"
+        self.assertEqual(workspace_symbol(self.ls, params), [])
+        chunks = self._progress_values("ws")
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(sum(len(c) for c in chunks), len(symbols))
+
+    def _position_params(self, character, uri=None):
+        params = MagicMock()
+        params.position = Position(line=2, character=character)
+        params.text_document.uri = uri or self.uri
+        return params
+
+    def test_responses_cached_per_symbol(self):
+        self.ls.responses.invalidate([self.uri])
+        first = hover(self.ls, self._position_params(4))
+        hits = self.ls.responses.hits
+        self.assertIs(hover(self.ls, self._position_params(6)), first)
+        self.assertEqual(self.ls.responses.hits, hits + 1)
+        self.assertIsNot(definition(self.ls, self._position_params(5)), first)
+
+    def test_response_computed_across_invalidation_not_kept(self):
+        cache = ResponseCache()
+
+        def compute():
+            cache.invalidate([self.uri])
+            return "stale"
+
+        self.assertEqual(cache.get("hover", self.uri, 1, "x", compute), "stale")
+        self.assertEqual(cache.get("hover", self.uri, 1, "x", lambda: "new"), "new")
+        self.assertEqual(cache.get_stats()["misses"], 2)
+
+    def test_missing_tree_built_before_reading(self):
+        doc = self.ls.workspace.get_text_document(self.importer_uri)
+        del doc.symbols, doc.dependencies
+        lock = self.ls.state_lock
+        write = lock.write
+        reads = []
+
+        def spy():
+            reads.append(lock._get_reads())
+            return write()
+
+        with patch.object(lock, "write", spy):
+            self.ls.responses.invalidate([self.importer_uri])
+            params = self._position_params(6, self.importer_uri)
+            params.position = Position(line=5, character=6)
+            self.assertIsNotNone(hover(self.ls, params))
+        self.assertTrue(hasattr(doc, "symbols") and hasattr(doc, "dependencies"))
+        self.assertTrue(reads)
+        self.assertEqual(set(reads), {0})
+
+    def test_rebuild_invalidates_importers(self):
+        self._references()
+        hover(self.ls, self._position_params(5))
+        hover(self.ls, self._position_params(5, self.importer_uri))
+        update_doc_tree(self.ls, self.uri)
+        self.assertNotIn(self.uri, self.ls.responses.responses)
+        self.assertNotIn(self.importer_uri, self.ls.responses.responses)
+        stats = self.ls.responses.get_stats()
+        self.assertGreaterEqual(stats["invalidations"], 2)
+        self.assertEqual(len(self._references()), 3)
@@ -0,0 +1,94 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock
+from lsprotocol.types import Position
+
+from mocks import MockLanguageServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from lsp_server import prepare_rename, rename  # noqa: E402
+from common.symbols import fill_workspace  # noqa: E402
+
+
+class TestRename(unittest.TestCase):
+    ls = MockLanguageServer("bundled/tool/tests/fixtures")
+    fill_workspace(ls)
+    uri = "file://bundled/tool/tests/fixtures/main.jac"
+
+    def setUp(self):
+        self.ls.show_message = MagicMock()
+
+    def _edits(self, edit, uri):
+        return [
+            e
+            for change in edit.document_changes
+            if change.text_document.uri == uri
+            for e in change.edits
+        ]
+
+    def _params(self, line, character, new_name=None):
+        params = MagicMock()
+        params.position = Position(line=line, character=character)
+        params.text_document.uri = self.uri
+        params.new_name = new_name
+        return params
+
+    def test_prepare_rename(self):
+        result = prepare_rename(self.ls, self._params(5, 9))
+        self.assertEqual(result.placeholder, "GuessGame")
+        self.assertEqual(result.range.start.line, 5)
+
+    def test_prepare_rename_builtin(self):
+        # `print` is not declared in the workspace
+        self.assertIsNone(prepare_rename(self.ls, self._params(20, 53)))
+
+    def test_rename_includes_impl_headers(self):
+        edit = rename(self.ls, self._params(5, 9, "Game"))
+        edits = self._edits(edit, self.uri)
+        lines = sorted(e.range.start.line for e in edits)
+        self.assertEqual(lines, [5, 12, 25, 33, 45])
+        self.assertTrue(all(e.new_text == "Game" for e in edits))
+
+    def test_rename_from_use(self):
+        edit = rename(self.ls, self._params(15, 17, "verify"))
+        lines = sorted(e.range.start.line for e in self._edits(edit, self.uri))
+        self.assertEqual(lines, [12, 15])
+
+    def test_rename_edits_are_versioned(self):
+        doc = self.ls.workspace.get_text_document(self.uri)
+        doc.version = 3
+        try:
+            edit = rename(self.ls, self._params(5, 9, "Game"))
+        finally:
+            doc.version = 0
+        self.assertEqual([c.text_document.version for c in edit.document_changes], [3])
+
+    def test_rename_refused_on_edited_document(self):
+        doc = self.ls.workspace.get_text_document(self.uri)
+        source = doc.source
+        doc.source = "\n" + source
+        try:
+            self.assertIsNone(prepare_rename(self.ls, self._params(5, 9)))
+            self.assertIsNone(rename(self.ls, self._params(5, 9, "Game")))
+        finally:
+            doc.source = source
+
+    def test_rename_rejects_invalid_names(self):
+        for new_name in ("walker", "two words", "1st", "a.b", ""):
+            self.assertIsNone(rename(self.ls, self._params(5, 9, new_name)))
+        self.ls.show_message.assert_called()
+
+    def test_file_rename_rewrites_includes(self):
+        base = "file://bundled/tool/tests/fixtures"
+        importer = f"{base}/importer.jac"
+        edit = self.ls.use_index.get_file_rename_edit(
+            [(f"{base}/callgraph.jac", f"{base}/lib/callgraph.jac")]
+        )
+        self.assertEqual(
+            [e.new_text for e in edit.changes[importer]], ["lib.callgraph"]
+        )
+        edit = self.ls.use_index.get_file_rename_edit(
+            [(importer, f"{base}/app/importer.jac")]
+        )
+        self.assertEqual([e.new_text for e in edit.changes[importer]], ["..callgraph"])
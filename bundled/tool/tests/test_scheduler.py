@@ -0,0 +1,116 @@
+import sys
+import os
+import functools
+import threading
+import time
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from common.scheduler import (  # noqa: E402
+    Priority,
+    Scheduler,
+    get_priority,
+    scheduled,
+)
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = Scheduler(3)
+        self.release = threading.Event()
+        self.order = []
+
+    def tearDown(self):
+        self.release.set()
+
+    def _block(self):
+        self.release.wait(5)
+
+    def _record(self, name):
+        self.order.append(name)
+
+    def test_priority_order(self):
+        # the one worker left free of visible work is busy with interactive work
+        blockers = [
+            self.scheduler.submit(Priority.INTERACTIVE, self._block) for _ in range(3)
+        ]
+        done = [
+            self.scheduler.submit(Priority.BACKGROUND, self._record, "background"),
+            self.scheduler.submit(Priority.VISIBLE, self._record, "visible"),
+            self.scheduler.submit(Priority.INTERACTIVE, self._record, "interactive"),
+        ]
+        time.sleep(0.05)
+        self.assertEqual(self.order, [])
+        self.release.set()
+        for future in blockers + done:
+            future.result(timeout=5)
+        self.assertEqual(self.order[0], "interactive")
+        self.assertEqual(self.order[-1], "background")
+
+    def test_worker_kept_for_interactive(self):
+        for _ in range(4):
+            self.scheduler.submit(Priority.VISIBLE, self._block)
+        future = self.scheduler.submit(Priority.INTERACTIVE, self._record, "hover")
+        future.result(timeout=1)
+        self.assertEqual(self.order, ["hover"])
+
+    def test_one_background_task(self):
+        self.scheduler.submit(Priority.BACKGROUND, self._block)
+        future = self.scheduler.submit(Priority.BACKGROUND, self._record, "index")
+        time.sleep(0.05)
+        self.assertFalse(future.done())
+        self.release.set()
+        future.result(timeout=5)
+
+    def test_checkpoint(self):
+        self.scheduler.submit(Priority.VISIBLE, self._block)
+        time.sleep(0.02)
+        start = time.monotonic()
+        self.scheduler.checkpoint(max_pause=0.1)
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        self.release.set()
+        time.sleep(0.02)
+        start = time.monotonic()
+        self.scheduler.checkpoint(max_pause=1)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_apply_async(self):
+        results, errors = [], []
+        self.scheduler.apply_async(
+            lambda x: x * 2, (21,), callback=results.append
+        ).exception(timeout=5)
+        self.scheduler.apply_async(
+            lambda: 1 / 0, error_callback=errors.append
+        ).exception(timeout=5)
+        time.sleep(0.02)
+        self.assertEqual(results, [42])
+        self.assertIsInstance(errors[0], ZeroDivisionError)
+        stats = self.scheduler.get_stats()
+        self.assertEqual(stats["visible"]["tasks"], 2)
+        self.assertIsNotNone(stats["visible"]["p99Ms"])
+
+    def test_shutdown(self):
+        running = self.scheduler.submit(Priority.VISIBLE, self._block)
+        time.sleep(0.02)
+        queued = self.scheduler.submit(Priority.BACKGROUND, self._record, "index")
+        self.scheduler.shutdown(wait=False)
+        self.assertTrue(queued.cancelled())
+        self.assertFalse(running.done())
+        self.release.set()
+        running.result(timeout=5)
+        for worker in self.scheduler._workers:
+            worker.join(timeout=5)
+            self.assertFalse(worker.is_alive())
+        self.assertEqual(self.order, [])
+        with self.assertRaises(RuntimeError):
+            self.scheduler.submit(Priority.INTERACTIVE, self._record, "hover")
+
+    def test_handler_priority(self):
+        @scheduled(Priority.INTERACTIVE)
+        def hover(ls, params):
+            pass
+
+        self.assertEqual(
+            get_priority(functools.partial(hover, None)), Priority.INTERACTIVE
+        )
+        self.assertEqual(get_priority(lambda: None), Priority.VISIBLE)
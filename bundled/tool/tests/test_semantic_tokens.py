@@ -0,0 +1,174 @@
+import sys
+import os
+import unittest
+from array import array
+from unittest.mock import MagicMock
+from lsprotocol.types import Position, Range
+
+from mocks import MockLanguageServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from lsp_server import (  # noqa: E402
+    semantic_tokens_full,
+    semantic_tokens_delta,
+    semantic_tokens_range,
+)
+from common.scheduler import Priority, get_priority  # noqa: E402
+from common.symbols import fill_workspace, update_doc_tree  # noqa: E402
+from common.semantic_tokens import (  # noqa: E402
+    TOKEN_MODIFIERS,
+    TOKEN_TYPES,
+    SemanticTokensCache,
+    TokenIndex,
+    encode_tokens,
+    get_document_tokens,
+    get_token_edits,
+)
+
+
+def flatten(tokens):
+    return [i for token in sorted(set(tokens)) for i in token]
+
+
+def by_position(data):
+    return {
+        tuple(data[i : i + 2]): list(data[i : i + 5]) for i in range(0, len(data), 5)
+    }
+
+
+def decode(data):
+    tokens, line, char = [], 0, 0
+    for i in range(0, len(data), 5):
+        line, char = line + data[i], char + data[i + 1] if not data[i] else data[i + 1]
+        tokens.append((line, char) + tuple(data[i + 2 : i + 5]))
+    return tokens
+
+
+def apply_edits(data, edits):
+    data = list(data)
+    for edit in sorted(edits, key=lambda e: e.start, reverse=True):
+        data[edit.start : edit.start + edit.delete_count] = edit.data or []
+    return data
+
+
+class TestSemanticTokens(unittest.TestCase):
+    ls = MockLanguageServer("bundled/tool/tests/fixtures")
+    fill_workspace(ls)
+    uri = "file://bundled/tool/tests/fixtures/main.jac"
+
+    def _params(self, previous_result_id=None):
+        params = MagicMock()
+        params.text_document.uri = self.uri
+        params.previous_result_id = previous_result_id
+        return params
+
+    def test_encode_tokens(self):
+        tokens = [(3, 8, 2, 7, 0), (1, 4, 5, 1, 0), (3, 2, 3, 11, 0), (3, 3, 1, 7, 0)]
+        self.assertEqual(
+            encode_tokens(flatten(tokens)).tolist(),
+            [1, 4, 5, 1, 0, 2, 2, 3, 11, 0, 0, 6, 2, 7, 0],
+        )
+
+    def test_full_is_relative(self):
+        data = semantic_tokens_full(self.ls, self._params()).data
+        self.assertGreater(len(data), 0)
+        for i in range(0, len(data), 5):
+            self.assertGreaterEqual(data[i], 0)
+            if i and data[i] == 0:
+                self.assertGreater(data[i + 1], 0)
+
+    def test_delta(self):
+        full = semantic_tokens_full(self.ls, self._params())
+        delta = semantic_tokens_delta(self.ls, self._params(full.result_id))
+        self.assertEqual(delta.edits, [])
+        self.assertNotEqual(delta.result_id, full.result_id)
+        stale = semantic_tokens_delta(self.ls, self._params(full.result_id))
+        self.assertEqual(stale.data, full.data)
+
+    def test_token_edits(self):
+        old = encode_tokens(
+            flatten([(1, 0, 3, 1, 0), (2, 4, 5, 7, 0), (6, 0, 2, 11, 0)])
+        )
+        new = encode_tokens(
+            flatten([(1, 0, 3, 1, 0), (2, 4, 6, 7, 0), (6, 0, 2, 11, 0)])
+        )
+        edits = get_token_edits(old, new)
+        self.assertEqual(len(edits), 1)
+        self.assertEqual(edits[0].delete_count, 1)
+        self.assertEqual(apply_edits(old, edits), new.tolist())
+
+    def test_range(self):
+        tokens = decode(semantic_tokens_full(self.ls, self._params()).data)
+        params = self._params()
+        params.range = Range(
+            start=Position(line=tokens[2][0], character=tokens[2][1]),
+            end=Position(line=tokens[-1][0], character=tokens[-1][1]),
+        )
+        data = semantic_tokens_range(self.ls, params).data
+        self.assertEqual(data[:2], list(tokens[2][:2]))
+        self.assertEqual(decode(data), tokens[2:-1])
+
+    def test_full_scheduled_behind_range(self):
+        self.assertEqual(get_priority(semantic_tokens_range), Priority.VISIBLE)
+        self.assertEqual(get_priority(semantic_tokens_full), Priority.BACKGROUND)
+        self.assertEqual(get_priority(semantic_tokens_delta), Priority.BACKGROUND)
+
+    def test_rebuild_invalidates_index(self):
+        semantic_tokens_full(self.ls, self._params())
+        index = self.ls.semantic_tokens.indexes[self.uri]
+        update_doc_tree(self.ls, self.uri)
+        self.assertNotIn(self.uri, self.ls.semantic_tokens.indexes)
+        semantic_tokens_full(self.ls, self._params())
+        self.assertEqual(self.ls.semantic_tokens.indexes[self.uri].tokens, index.tokens)
+
+    def test_index_built_across_rebuild_not_kept(self):
+        cache = SemanticTokensCache()
+
+        def get_symbol_tokens():
+            cache.invalidate(self.uri)
+            return TokenIndex(array("I"))
+
+        index = cache.get_index(self.uri, "x = 1;", 1, get_symbol_tokens)
+        self.assertEqual(index.version, 1)
+        self.assertNotIn(self.uri, cache.indexes)
+        self.assertNotIn(self.uri, cache.symbol_tokens)
+        cache.get_index(self.uri, "x = 1;", 1, lambda: TokenIndex(array("I")))
+        self.assertIs(
+            cache.get_index(self.uri, "x = 1;", 1, get_symbol_tokens),
+            cache.indexes[self.uri],
+        )
+
+    def test_lexical_tokens_without_compile(self):
+        source = "walker Visitor {\n    has count: int = 0; # counter\n    can run(x"
+        tokens = by_position(get_document_tokens(source))
+        self.assertEqual(tokens[(0, 0)][3], TOKEN_TYPES["keyword"])
+        self.assertEqual(tokens[(0, 7)][3], TOKEN_TYPES["class"])
+        self.assertEqual(tokens[(0, 7)][4], 1)
+        self.assertEqual(tokens[(1, 8)][3], TOKEN_TYPES["property"])
+        self.assertEqual(tokens[(1, 19)][3], TOKEN_TYPES["operator"])
+        self.assertEqual(tokens[(1, 21)][3], TOKEN_TYPES["number"])
+        self.assertEqual(tokens[(1, 24)][3], TOKEN_TYPES["comment"])
+        self.assertEqual(tokens[(2, 8)][3], TOKEN_TYPES["function"])
+
+    def test_symbol_tokens_overlay_matching_names(self):
+        source = "x = foo;\ny = 1;"
+        resolved = TokenIndex(
+            array(
+                "I", flatten([(0, 4, 3, TOKEN_TYPES["function"], 0), (1, 4, 3, 1, 0)])
+            )
+        )
+        tokens = by_position(get_document_tokens(source, resolved))
+        self.assertEqual(tokens[(0, 4)][3], TOKEN_TYPES["function"])
+        self.assertEqual(tokens[(1, 4)][3], TOKEN_TYPES["number"])
+
+    def test_symbol_token_modifiers(self):
+        params = self._params()
+        params.text_document.uri = "file://bundled/tool/tests/fixtures/callgraph.jac"
+        semantic_tokens_full(self.ls, params)
+        tokens = by_position(
+            self.ls.semantic_tokens.indexes[params.text_document.uri].tokens
+        )
+        declared = TOKEN_MODIFIERS["declaration"] | TOKEN_MODIFIERS["definition"]
+        self.assertEqual(tokens[(2, 4)][3:], [TOKEN_TYPES["function"], declared])
+        self.assertEqual(tokens[(22, 8)][3:], [TOKEN_TYPES["function"], 0])
+        self.assertEqual(tokens[(6, 7)][3:], [TOKEN_TYPES["class"], declared])
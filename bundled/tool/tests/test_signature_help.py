@@ -0,0 +1,74 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock
+from lsprotocol.types import Position
+
+from mocks import MockLanguageServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from lsp_server import signature_help  # noqa: E402
+from common.line_index import LineIndex  # noqa: E402
+from common.signatures import find_call  # noqa: E402
+from common.symbols import fill_workspace  # noqa: E402
+
+
+class TestSignatureHelp(unittest.TestCase):
+    ls = MockLanguageServer("bundled/tool/tests/fixtures")
+    fill_workspace(ls)
+    uri = "file://bundled/tool/tests/fixtures/importer.jac"
+
+    def _signature_help(self, line, text):
+        doc = self.ls.workspace.get_text_document(self.uri)
+        prev_source = doc.source
+        lines = doc.source.splitlines()
+        doc.source = "\n".join(lines[:line] + [text] + lines[line:])
+        params = MagicMock()
+        params.text_document.uri = self.uri
+        params.position = Position(line=line, character=len(text))
+        help = signature_help(self.ls, params)
+        doc.source = prev_source
+        return help
+
+    def test_find_call(self):
+        lines = LineIndex("x = foo(a, [1, 2], bar(3),\n    b")
+        self.assertEqual(
+            find_call(lines, Position(line=1, character=5)), (None, "foo", 3)
+        )
+        self.assertEqual(
+            find_call(lines, Position(line=0, character=24)), (None, "bar", 0)
+        )
+        self.assertIsNone(find_call(lines, Position(line=0, character=5)))
+
+    def test_find_call_skips_strings(self):
+        lines = LineIndex('x = <self>.foo("a, (b", \'c,)\', """d\n,)""", e  # (,\n  y')
+        self.assertEqual(
+            find_call(lines, Position(line=2, character=3)), ("<self>", "foo", 3)
+        )
+        lines = LineIndex("bar(1);\nfoo(x(;")
+        self.assertIsNone(find_call(lines, Position(line=1, character=7)))
+
+    def test_method_signature(self):
+        self.uri = "file://bundled/tool/tests/fixtures/callgraph.jac"
+        help = self._signature_help(24, "    d = <self>.describe(")
+        self.assertEqual([s.label for s in help.signatures], ["describe() -> str"])
+        self.assertEqual(
+            self.ls.signatures.lookup("describe", [self.uri]),
+            self.ls.signatures.lookup("describe", [self.uri, self.uri]),
+        )
+
+    def test_ability_signature(self):
+        help = self._signature_help(5, "    helper(")
+        signature = help.signatures[0]
+        self.assertEqual(signature.label, "helper(x: int) -> int")
+        start, end = signature.parameters[0].label
+        self.assertEqual(signature.label[start:end], "x: int")
+        self.assertEqual(help.active_parameter, 0)
+
+    def test_constructor_signature(self):
+        help = self._signature_help(5, "    v = Visitor(")
+        self.assertEqual(help.signatures[0].label, "Visitor(count: int = 0)")
+
+    def test_outside_call(self):
+        self.assertIsNone(self._signature_help(5, "    helper(1);"))
+        self.assertIsNone(self._signature_help(5, "    unknown("))
@@ -1,7 +1,7 @@
 import sys
 import os
 import unittest
-from lsprotocol.types import DocumentSymbol
+from lsprotocol.types import DocumentSymbol, TextDocumentItem
 
 from mocks import MockLanguageServer
 
@@ -20,3 +20,17 @@ class TestSymbols(unittest.TestCase):
         self.assertGreater(len(doc.symbols), 0)
         self.assertGreater(len(list(doc.symbols[0].children)), 0)
         self.assertIsInstance(doc.symbols[0].doc_sym, DocumentSymbol)
+
+    def test_open_document_kept(self):
+        ls = MockLanguageServer("bundled/tool/tests/fixtures")
+        uri = "file://bundled/tool/tests/fixtures/main.jac"
+        with open(uri.replace("file://", "")) as f:
+            source = "node edited{}\n" + f.read()
+        ls.workspace.put_document(
+            TextDocumentItem(uri=uri, language_id="jac", version=3, text=source)
+        )
+        fill_workspace(ls)
+        doc = ls.workspace.get_text_document(uri)
+        self.assertEqual((doc.source, doc.version), (source, 3))
+        self.assertIn("edited", [symbol.sym_name for symbol in doc.symbols])
+        self.assertTrue(ls.use_index.is_current(uri, source))
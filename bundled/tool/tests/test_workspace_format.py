@@ -0,0 +1,91 @@
+import sys
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from mocks import MockLanguageServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from lsp_server import format_workspace_command  # noqa: E402
+from common.format import FormatCache, format_jac  # noqa: E402
+from common.symbols import fill_workspace  # noqa: E402
+from common.workspace_format import (  # noqa: E402
+    format_sources,
+    format_workspace,
+    get_workspace_modules,
+)
+
+
+class TestWorkspaceFormat(unittest.TestCase):
+    ls = MockLanguageServer("bundled/tool/tests/fixtures")
+    fill_workspace(ls)
+    uri = "file://bundled/tool/tests/fixtures/format.jac"
+
+    def setUp(self):
+        self.ls.progress = MagicMock()
+        self.ls.apply_edit = MagicMock()
+        self.ls.show_message_log = MagicMock()
+
+    def test_workspace_modules(self):
+        paths = get_workspace_modules("bundled/tool/tests/fixtures")
+        self.assertIn("bundled/tool/tests/fixtures/format.jac", paths)
+        self.assertNotIn("bundled/tool/tests/fixtures/formatted.txt", paths)
+
+    def test_changed_modules(self):
+        with tempfile.TemporaryDirectory() as root:
+            for name in ("a.jac", "b.jac"):
+                with open(os.path.join(root, name), "w") as f:
+                    f.write("with entry {}\n")
+            git = ["git", "-c", "user.name=test", "-c", "user.email=test@test"]
+            subprocess.run(git + ["init", "-q"], cwd=root, check=True)
+            subprocess.run(git + ["add", "a.jac"], cwd=root, check=True)
+            subprocess.run(git + ["commit", "-qm", "a"], cwd=root, check=True)
+            self.assertEqual(get_workspace_modules(root, True), [f"{root}/b.jac"])
+            with open(os.path.join(root, "a.jac"), "a") as f:
+                f.write("\n")
+            self.assertEqual(
+                get_workspace_modules(root, True), [f"{root}/a.jac", f"{root}/b.jac"]
+            )
+
+    def test_format_sources(self):
+        source = self.ls.workspace.get_text_document(self.uri).source
+        sources = {"file://a.jac": source, "file://b.jac": "with entry {}"}
+        cache = FormatCache()
+        done = []
+        formatted = format_sources(sources, cache, done.append)
+        self.assertEqual(formatted["file://a.jac"], format_jac(source))
+        self.assertEqual(done[-1], 2)
+        self.assertEqual(cache.get(source), formatted["file://a.jac"])
+        self.assertEqual(format_sources(sources, cache), formatted)
+
+    def test_unparsable_modules_not_edited(self):
+        source = self.ls.workspace.get_text_document(self.uri).source
+        with tempfile.TemporaryDirectory() as root:
+            for name, text in (("a.jac", source), ("b.jac", "can x( {\n}\n")):
+                with open(os.path.join(root, name), "w") as f:
+                    f.write(text)
+            ls = MockLanguageServer(root)
+            ls.formats = FormatCache()
+            ls.progress = MagicMock()
+            ls.apply_edit = MagicMock()
+            ls.show_message_log = MagicMock()
+            self.assertEqual(format_workspace(ls), [f"file://{root}/a.jac"])
+            edit = ls.apply_edit.call_args[0][0]
+            self.assertEqual(list(edit.changes), [f"file://{root}/a.jac"])
+            message = ls.progress.end.call_args[0][1].message
+            self.assertIn("1 could not be parsed", message)
+            self.assertIn(f"{root}/b.jac", ls.show_message_log.call_args[0][0])
+
+    def test_check_only(self):
+        unformatted = format_workspace_command(self.ls, [{"checkOnly": True}])
+        self.assertIn(self.uri, unformatted)
+        self.ls.apply_edit.assert_not_called()
+
+    def test_format_workspace(self):
+        unformatted = format_workspace_command(self.ls, [])
+        self.ls.apply_edit.assert_called_once()
+        edit = self.ls.apply_edit.call_args[0][0]
+        self.assertEqual(sorted(edit.changes), sorted(unformatted))
+        self.ls.progress.end.assert_called_once()